@@ -1,5 +1,6 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import User
-admin.site.register(User)
\ No newline at end of file
+from .models import User, QueuedEmail
+admin.site.register(User)
+admin.site.register(QueuedEmail)
\ No newline at end of file
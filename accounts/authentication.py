@@ -0,0 +1,111 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .models import User
+
+# Claims get_tokens_for_user() embeds that are copied onto the request user
+CLAIM_FIELDS = ('username', 'email', 'email_verified')
+# Permission-sensitive fields that are never trusted from a token
+FLAG_FIELDS = ('is_active', 'is_staff', 'is_superuser')
+
+
+def _flags_key(user_id):
+    return f'auth_user_{user_id}'
+
+
+def get_auth_flags(user_id):
+    """
+    {is_active, is_staff, is_superuser, password_hash} of a user, or None if
+    there is no such user. Cached for AUTH_USER_CACHE_TTL seconds and dropped
+    whenever the user is saved.
+    """
+    key = _flags_key(user_id)
+    flags = cache.get(key)
+    if flags is None:
+        flags = _flags_from_row(User.objects.filter(pk=user_id).values(*FLAG_FIELDS, 'password').first())
+        cache.set(key, flags, timeout=settings.AUTH_USER_CACHE_TTL)
+    return flags or None
+
+
+async def aget_auth_flags(user_id):
+    """get_auth_flags() over the async cache and ORM APIs"""
+    key = _flags_key(user_id)
+    flags = await cache.aget(key)
+    if flags is None:
+        flags = _flags_from_row(await User.objects.filter(pk=user_id).values(*FLAG_FIELDS, 'password').afirst())
+        await cache.aset(key, flags, timeout=settings.AUTH_USER_CACHE_TTL)
+    return flags or None
+
+
+def _flags_from_row(row):
+    # False caches "no such user"
+    if row is None:
+        return False
+    flags = {field: row[field] for field in FLAG_FIELDS}
+    flags['password_hash'] = get_md5_hash_password(row['password'])
+    return flags
+
+
+def invalidate_auth_flags(user_id):
+    cache.delete(_flags_key(user_id))
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds request.user from the token instead of
+    loading the User row on every request.
+
+    The user's id, username, email and email_verified come from the signed
+    claims; is_active, is_staff, is_superuser and the password hash used
+    for revocation come from get_auth_flags(), usually without a query. The
+    result is a User instance with every other field deferred: it compares
+    equal to the real row and works in filters and foreign keys, and
+    touching another field loads it from the database.
+    """
+
+    def get_user(self, validated_token):
+        if any(claim not in validated_token for claim in CLAIM_FIELDS):
+            # Not issued by get_tokens_for_user()
+            return super().get_user(validated_token)
+        user_id = self._user_id(validated_token)
+        return self._claims_user(validated_token, user_id, get_auth_flags(user_id))
+
+    async def aauthenticate(self, request):
+        """authenticate() for async views: the same checks, with the flag lookup awaited"""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        if any(claim not in validated_token for claim in CLAIM_FIELDS):
+            return await sync_to_async(super().get_user)(validated_token), validated_token
+        user_id = self._user_id(validated_token)
+        return self._claims_user(validated_token, user_id, await aget_auth_flags(user_id)), validated_token
+
+    def _user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def _claims_user(self, validated_token, user_id, flags):
+        if flags is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not flags['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != flags['password_hash']:
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        values = {'id': user_id}
+        values.update({field: validated_token[field] for field in CLAIM_FIELDS})
+        values.update({field: flags[field] for field in FLAG_FIELDS})
+        field_names = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+        return User.from_db(router.db_for_read(User), field_names, [values[name] for name in field_names])
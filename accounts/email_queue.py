@@ -0,0 +1,116 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import QueuedEmail
+
+logger = logging.getLogger(__name__)
+
+
+def queue_email(subject, message, recipient_list, from_email=None):
+    """
+    Store an email for the send_queued_emails worker instead of talking SMTP
+    inside the request. The row is part of the caller's transaction, so an
+    email is never sent for work that was rolled back.
+    """
+    return QueuedEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list),
+    )
+
+
+def retry_delay(attempts):
+    """Backoff after the `attempts`-th failed attempt: 30s, 1m, 2m, ... capped"""
+    return timedelta(seconds=min(
+        settings.EMAIL_QUEUE_RETRY_SECONDS * 2 ** (attempts - 1), settings.EMAIL_QUEUE_MAX_RETRY_SECONDS,
+    ))
+
+
+def lease_duration(batch_size):
+    """
+    How long a claimed batch stays off the queue: every SMTP command of every
+    message (MAIL, RCPT, DATA and the body) plus connecting and logging in
+    may each take up to EMAIL_TIMEOUT, so a slow relay cannot let another
+    worker claim rows that are still being sent.
+    """
+    worst_case = (batch_size * 4 + 3) * settings.EMAIL_TIMEOUT
+    return timedelta(seconds=max(settings.EMAIL_QUEUE_LEASE_SECONDS, worst_case))
+
+
+def claim_batch(batch_size):
+    """
+    Lease up to `batch_size` due emails to this worker.
+
+    Rows are picked with SKIP LOCKED so concurrent workers get disjoint
+    batches, and pushed lease_duration() into the future so the claim
+    survives the short transaction. The SMTP conversation then runs with
+    no row locks or transaction held; a worker that dies mid-batch just
+    lets the lease run out.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            QueuedEmail.objects.filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id').select_for_update(skip_locked=True)[:batch_size]
+        )
+        if emails:
+            QueuedEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+                attempts=F('attempts') + 1,
+                next_attempt_at=now + lease_duration(batch_size),
+            )
+    for email in emails:
+        email.attempts += 1
+    return emails
+
+
+def _record_failures(failures):
+    now = timezone.now()
+    for email, error in failures:
+        email.last_error = f'{type(error).__name__}: {error}'
+        if email.attempts >= settings.EMAIL_QUEUE_MAX_ATTEMPTS:
+            email.status = 'failed'
+            logger.error('Giving up on email %s to %s: %s', email.pk, email.recipients, email.last_error)
+        else:
+            email.next_attempt_at = now + retry_delay(email.attempts)
+    QueuedEmail.objects.bulk_update([email for email, _ in failures], ['status', 'next_attempt_at', 'last_error'])
+
+
+def send_queued_emails(batch_size=None, connection=None):
+    """
+    Send one batch of due emails over a single SMTP connection; returns the
+    number of emails taken from the queue. Each message is marked sent as
+    soon as the relay accepts it; failed ones are retried with exponential
+    backoff, up to EMAIL_QUEUE_MAX_ATTEMPTS.
+    """
+    emails = claim_batch(batch_size or settings.EMAIL_QUEUE_BATCH_SIZE)
+    if not emails:
+        return 0
+    connection = connection or get_connection()
+    failures = []
+    try:
+        connection.open()
+    except Exception as e:
+        _record_failures([(email, e) for email in emails])
+        return len(emails)
+    try:
+        for email in emails:
+            message = EmailMessage(
+                email.subject, email.body, email.from_email, email.recipients, connection=connection,
+            )
+            try:
+                # One message at a time so a rejected recipient fails only its own email
+                message.send()
+            except Exception as e:
+                failures.append((email, e))
+            else:
+                QueuedEmail.objects.filter(pk=email.pk).update(status='sent', sent_at=timezone.now(), last_error='')
+    finally:
+        connection.close()
+    if failures:
+        _record_failures(failures)
+    return len(emails)
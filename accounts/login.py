@@ -0,0 +1,99 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.cache import cache
+from django.utils import timezone
+
+MAX_FAILED_LOGINS = 5
+FAILED_LOGIN_TTL = 60 * 60
+LOCKOUT_SECONDS = 30 * 60
+
+
+def _attempts_key(email):
+    return f'login_attempts_{email}'
+
+
+def _lockout_key(email):
+    return f'account_lockout_{email}'
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hash_pool():
+    """
+    Thread pool that runs password hashing, created on first use.
+
+    The hashers spend their time in C code that releases the GIL, so a
+    few threads verify in parallel while the pool size caps how many cores
+    a burst of logins can take from request handling.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash')
+        return _pool
+
+
+def _verify(password, encoded):
+    """Runs in the hash pool; returns (valid, needs_rehash). No database access."""
+    if encoded is None:
+        # Unknown email: hash anyway so the response time does not reveal it
+        hashers.make_password(password)
+        return False, False
+    if not hashers.check_password(password, encoded):
+        return False, False
+    preferred = hashers.get_hasher('default')
+    return True, hashers.identify_hasher(encoded).algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def verify_password(user, password):
+    """
+    Check a password against a User fetched by the caller (or None) in the hash
+    pool. Takes the place of authenticate(), which would fetch the user again.
+    """
+    encoded = user.password if user is not None and user.has_usable_password() else None
+    valid, needs_rehash = get_hash_pool().submit(_verify, password, encoded).result()
+    if valid and needs_rehash:
+        user.set_password(password)
+        user.save(update_fields=['password'])
+    return valid
+
+
+def failed_logins(email):
+    """
+    (failed attempts, seconds still locked out) for an email, read in one
+    cache round trip
+    """
+    state = cache.get_many([_attempts_key(email), _lockout_key(email)])
+    locked_until = state.get(_lockout_key(email))
+    remaining = max(0, int((locked_until - timezone.now()).total_seconds())) if locked_until else 0
+    return state.get(_attempts_key(email), 0), remaining
+
+
+def record_failed_login(email):
+    """
+    Count a failed login; the MAX_FAILED_LOGINS-th starts a lockout.
+    Returns the lockout in seconds, 0 if none started.
+
+    The counter is a cache incr, so concurrent failures are all counted.
+    """
+    key = _attempts_key(email)
+    cache.add(key, 0, timeout=FAILED_LOGIN_TTL)
+    try:
+        attempts = cache.incr(key)
+    except ValueError:
+        # Expired between add and incr
+        cache.set(key, 1, timeout=FAILED_LOGIN_TTL)
+        attempts = 1
+    if attempts < MAX_FAILED_LOGINS:
+        return 0
+    cache.set(_lockout_key(email), timezone.now() + timezone.timedelta(seconds=LOCKOUT_SECONDS), timeout=LOCKOUT_SECONDS)
+    cache.delete(key)
+    return LOCKOUT_SECONDS
+
+
+def clear_failed_logins(email):
+    cache.delete(_attempts_key(email))
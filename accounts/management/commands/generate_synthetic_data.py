@@ -0,0 +1,60 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from accounts.synthetic import DEFAULT_BATCH_SIZE, SCALE_ROWS, SYNTHETIC_PASSWORD, Plan, default_workers, generate, plan_counts
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate consistent synthetic users, vehicles, sell requests, inspections, offers, '
+        'service prices and carts; --scale 1 is 1M marketplace vehicles'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=0.01, help='Fraction of the --scale 1 row counts')
+        parser.add_argument(
+            '--rows', action='append', default=[], metavar='TABLE=N',
+            help=f"Row count of one table, overriding --scale; tables: {', '.join(SCALE_ROWS)}",
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per chunk and INSERT')
+        parser.add_argument('--workers', type=int, help='Writer processes; one per CPU, or 1 on SQLite')
+        parser.add_argument(
+            '--allow-non-test-db', action='store_true',
+            help='Write to the configured database although DEBUG is off; the users share a known password',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['allow_non_test_db']:
+            raise CommandError(
+                'Refusing to write synthetic users with a shared password while DEBUG is off; '
+                'pass --allow-non-test-db if this database is meant for testing'
+            )
+        overrides = {}
+        for item in options['rows']:
+            table, _, rows = item.partition('=')
+            if table not in SCALE_ROWS or not rows.isdigit():
+                raise CommandError(f"--rows takes TABLE=N with one of {', '.join(SCALE_ROWS)}, not {item!r}")
+            overrides[table] = int(rows)
+        try:
+            counts = plan_counts(options['scale'], overrides)
+        except ValueError as e:
+            raise CommandError(str(e))
+        plan = Plan(options['seed'], counts, options['batch_size'])
+        workers = options['workers'] or default_workers()
+
+        written = dict.fromkeys(SCALE_ROWS, 0)
+        started = time.monotonic()
+
+        def progress(table, rows):
+            written[table] += rows
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{table}: {written[table]}/{plan.counts[table]}")
+
+        generate(plan, workers, progress)
+        for table, rows in written.items():
+            self.stdout.write(f'{table:<16}{rows:>10}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {sum(written.values())} rows in {time.monotonic() - started:.0f}s with {workers} workers; '
+            f'synthetic users log in with {SYNTHETIC_PASSWORD!r}'
+        ))
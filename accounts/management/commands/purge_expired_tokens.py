@@ -0,0 +1,35 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from accounts.one_time_tokens import purge_expired_one_time_tokens
+from accounts.revocation import purge_expired_tokens, restore_revocations
+
+
+class Command(BaseCommand):
+    help = 'Delete expired outstanding and blacklisted JWTs and emailed link tokens in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.TOKEN_PURGE_BATCH_SIZE)
+        parser.add_argument('--pause', type=float, default=0.1, help='Seconds to sleep between chunks')
+        parser.add_argument(
+            '--restore', action='store_true',
+            help='Also reload unexpired blacklisted tokens into the revocation store',
+        )
+
+    def purge(self, purge_chunk, options):
+        total = 0
+        while True:
+            purged = purge_chunk(options['batch_size'])
+            total += purged
+            if purged < options['batch_size']:
+                return total
+            time.sleep(options['pause'])
+
+    def handle(self, *args, **options):
+        total = self.purge(purge_expired_tokens, options)
+        self.stdout.write(self.style.SUCCESS(f'Purged {total} expired tokens'))
+        total = self.purge(purge_expired_one_time_tokens, options)
+        self.stdout.write(self.style.SUCCESS(f'Purged {total} expired one-time tokens'))
+        if options['restore']:
+            restored = restore_revocations(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Restored {restored} revoked tokens'))
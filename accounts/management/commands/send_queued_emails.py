@@ -0,0 +1,46 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from accounts.email_queue import send_queued_emails
+
+
+def _drain(batch_size):
+    """Send batches until the queue has nothing due; runs in its own thread and DB connection"""
+    total = 0
+    try:
+        while True:
+            taken = send_queued_emails(batch_size)
+            total += taken
+            if not taken:
+                return total
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Send queued transactional emails in batches over reused SMTP connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.EMAIL_QUEUE_BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=1, help='Threads sending concurrently, each with its own SMTP connection')
+        parser.add_argument('--loop', action='store_true', help='Keep sending until interrupted')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when idle in --loop mode')
+
+    def handle(self, *args, **options):
+        total = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                if options['workers'] == 1:
+                    taken = send_queued_emails(options['batch_size'])
+                else:
+                    # SKIP LOCKED in claim_batch keeps the threads' batches apart
+                    taken = sum(pool.map(_drain, [options['batch_size']] * options['workers']))
+                total += taken
+                if taken:
+                    continue
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Processed {total} queued emails'))
@@ -0,0 +1,72 @@
+# Generated by Django 5.2 on 2026-10-19 13:55
+
+import hashlib
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def copy_verification_tokens(apps, schema_editor):
+    """Carry over verification links that have not expired yet, hashed"""
+    EmailVerificationToken = apps.get_model("accounts", "EmailVerificationToken")
+    OneTimeToken = apps.get_model("accounts", "OneTimeToken")
+    lifetime = timedelta(hours=24)
+    OneTimeToken.objects.bulk_create(
+        [
+            OneTimeToken(
+                key=hashlib.sha256(token.token.encode()).hexdigest(),
+                user_id=token.user_id,
+                purpose="verify_email",
+                expires_at=token.created_at + lifetime,
+            )
+            for token in EmailVerificationToken.objects.filter(
+                created_at__gt=timezone.now() - lifetime
+            )
+        ],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0007_queuedemail"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OneTimeToken",
+            fields=[
+                (
+                    "key",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                (
+                    "purpose",
+                    models.CharField(
+                        choices=[
+                            ("verify_email", "Verify email"),
+                            ("password_reset", "Password reset"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("expires_at", models.DateTimeField(db_index=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(copy_verification_tokens, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name="EmailVerificationToken",
+        ),
+    ]
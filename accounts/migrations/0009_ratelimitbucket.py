@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 15:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0008_onetimetoken"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RateLimitBucket",
+            fields=[
+                (
+                    "key",
+                    models.CharField(max_length=320, primary_key=True, serialize=False),
+                ),
+                ("tat", models.FloatField(db_index=True)),
+            ],
+        ),
+    ]
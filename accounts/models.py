@@ -1,6 +1,5 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
-from django.utils.crypto import get_random_string
 from django.utils import timezone
 
 class User(AbstractUser):
@@ -22,18 +21,34 @@ class User(AbstractUser):
         blank=True
     )
 
-class EmailVerificationToken(models.Model):
+class OneTimeToken(models.Model):
+    """
+    Single-use token sent in an email link. Only the SHA-256 of the token
+    is stored, as the primary key; see accounts.one_time_tokens.
+    """
+    PURPOSE_CHOICES = [
+        ('verify_email', 'Verify email'),
+        ('password_reset', 'Password reset'),
+    ]
+
+    key = models.CharField(max_length=64, primary_key=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    token = models.CharField(max_length=64, unique=True)
+    purpose = models.CharField(max_length=20, choices=PURPOSE_CHOICES)
+    expires_at = models.DateTimeField(db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    
-    def is_valid(self):
-        return self.created_at >= timezone.now() - timezone.timedelta(hours=24)
 
-    @classmethod
-    def generate_token(cls, user):
-        token = get_random_string(64)
-        return cls.objects.create(user=user, token=token)
+    def __str__(self):
+        return f"{self.get_purpose_display()} token for user {self.user_id}"
+
+
+class RateLimitBucket(models.Model):
+    """One client's bucket of accounts.ratelimit.DatabaseRateLimiter"""
+    key = models.CharField(max_length=320, primary_key=True)
+    # Theoretical arrival time as a Unix timestamp; the bucket is full again once it has passed
+    tat = models.FloatField(db_index=True)
+
+    def __str__(self):
+        return self.key
 
 
 class UserProfile(models.Model):
@@ -48,3 +63,29 @@ class UserProfile(models.Model):
 
     def __str__(self):
         return self.email
+
+
+class QueuedEmail(models.Model):
+    """Transactional email waiting to be sent by `manage.py send_queued_emails`"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.recipients)}"
@@ -0,0 +1,149 @@
+import threading
+import time
+from functools import lru_cache
+import jwt
+import requests
+from asgiref.sync import sync_to_async
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+ID_TOKEN_ALGORITHMS = ['RS256']
+# Floor between signing key refetches triggered by an unknown key id,
+# so tokens with made-up key ids cannot make us hammer the provider
+KEY_REFETCH_INTERVAL = 60
+
+
+class OAuthError(Exception):
+    """The provider could not be reached, or sent something we cannot trust"""
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    HTTP session shared by this process's OAuth clients, created on first use.
+
+    Its connection pool keeps TLS connections to the provider open between
+    sign-ins. Nothing is retried: a slow provider costs a login at most
+    OAUTH_HTTP_TIMEOUT and an error, never a hung worker.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=settings.OAUTH_HTTP_POOL_SIZE, max_retries=0)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+class OpenIDProvider:
+    """
+    Authorization code flow against an OpenID Connect provider.
+
+    The discovery document and signing keys are fetched at most once per
+    OAUTH_DISCOVERY_TTL and the ID token that comes with the access token is
+    verified locally, so a sign-in makes a single request to the provider:
+    the code exchange.
+    """
+
+    def __init__(self, discovery_url, client_id, client_secret, redirect_uri, session=None, clock=time.monotonic):
+        self.discovery_url = discovery_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.redirect_uri = redirect_uri
+        self.session = session
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._discovery = None
+        self._keys = {}
+        self._fetched_at = None
+
+    def _request(self, method, url, **kwargs):
+        session = self.session or get_session()
+        try:
+            response = session.request(method, url, timeout=settings.OAUTH_HTTP_TIMEOUT, **kwargs)
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise OAuthError(f'{method} {url} failed: {e}') from e
+
+    def _fetch_metadata(self):
+        discovery = self._request('GET', self.discovery_url)
+        keys = {}
+        for jwk in self._request('GET', discovery['jwks_uri']).get('keys', []):
+            try:
+                keys[jwk.get('kid')] = jwt.PyJWK(jwk)
+            except jwt.PyJWKError:
+                # Key types we have no algorithm for
+                continue
+        self._discovery, self._keys, self._fetched_at = discovery, keys, self.clock()
+
+    def _metadata(self, kid=None):
+        """(discovery document, signing keys by kid), refetched once stale or when `kid` is new"""
+        with self._lock:
+            now = self.clock()
+            if (
+                self._fetched_at is None
+                or now - self._fetched_at > settings.OAUTH_DISCOVERY_TTL
+                or (kid is not None and kid not in self._keys and now - self._fetched_at > KEY_REFETCH_INTERVAL)
+            ):
+                self._fetch_metadata()
+            return self._discovery, self._keys
+
+    def exchange_code(self, code):
+        discovery, _ = self._metadata()
+        return self._request('POST', discovery['token_endpoint'], data={
+            'code': code,
+            'client_id': self.client_id,
+            'client_secret': self.client_secret,
+            'redirect_uri': self.redirect_uri,
+            'grant_type': 'authorization_code',
+        })
+
+    def verify_id_token(self, id_token):
+        """Claims of an ID token signed by the provider for this client"""
+        try:
+            kid = jwt.get_unverified_header(id_token).get('kid')
+        except jwt.InvalidTokenError as e:
+            raise OAuthError(f'Malformed ID token: {e}') from e
+        discovery, keys = self._metadata(kid)
+        if kid not in keys:
+            raise OAuthError(f'ID token signed with unknown key {kid!r}')
+        issuer = discovery['issuer']
+        try:
+            return jwt.decode(
+                id_token, keys[kid].key, algorithms=ID_TOKEN_ALGORITHMS, audience=self.client_id,
+                # Google also issues tokens with the bare host as issuer
+                issuer=[issuer, issuer.removeprefix('https://')],
+                options={'require': ['exp', 'iat', 'iss', 'aud', 'sub']},
+            )
+        except jwt.InvalidTokenError as e:
+            raise OAuthError(f'Invalid ID token: {e}') from e
+
+    def authenticate(self, code):
+        """Verified ID token claims of the user who granted `code`"""
+        tokens = self.exchange_code(code)
+        if 'id_token' not in tokens:
+            raise OAuthError('Token response has no ID token')
+        return self.verify_id_token(tokens['id_token'])
+
+    async def aauthenticate(self, code):
+        """
+        authenticate() for async views. The pooled session is synchronous, so
+        the exchange runs on the default executor, off the request's thread.
+        """
+        return await sync_to_async(self.authenticate, thread_sensitive=False)(code)
+
+
+@lru_cache(maxsize=None)
+def get_google_provider():
+    return OpenIDProvider(
+        settings.GOOGLE_OAUTH_DISCOVERY_URL,
+        settings.GOOGLE_CLIENT_ID,
+        settings.GOOGLE_CLIENT_SECRET,
+        settings.GOOGLE_REDIRECT_URI,
+    )
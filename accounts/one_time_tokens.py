@@ -0,0 +1,60 @@
+import hashlib
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from .models import OneTimeToken
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def issue_token(user, purpose):
+    """
+    Create a `purpose` token for `user`, valid for ONE_TIME_TOKEN_TTLS[purpose]
+    seconds; returns the token to put in the emailed link. Only its hash is
+    stored, so a database dump holds no usable links.
+    """
+    token = get_random_string(64)
+    OneTimeToken.objects.create(
+        key=hash_token(token),
+        user=user,
+        purpose=purpose,
+        expires_at=timezone.now() + timedelta(seconds=settings.ONE_TIME_TOKEN_TTLS[purpose]),
+    )
+    return token
+
+
+def find_token(token, purpose):
+    """The unexpired OneTimeToken for `token` with its user, or None; one primary key lookup"""
+    return (
+        OneTimeToken.objects.select_related('user')
+        .filter(key=hash_token(token), purpose=purpose, expires_at__gt=timezone.now())
+        .first()
+    )
+
+
+def consume_token(one_time_token):
+    """
+    Use up a token found by find_token(), along with the user's other tokens
+    for the same purpose. Returns False if a concurrent request used it
+    first; call inside the transaction that applies the change.
+    """
+    deleted, _ = OneTimeToken.objects.filter(pk=one_time_token.pk).delete()
+    if not deleted:
+        return False
+    OneTimeToken.objects.filter(user_id=one_time_token.user_id, purpose=one_time_token.purpose).delete()
+    return True
+
+
+def purge_expired_one_time_tokens(batch_size=None):
+    """Delete one chunk of expired tokens; returns the number deleted"""
+    batch_size = batch_size or settings.TOKEN_PURGE_BATCH_SIZE
+    keys = list(
+        OneTimeToken.objects.filter(expires_at__lte=timezone.now())
+        .order_by('expires_at').values_list('key', flat=True)[:batch_size]
+    )
+    if keys:
+        OneTimeToken.objects.filter(key__in=keys).delete()
+    return len(keys)
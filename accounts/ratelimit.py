@@ -0,0 +1,203 @@
+import itertools
+import math
+import re
+import threading
+import time
+from functools import lru_cache, wraps
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.response import Response
+from .models import RateLimitBucket
+
+RATE_PATTERN = re.compile(r'^(\d+)/(\d*)([smhd])$')
+RATE_UNITS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+SWEEP_EVERY = 1000
+
+# GCRA on one key holding the bucket's "theoretical arrival time" in ms.
+# Each allowed request moves it `interval` (window / limit) further ahead;
+# a request is refused while that would put it more than `window` past now.
+# Uses the Redis clock so every worker and node agrees on "now".
+# Returns {allowed, remaining, retry_after_ms}
+HIT_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local interval = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or now), now)
+local new_tat = tat + interval
+if new_tat - now > window then
+    return {0, 0, new_tat - window - now}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', new_tat - now)
+return {1, math.floor((window - (new_tat - now)) / interval), 0}
+"""
+
+
+def _advance(tat, now, limit, window):
+    """
+    One hit on a bucket whose theoretical arrival time is `tat` (None when full);
+    returns (allowed, remaining, retry_after, the new tat or None if refused)
+    """
+    interval = window / limit
+    new_tat = max(tat if tat is not None else now, now) + interval
+    if new_tat - now > window:
+        return False, 0, new_tat - window - now, None
+    return True, math.floor((window - (new_tat - now)) / interval), 0, new_tat
+
+
+def parse_rate(rate):
+    """'5/m' -> (5, 60); '10/15m' -> (10, 900)"""
+    match = RATE_PATTERN.match(rate)
+    if not match:
+        raise ValueError(f'Invalid rate {rate!r}')
+    count, multiplier, unit = match.groups()
+    return int(count), int(multiplier or 1) * RATE_UNITS[unit]
+
+
+class RateLimiter:
+    """
+    Storage engine for rate limits.
+
+    Limits are a generic cell rate: `limit` requests per `window` seconds,
+    smoothly refilled, so each key needs a single timestamp that expires
+    once the bucket is full again.
+    """
+
+    def hit(self, key, limit, window):
+        """Count a request; returns (allowed, remaining, retry_after seconds)"""
+        raise NotImplementedError
+
+    def reset(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class InMemoryRateLimiter(RateLimiter):
+    """Process-local limiter for tests; every worker process would have a budget of its own"""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._tats = {}
+        self._hits = 0
+
+    def hit(self, key, limit, window):
+        with self._lock:
+            now = self.clock()
+            self._hits += 1
+            if self._hits % SWEEP_EVERY == 0:
+                self._tats = {k: tat for k, tat in self._tats.items() if tat > now}
+            allowed, remaining, retry_after, new_tat = _advance(self._tats.get(key), now, limit, window)
+            if allowed:
+                self._tats[key] = new_tat
+            return allowed, remaining, retry_after
+
+    def reset(self, key):
+        with self._lock:
+            self._tats.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._tats.clear()
+
+
+class DatabaseRateLimiter(RateLimiter):
+    """
+    Buckets in the RateLimitBucket table, shared by every worker; the default
+    without Redis. A hit locks its bucket's row for one short transaction, so
+    concurrent requests of a client are all counted. Workers read the wall
+    clock, which the hosts keep in sync.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._hits = itertools.count(1)
+
+    def hit(self, key, limit, window):
+        now = self.clock()
+        with transaction.atomic():
+            bucket = RateLimitBucket.objects.select_for_update().filter(key=key).first()
+            allowed, remaining, retry_after, new_tat = _advance(bucket.tat if bucket else None, now, limit, window)
+            if allowed and bucket is None:
+                # Of two concurrent first hits of a client only one creates the row; both count once
+                RateLimitBucket.objects.get_or_create(key=key, defaults={'tat': new_tat})
+            elif allowed:
+                RateLimitBucket.objects.filter(key=key).update(tat=new_tat)
+        if next(self._hits) % SWEEP_EVERY == 0:
+            RateLimitBucket.objects.filter(tat__lte=now).delete()
+        return allowed, remaining, retry_after
+
+    def reset(self, key):
+        RateLimitBucket.objects.filter(key=key).delete()
+
+    def clear(self):
+        RateLimitBucket.objects.all().delete()
+
+
+class RedisRateLimiter(RateLimiter):
+    """Limiter shared by every worker, one expiring string key per limited client"""
+    prefix = 'ratelimit'
+
+    def __init__(self, alias='default'):
+        from django_redis import get_redis_connection
+        self.client = get_redis_connection(alias)
+        self._hit_script = self.client.register_script(HIT_SCRIPT)
+
+    def _key(self, key):
+        return f'{self.prefix}:{key}'
+
+    def hit(self, key, limit, window):
+        interval = max(1, round(window * 1000 / limit))
+        allowed, remaining, retry_after = self._hit_script(keys=[self._key(key)], args=[interval, window * 1000])
+        return bool(allowed), int(remaining), int(retry_after) / 1000
+
+    def reset(self, key):
+        self.client.delete(self._key(key))
+
+    def clear(self):
+        for key in self.client.scan_iter(f'{self.prefix}:*'):
+            self.client.delete(key)
+
+
+@lru_cache(maxsize=None)
+def get_rate_limiter():
+    return import_string(settings.RATE_LIMITER_BACKEND)()
+
+
+def hit(scope, identifier):
+    """Count a request by `identifier` against the settings.RATE_LIMITS policy named `scope`"""
+    limit, window = parse_rate(settings.RATE_LIMITS[scope])
+    return get_rate_limiter().hit(f'{scope}:{identifier}', limit, window)
+
+
+def reset(scope, identifier):
+    get_rate_limiter().reset(f'{scope}:{identifier}')
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def rate_limit(scope, message, key=client_ip, methods=('POST',)):
+    """
+    Decorator for API view methods: answer 429 with a Retry-After header once
+    the client identified by `key(request)` exceeds the `scope` policy
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method in methods:
+                allowed, _, retry_after = hit(scope, key(request))
+                if not allowed:
+                    return Response(
+                        {"error": message, "detail": "Rate limit exceeded"},
+                        status=status.HTTP_429_TOO_MANY_REQUESTS,
+                        headers={'Retry-After': str(math.ceil(retry_after))},
+                    )
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
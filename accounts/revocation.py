@@ -0,0 +1,158 @@
+import math
+import threading
+import time
+from functools import lru_cache
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+SWEEP_EVERY = 1000
+
+
+class RevocationStore:
+    """
+    Set of revoked token JTIs, each kept until the token would have expired
+    anyway. Lookups never touch the token_blacklist tables.
+    """
+
+    def revoke(self, jti, expires_at):
+        """Revoke a token; `expires_at` is its exp claim in epoch seconds"""
+        raise NotImplementedError
+
+    def is_revoked(self, jti):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class DatabaseRevocationStore(RevocationStore):
+    """
+    The BlacklistedToken table itself, shared by every worker; the default
+    without Redis. RevocableRefreshToken.blacklist() writes the row, so
+    revoking needs nothing more.
+    """
+
+    def revoke(self, jti, expires_at):
+        pass
+
+    def is_revoked(self, jti):
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+    def clear(self):
+        pass
+
+
+class InMemoryRevocationStore(RevocationStore):
+    """Process-local store for tests; other workers and restarts do not see its revocations"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revoked = {}
+        self._revocations = 0
+
+    def revoke(self, jti, expires_at):
+        with self._lock:
+            self._revocations += 1
+            if self._revocations % SWEEP_EVERY == 0:
+                now = time.time()
+                self._revoked = {key: exp for key, exp in self._revoked.items() if exp > now}
+            self._revoked[jti] = expires_at
+
+    def is_revoked(self, jti):
+        expires_at = self._revoked.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def clear(self):
+        with self._lock:
+            self._revoked.clear()
+
+
+class RedisRevocationStore(RevocationStore):
+    """
+    One key per revoked JTI that Redis expires together with the token.
+
+    A marker key records that the keys were loaded from the blacklist. It
+    is read in the same round trip as the JTI; when Redis comes up empty
+    (first start, restart without persistence, flush) lookups fall back to
+    the BlacklistedToken table while one worker reloads the keys.
+    """
+    prefix = 'revoked'
+    loaded_key = 'revocations:loaded'
+    loading_key = 'revocations:loading'
+    loading_timeout = 10 * 60
+
+    def __init__(self, alias='default'):
+        from django_redis import get_redis_connection
+        self.client = get_redis_connection(alias)
+
+    def _key(self, jti):
+        return f'{self.prefix}:{jti}'
+
+    def revoke(self, jti, expires_at):
+        ttl = math.ceil(expires_at - time.time())
+        if ttl > 0:
+            self.client.set(self._key(jti), 1, ex=ttl)
+
+    def is_revoked(self, jti):
+        loaded, revoked = self.client.mget([self.loaded_key, self._key(jti)])
+        if loaded is not None:
+            return revoked is not None
+        self.reload()
+        return revoked is not None or DatabaseRevocationStore().is_revoked(jti)
+
+    def reload(self):
+        """Load the blacklist into Redis unless another worker already is"""
+        if not self.client.set(self.loading_key, 1, nx=True, ex=self.loading_timeout):
+            return
+        try:
+            restore_revocations(store=self)
+            self.client.set(self.loaded_key, 1)
+        finally:
+            self.client.delete(self.loading_key)
+
+    def clear(self):
+        for key in self.client.scan_iter(f'{self.prefix}:*'):
+            self.client.delete(key)
+        self.client.delete(self.loaded_key)
+
+
+@lru_cache(maxsize=None)
+def get_revocation_store():
+    return import_string(settings.TOKEN_REVOCATION_BACKEND)()
+
+
+def restore_revocations(batch_size=None, store=None):
+    """
+    Reload still-valid blacklisted tokens into the store. RedisRevocationStore
+    does this by itself when it finds Redis empty.
+    """
+    batch_size = batch_size or settings.TOKEN_PURGE_BATCH_SIZE
+    store = store or get_revocation_store()
+    restored = 0
+    rows = BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now()).values_list(
+        'token__jti', 'token__expires_at'
+    )
+    for jti, expires_at in rows.iterator(chunk_size=batch_size):
+        store.revoke(jti, expires_at.timestamp())
+        restored += 1
+    return restored
+
+
+def purge_expired_tokens(batch_size=None):
+    """
+    Delete one chunk of expired OutstandingTokens (their BlacklistedTokens
+    cascade); returns the number of outstanding tokens deleted.
+
+    Chunks keep each DELETE short so it does not hold locks on the table
+    the blacklist writes to.
+    """
+    batch_size = batch_size or settings.TOKEN_PURGE_BATCH_SIZE
+    ids = list(
+        OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+        .order_by('id').values_list('id', flat=True)[:batch_size]
+    )
+    if ids:
+        OutstandingToken.objects.filter(id__in=ids).delete()
+    return len(ids)
@@ -30,8 +30,11 @@ class LoginSerializer(serializers.Serializer):
 
 
 # accounts/serializers.py
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import UntypedToken
+from .revocation import get_revocation_store
+from .tokens import RevocableRefreshToken
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
@@ -48,7 +51,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         return token
 
 def get_tokens_for_user(user):
-    refresh = RefreshToken.for_user(user)
+    refresh = RevocableRefreshToken.for_user(user)
 
     # Add custom claims
     refresh['username'] = user.username
@@ -111,6 +114,22 @@ class LogoutSerializer(serializers.Serializer):
 
 
 
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh and rotate tokens against the revocation store"""
+    token_class = RevocableRefreshToken
+
+
+class RevocableTokenVerifySerializer(serializers.Serializer):
+    """TokenVerifySerializer with the blacklist lookup done in the revocation store"""
+    token = serializers.CharField(write_only=True)
+
+    def validate(self, attrs):
+        token = UntypedToken(attrs['token'])
+        if get_revocation_store().is_revoked(token.get(api_settings.JTI_CLAIM)):
+            raise serializers.ValidationError("Token is blacklisted")
+        return {}
+
+
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserProfile
@@ -0,0 +1,9 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .authentication import invalidate_auth_flags
+from .models import User
+
+
+@receiver([post_save, post_delete], sender=User)
+def drop_cached_auth_flags(sender, instance, **kwargs):
+    invalidate_auth_flags(instance.pk)
@@ -0,0 +1,584 @@
+"""
+Synthetic, referentially consistent data at scale, for benchmarks and query
+plan testing; see `manage.py generate_synthetic_data`.
+
+The reference tables (vehicle types, manufacturers, models, service
+categories, services and features) are small and written first by the
+calling process. The large tables are cut into chunks of `batch_size` rows
+and a chunk's rows depend only on the seed, the table and the chunk's
+position: integer ids count on from each table's current maximum, UUIDs and
+every choice another table has to agree on (a vehicle's owner, a sell
+request's status) are hashes of the seed and the row number. Chunks can
+therefore be written by any number of worker processes in any order, and the
+same seed and batch size on the same database give the same rows. Dates are relative to
+midnight UTC of the day of the run.
+
+Rows go in with bulk_create, which skips save() and signals, so the values
+those would fill in (registration keys, inspection ratings) are set here and
+the caches derived from these tables are rebuilt once at the end.
+"""
+import hashlib
+import math
+import multiprocessing
+import os
+import random
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.text import slugify
+from accounts.models import User, UserProfile
+from marketplace.models import Vehicle, SellRequest, InspectionReport, PurchaseOffer
+from repairing_service.catalogue import rebuild_catalogues
+from repairing_service.catalogue_tree import invalidate_catalogue_tree
+from repairing_service.models import Feature, ServiceCategory, Service, ServicePrice, Cart, CartItem
+from repairing_service.pricing import bump_pricing_version
+from repairing_service.search import invalidate_index
+from vehicle.models import VehicleType, Manufacturer, VehicleModel, UserVehicle
+from vehicle.reference import invalidate_reference_data
+from vehicle.registration import normalize_registration, invalidate_registration_index
+
+SYNTHETIC_PASSWORD = 'Synthetic-pass-1'
+DEFAULT_BATCH_SIZE = 5000
+
+# Rows at --scale 1
+SCALE_ROWS = {
+    'users': 200_000,
+    'profiles': 50_000,
+    'user_vehicles': 50_000,
+    'vehicles': 1_000_000,
+    'sell_requests': 100_000,
+    'inspections': 60_000,
+    'offers': 40_000,
+    'service_prices': 200_000,
+    'carts': 50_000,
+    'cart_items': 150_000,
+}
+
+# Tables of a phase only reference tables of earlier phases
+PHASES = (
+    ('users', 'profiles'),
+    ('vehicles', 'user_vehicles', 'service_prices', 'carts'),
+    ('sell_requests', 'cart_items'),
+    ('inspections', 'offers'),
+)
+
+INTEGER_KEYED = {
+    'users': User, 'profiles': UserProfile, 'user_vehicles': UserVehicle, 'vehicles': Vehicle,
+    'sell_requests': SellRequest, 'inspections': InspectionReport, 'offers': PurchaseOffer,
+}
+
+VEHICLE_TYPES = ('Bike', 'Scooter', 'Electric Scooter', 'Electric Bike')
+MANUFACTURERS = (
+    'Hero', 'Honda', 'Bajaj', 'TVS', 'Royal Enfield', 'Yamaha', 'Suzuki', 'KTM', 'Ather', 'Ola Electric',
+    'Jawa', 'Kawasaki', 'Harley-Davidson', 'Triumph', 'Benelli', 'Aprilia', 'Vespa', 'Revolt', 'Okinawa',
+    'Ampere', 'Hero Electric', 'Yezdi', 'BMW Motorrad', 'Ducati', 'Husqvarna', 'Keeway', 'Simple Energy',
+    'Ultraviolette', 'Tork', 'Pure EV', 'Bounce', 'Kinetic Green', 'Lectrix', 'Matter', 'Oben', 'River',
+    'BSA', 'Norton', 'CFMoto', 'Moto Morini',
+)
+MODEL_WORDS = (
+    'Splendor', 'Shine', 'Pulsar', 'Apache', 'Classic', 'Bullet', 'FZ', 'Gixxer', 'Duke', 'Rizta', 'S1',
+    'Activa', 'Jupiter', 'Ntorq', 'Access', 'Dominar', 'Raider', 'Hunter', 'Meteor', 'Himalayan', 'Xpulse',
+    'Glamour', 'Unicorn', 'Hornet', 'Platina', 'Avenger', 'Ronin', 'Sport', 'Street', 'Scrambler',
+)
+ENGINE_SIZES = (100, 110, 125, 150, 200, 350, 450)
+# At least this many; more when the service prices need more (service, model) pairs
+MODELS_PER_MANUFACTURER = 25
+MAX_MODELS_PER_MANUFACTURER = len(MODEL_WORDS) * len(ENGINE_SIZES)
+SERVICE_KINDS = {
+    'General Service': ('Basic Service', 'Standard Service', 'Comprehensive Service', 'Periodic Service'),
+    'Engine': ('Oil Change', 'Engine Tuning', 'Spark Plug Replacement', 'Air Filter Replacement', 'Carburettor Cleaning'),
+    'Brakes': ('Brake Pad Replacement', 'Brake Fluid Change', 'Disc Skimming', 'Brake Shoe Replacement'),
+    'Transmission': ('Chain Lube', 'Chain Sprocket Kit', 'Clutch Plate Replacement', 'Clutch Cable Adjustment'),
+    'Electrical': ('Battery Check', 'Battery Replacement', 'Headlight Repair', 'Wiring Repair', 'Horn Repair'),
+    'Tyres & Wheels': ('Puncture Repair', 'Tyre Replacement', 'Wheel Alignment', 'Wheel Balancing'),
+    'Body & Paint': ('Full Body Paint', 'Scratch Removal', 'Dent Repair', 'Polishing'),
+    'Suspension': ('Fork Oil Change', 'Shock Absorber Service', 'Fork Seal Replacement'),
+    'EV Care': ('Motor Inspection', 'Controller Diagnostics', 'Charger Repair', 'Battery Health Check'),
+    'Washing & Detailing': ('Foam Wash', 'Ceramic Coating', 'Interior Detailing', 'Teflon Coating'),
+}
+SERVICE_VARIANTS = ('', 'Express', 'Premium', 'Doorstep')
+SERVICE_COUNT = sum(len(kinds) for kinds in SERVICE_KINDS.values()) * len(SERVICE_VARIANTS)
+FEATURES = (
+    'Genuine Parts', 'Pickup & Drop', 'Doorstep Service', '30 Day Warranty', 'Free Inspection',
+    'Certified Mechanic', 'Same Day Delivery', 'Digital Report', 'Cashless Insurance', 'Free Wash',
+)
+VEHICLE_FEATURES = ('ABS', 'Disc Brakes', 'Alloy Wheels', 'LED Headlamp', 'Digital Console', 'USB Charging',
+                    'Bluetooth', 'Navigation', 'Tubeless Tyres', 'Self Start')
+HIGHLIGHTS = ('Single Owner', 'Full Service History', 'Insurance Valid', 'New Tyres', 'Accident Free',
+              'Low Mileage', 'Showroom Condition')
+COLORS = ('Black', 'Red', 'Blue', 'White', 'Grey', 'Silver', 'Green', 'Matte Black', 'Yellow', 'Orange')
+FIRST_NAMES = ('Aarav', 'Vivaan', 'Aditya', 'Arjun', 'Sai', 'Ishaan', 'Rohan', 'Kabir', 'Ananya', 'Diya',
+               'Priya', 'Isha', 'Meera', 'Kavya', 'Riya', 'Neha', 'Rahul', 'Vikram', 'Sneha', 'Pooja')
+LAST_NAMES = ('Sharma', 'Verma', 'Patel', 'Reddy', 'Nair', 'Iyer', 'Gupta', 'Singh', 'Kumar', 'Das',
+              'Rao', 'Joshi', 'Mehta', 'Chopra', 'Menon', 'Pillai', 'Bose', 'Kulkarni', 'Shetty', 'Jain')
+CITIES = ('Bengaluru', 'Mumbai', 'Delhi', 'Hyderabad', 'Chennai', 'Pune', 'Kolkata', 'Ahmedabad', 'Jaipur', 'Kochi')
+STATES = ('KA', 'MH', 'DL', 'TS', 'TN', 'UP', 'WB', 'GJ', 'RJ', 'KL')
+EARLY_STATUSES = (
+    SellRequest.Status.SUBMITTED, SellRequest.Status.DOCUMENTS_VERIFIED, SellRequest.Status.PICKUP_SCHEDULED,
+    SellRequest.Status.UNDER_INSPECTION, SellRequest.Status.REJECTED,
+)
+
+
+def _number(seed, *parts):
+    """Deterministic 64-bit number for `parts`, for choices other chunks have to repeat"""
+    digest = hashlib.blake2b(repr((seed, *parts)).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def _uuid(seed, *parts):
+    return uuid.UUID(bytes=hashlib.blake2b(repr((seed, *parts)).encode(), digest_size=16).digest(), version=4)
+
+
+def _registration(number, series):
+    """Unique per `number` and `series`, e.g. 'KA07MV0001234'"""
+    return f'{STATES[number % len(STATES)]}{number // 7 % 99 + 1:02d}{series}{number:07d}'
+
+
+class Plan:
+    """Row counts, first ids and reference rows shared by every chunk; picklable for the workers"""
+
+    def __init__(self, seed, counts, batch_size):
+        self.seed = seed
+        self.counts = counts
+        self.batch_size = batch_size
+        today = timezone.now().astimezone(dt_timezone.utc).date()
+        self.now = datetime.combine(today, time(), tzinfo=dt_timezone.utc)
+        # Long enough a salt that login does not rehash it
+        self.password = make_password(SYNTHETIC_PASSWORD, salt=hashlib.sha256(f'synthetic{seed}'.encode()).hexdigest()[:24])
+        self.first_ids = {
+            table: (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+            for table, model in INTEGER_KEYED.items()
+        }
+        # Hashes depend on where the ids start too, so a second run adds new UUIDs
+        self.key = (seed, *self.first_ids.values())
+        self.models_per_manufacturer = models_per_manufacturer(counts['service_prices'])
+        # Filled in by create_reference_data
+        self.models = []        # (id, name, manufacturer_id, manufacturer name, vehicle type id, vehicle type name)
+        self.services = []      # (uuid, base price)
+
+    def id(self, table, number):
+        return self.first_ids[table] + number
+
+    def owner(self, vehicle_number):
+        """User id owning marketplace vehicle `vehicle_number`; one in ten belongs to nobody"""
+        picked = _number(self.key, 'owner', vehicle_number)
+        if picked % 10 == 0 or not self.counts['users']:
+            return None
+        return self.id('users', picked // 10 % self.counts['users'])
+
+    def seller(self, sell_request_number):
+        return self.owner(sell_request_number) or self.id(
+            'users', _number(self.key, 'seller', sell_request_number) % self.counts['users']
+        )
+
+    def sell_request_status(self, number):
+        """Offers go to the first sell requests, inspections to a few more; the rest are earlier on"""
+        picked = _number(self.key, 'status', number)
+        if number < self.counts['offers']:
+            return SellRequest.Status.DEAL_CLOSED if picked % 5 < 2 else SellRequest.Status.OFFER_MADE
+        if number < self.counts['inspections']:
+            return SellRequest.Status.INSPECTION_DONE
+        return EARLY_STATUSES[picked % len(EARLY_STATUSES)]
+
+
+def models_per_manufacturer(service_prices):
+    """Models to create per manufacturer so each service price has its own (service, model) pair"""
+    models = math.ceil(service_prices / SERVICE_COUNT)
+    return max(MODELS_PER_MANUFACTURER, math.ceil(models / len(MANUFACTURERS)))
+
+
+def plan_counts(scale, overrides=None):
+    """
+    Rows per table at `scale`, with overrides, capped so every row has what
+    it references. Raises ValueError for counts the generator cannot reach.
+    """
+    counts = {table: int(rows * scale) for table, rows in SCALE_ROWS.items()}
+    counts.update(overrides or {})
+    counts['profiles'] = min(counts['profiles'], counts['users'])
+    counts['sell_requests'] = min(counts['sell_requests'], counts['vehicles'])
+    counts['inspections'] = min(counts['inspections'], counts['sell_requests'])
+    counts['offers'] = min(counts['offers'], counts['inspections'])
+    counts['carts'] = min(counts['carts'], counts['users'])
+    if not counts['users']:
+        counts.update(sell_requests=0, inspections=0, offers=0)
+    if not counts['profiles']:
+        counts['user_vehicles'] = 0
+    if not counts['carts']:
+        counts['cart_items'] = 0
+    if models_per_manufacturer(counts['service_prices']) > MAX_MODELS_PER_MANUFACTURER:
+        raise ValueError(
+            f"At most {SERVICE_COUNT * len(MANUFACTURERS) * MAX_MODELS_PER_MANUFACTURER} service prices "
+            f"can be generated, not {counts['service_prices']}"
+        )
+    if counts['cart_items'] > counts['carts'] * SERVICE_COUNT:
+        raise ValueError(
+            f"{counts['carts']} carts of distinct services hold at most {counts['carts'] * SERVICE_COUNT} "
+            f"items, not {counts['cart_items']}"
+        )
+    return counts
+
+
+def _free_name(name, taken, suffix):
+    return f'{name} {suffix}' if name in taken else name
+
+
+def create_reference_data(plan):
+    """Vehicle types (reused), manufacturers, models, categories, services, features and their links"""
+    rng = random.Random(repr((plan.key, 'reference')))
+    types = {vehicle_type.name: vehicle_type for vehicle_type in VehicleType.objects.filter(name__in=VEHICLE_TYPES)}
+    types.update({
+        vehicle_type.name: vehicle_type for vehicle_type in VehicleType.objects.bulk_create(
+            [VehicleType(name=name) for name in VEHICLE_TYPES if name not in types]
+        )
+    })
+
+    first = (Manufacturer.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+    taken = set(Manufacturer.objects.values_list('name', flat=True))
+    manufacturers = Manufacturer.objects.bulk_create([
+        Manufacturer(id=first + n, name=_free_name(name, taken, first + n))
+        for n, name in enumerate(MANUFACTURERS)
+    ])
+    first = (VehicleModel.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+    models = []
+    for manufacturer in manufacturers:
+        electric = 'Electric' in manufacturer.name or manufacturer.name in ('Ather', 'Revolt', 'Okinawa', 'Ampere')
+        names = [(word, size) for word in MODEL_WORDS for size in ENGINE_SIZES]
+        for word, size in rng.sample(names, plan.models_per_manufacturer):
+            type_name = rng.choice(VEHICLE_TYPES[2:] if electric else VEHICLE_TYPES[:2])
+            models.append(VehicleModel(
+                id=first + len(models), name=f'{word} {size}',
+                manufacturer=manufacturer, vehicle_type=types[type_name],
+            ))
+    VehicleModel.objects.bulk_create(models)
+    plan.models = [
+        (model.id, model.name, model.manufacturer.id, model.manufacturer.name, model.vehicle_type.id, model.vehicle_type.name)
+        for model in models
+    ]
+
+    taken = set(Feature.objects.values_list('name', flat=True))
+    features = Feature.objects.bulk_create([
+        Feature(uuid=feature_id, name=_free_name(name, taken, feature_id.hex[:8]))
+        for feature_id, name in ((_uuid(plan.key, 'feature', n), name) for n, name in enumerate(FEATURES))
+    ])
+    taken = set(ServiceCategory.objects.values_list('name', flat=True))
+    categories, services = [], []
+    for position, (category_name, kinds) in enumerate(SERVICE_KINDS.items()):
+        category_id = _uuid(plan.key, 'category', position)
+        name = _free_name(category_name, taken, category_id.hex[:8])
+        categories.append(ServiceCategory(uuid=category_id, name=name, slug=slugify(name)))
+        for kind in kinds:
+            for variant in SERVICE_VARIANTS:
+                service_id = _uuid(plan.key, 'service', len(services))
+                name = f'{variant} {kind}'.strip()
+                services.append(Service(
+                    uuid=service_id, name=name, slug=f'{slugify(name)}-{service_id.hex[:8]}',
+                    category=categories[-1], base_price=Decimal(rng.randrange(200, 5000, 50)),
+                    discount=Decimal(rng.choice((0, 0, 5, 10, 15))), description=f'{name} by certified mechanics.',
+                    duration=f'{rng.choice((30, 45, 60, 90, 120, 240))} min',
+                    warranty=rng.choice(('No warranty', '1 month', '3 months', '6 months')),
+                    recommended=rng.choice(('Yes', 'No')),
+                ))
+    ServiceCategory.objects.bulk_create(categories)
+    Service.objects.bulk_create(services)
+    plan.services = [(service.uuid, service.base_price) for service in services]
+
+    # Most services fit every vehicle; the rest are linked to some manufacturers or models
+    manufacturer_links, model_links, feature_links = [], [], []
+    for service in services:
+        kind = rng.random()
+        if kind < 0.25:
+            manufacturer_links += [
+                Service.manufacturers.through(service_id=service.uuid, manufacturer_id=manufacturer.id)
+                for manufacturer in rng.sample(manufacturers, rng.randint(2, 10))
+            ]
+        elif kind < 0.35:
+            model_links += [
+                Service.vehicles_models.through(service_id=service.uuid, vehiclemodel_id=model[0])
+                for model in rng.sample(plan.models, min(len(plan.models), rng.randint(5, 40)))
+            ]
+        feature_links += [
+            Service.features.through(service_id=service.uuid, feature_id=feature.uuid)
+            for feature in rng.sample(features, rng.randint(1, 4))
+        ]
+    Service.manufacturers.through.objects.bulk_create(manufacturer_links)
+    Service.vehicles_models.through.objects.bulk_create(model_links)
+    Service.features.through.objects.bulk_create(feature_links)
+
+
+def build_users(plan, rng, start, stop):
+    for number in range(start, stop):
+        user_id = plan.id('users', number)
+        active = rng.random() < 0.95
+        yield User(
+            id=user_id, username=f'user{user_id}', email=f'user{user_id}@example.com', password=plan.password,
+            first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+            is_active=active, email_verified=active,
+            date_joined=plan.now - timedelta(days=rng.randint(0, 1095), seconds=rng.randint(0, 86399)),
+            last_login=plan.now - timedelta(days=rng.randint(0, 60)) if active and rng.random() < 0.7 else None,
+        )
+
+
+def build_profiles(plan, rng, start, stop):
+    """The profile of the user with the same row number"""
+    for number in range(start, stop):
+        user_id = plan.id('users', number)
+        _, model_name, _, manufacturer_name, _, type_name = rng.choice(plan.models)
+        yield UserProfile(
+            id=plan.id('profiles', number), email=f'user{user_id}@example.com',
+            name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}', username=f'user{user_id}',
+            address=f'{rng.randint(1, 999)}, {rng.randint(1, 40)}th Cross, {rng.choice(CITIES)}',
+            profile_photo='', vehicle_name=model_name, vehicle_type=type_name, manufacturer=manufacturer_name,
+        )
+
+
+def build_user_vehicles(plan, rng, start, stop):
+    for number in range(start, stop):
+        vehicle_id = plan.id('user_vehicles', number)
+        model_id, _, manufacturer_id, _, type_id, _ = rng.choice(plan.models)
+        registration_number = _registration(vehicle_id, 'UV')
+        yield UserVehicle(
+            id=vehicle_id, user_id=plan.id('profiles', rng.randrange(plan.counts['profiles'])),
+            vehicle_type_id=type_id, manufacturer_id=manufacturer_id, model_id=model_id,
+            registration_number=registration_number, registration_key=normalize_registration(registration_number),
+            purchase_date=(plan.now - timedelta(days=rng.randint(30, 3650))).date(),
+            updated_at=plan.now - timedelta(days=rng.randint(0, 365)),
+        )
+
+
+def build_vehicles(plan, rng, start, stop):
+    current_year = plan.now.year
+    for number in range(start, stop):
+        vehicle_id = plan.id('vehicles', number)
+        _, model_name, _, manufacturer_name, _, type_name = rng.choice(plan.models)
+        vehicle_type = slugify(type_name).replace('-', '_')
+        electric = vehicle_type.startswith('electric')
+        year = rng.randint(max(2008, current_year - 15), current_year)
+        age = current_year - year
+        kms = rng.randint(age * 3000, age * 12000 + 2000)
+        price = Decimal(max(15000, rng.randint(40000, 250000) - age * 6000 - kms // 10)).quantize(Decimal('1'))
+        if number < plan.counts['sell_requests']:
+            status = {
+                SellRequest.Status.DEAL_CLOSED: Vehicle.Status.AVAILABLE,
+                SellRequest.Status.OFFER_MADE: Vehicle.Status.INSPECTION_DONE,
+                SellRequest.Status.INSPECTION_DONE: Vehicle.Status.INSPECTION_DONE,
+            }.get(plan.sell_request_status(number), Vehicle.Status.UNDER_INSPECTION)
+        else:
+            status = Vehicle.Status.AVAILABLE if rng.random() < 0.75 else Vehicle.Status.SOLD
+        created_at = plan.now - timedelta(days=rng.randint(0, 730), seconds=rng.randint(0, 86399))
+        registration_number = _registration(vehicle_id, 'MV')
+        yield Vehicle(
+            id=vehicle_id, owner_id=plan.owner(number), vehicle_type=vehicle_type,
+            brand=manufacturer_name[:50], model=model_name[:50], year=year,
+            registration_number=registration_number, registration_key=normalize_registration(registration_number),
+            kms_driven=kms, fuel_type=Vehicle.FuelType.ELECTRIC if electric else Vehicle.FuelType.PETROL,
+            engine_capacity=rng.choice((1500, 2500, 3000, 4000)) if electric else rng.choice((100, 110, 125, 150, 200, 350)),
+            color=rng.choice(COLORS),
+            last_service_date=(plan.now - timedelta(days=rng.randint(10, 400))).date() if rng.random() < 0.8 else None,
+            insurance_valid_till=(plan.now + timedelta(days=rng.randint(-100, 365))).date() if rng.random() < 0.9 else None,
+            status=status, price=price, emi_available=rng.random() < 0.6,
+            emi_months=[12, 24, 36][:rng.randint(1, 3)],
+            images={
+                'thumbnail': f'vehicles/{vehicle_id}/thumbnail.jpg',
+                'main': f'vehicles/{vehicle_id}/main.jpg',
+                'gallery': [f'vehicles/{vehicle_id}/{n}.jpg' for n in range(rng.randint(0, 5))],
+            } if rng.random() < 0.85 else {},
+            features=rng.sample(VEHICLE_FEATURES, rng.randint(1, 5)),
+            highlights=rng.sample(HIGHLIGHTS, rng.randint(0, 3)),
+            created_at=created_at, updated_at=created_at + timedelta(days=rng.randint(0, 30)),
+        )
+
+
+def build_sell_requests(plan, rng, start, stop):
+    """Sell request n is for marketplace vehicle n"""
+    for number in range(start, stop):
+        status = plan.sell_request_status(number)
+        created_at = plan.now - timedelta(days=rng.randint(0, 365), seconds=rng.randint(0, 86399))
+        yield SellRequest(
+            id=plan.id('sell_requests', number), user_id=plan.seller(number),
+            vehicle_id=plan.id('vehicles', number),
+            documents={doc: f'sell_requests/{number}/{doc}.pdf' for doc in ('rc', 'insurance', 'puc') if rng.random() < 0.9},
+            photos=[{'view': view, 'path': f'sell_requests/{number}/{view}.jpg'} for view in ('front', 'back', 'left', 'right')],
+            pickup_slot=created_at.replace(hour=rng.randint(9, 17), minute=0, second=0) + timedelta(days=rng.randint(1, 7)),
+            pickup_address=f'{rng.randint(1, 999)}, {rng.randint(1, 40)}th Main, {rng.choice(CITIES)}',
+            contact_number=f'9{rng.randint(100000000, 999999999)}', status=status,
+            rejection_reason='Documents could not be verified' if status == SellRequest.Status.REJECTED else None,
+            created_at=created_at, updated_at=created_at + timedelta(days=rng.randint(0, 20)),
+        )
+
+
+def build_inspections(plan, rng, start, stop):
+    """Inspection n is of sell request n"""
+    for number in range(start, stop):
+        conditions = [rng.choices((1, 2, 3, 4, 5), weights=(1, 3, 8, 10, 5))[0] for _ in range(8)]
+        created_at = plan.now - timedelta(days=rng.randint(0, 300))
+        yield InspectionReport(
+            id=plan.id('inspections', number), sell_request_id=plan.id('sell_requests', number),
+            inspector_id=plan.id('users', rng.randrange(plan.counts['users'])),
+            engine_condition=conditions[0], transmission_condition=conditions[1],
+            suspension_condition=conditions[2], tyre_condition=conditions[3], brake_condition=conditions[4],
+            electrical_condition=conditions[5], frame_condition=conditions[6], paint_condition=conditions[7],
+            # As InspectionReport.save() would
+            overall_rating=round(sum(conditions) / len(conditions)),
+            passed=all(condition >= InspectionReport.Condition.BELOW_AVERAGE for condition in conditions),
+            estimated_repair_cost=Decimal(sum((5 - condition) * 750 for condition in conditions)),
+            remarks=rng.choice(('', 'Minor scratches on tank', 'Chain needs replacement', 'Well maintained')),
+            inspection_photos=[f'inspections/{number}/{n}.jpg' for n in range(rng.randint(2, 6))],
+            created_at=created_at, updated_at=created_at,
+        )
+
+
+def build_offers(plan, rng, start, stop):
+    """Offer n is for sell request n, accepted when that deal closed"""
+    for number in range(start, stop):
+        market_value = Decimal(rng.randrange(20000, 250000, 500))
+        offer_price = (market_value * Decimal(rng.uniform(0.75, 0.95))).quantize(Decimal('1'))
+        created_at = plan.now - timedelta(days=rng.randint(0, 200))
+        yield PurchaseOffer(
+            id=plan.id('offers', number), sell_request_id=plan.id('sell_requests', number),
+            market_value=market_value, offer_price=offer_price,
+            price_breakdown={'market_value': str(market_value), 'deductions': str(market_value - offer_price)},
+            is_negotiable=rng.random() < 0.7,
+            accepted=plan.sell_request_status(number) == SellRequest.Status.DEAL_CLOSED,
+            counter_offer=(offer_price * Decimal('1.05')).quantize(Decimal('1')) if rng.random() < 0.2 else None,
+            valid_until=created_at + timedelta(days=7), created_at=created_at, updated_at=created_at,
+        )
+
+
+def build_service_prices(plan, rng, start, stop):
+    """Price n is for a distinct (service, model) pair, with the model's manufacturer"""
+    for number in range(start, stop):
+        service_id, base_price = plan.services[number % len(plan.services)]
+        model_id, _, manufacturer_id, _, _, _ = plan.models[number // len(plan.services)]
+        yield ServicePrice(
+            uuid=_uuid(plan.key, 'service_price', number), service_id=service_id,
+            manufacturer_id=manufacturer_id, vehicles_model_id=model_id,
+            price=(base_price * Decimal(rng.uniform(0.8, 1.6))).quantize(Decimal('1')),
+        )
+
+
+def build_carts(plan, rng, start, stop):
+    """Cart n belongs to user n"""
+    for number in range(start, stop):
+        yield Cart(uuid=_uuid(plan.key, 'cart', number), user_id=plan.id('users', number))
+
+
+def build_cart_items(plan, rng, start, stop):
+    """Item n goes in cart n % carts; each cart holds distinct services"""
+    carts = plan.counts['carts']
+    for number in range(start, stop):
+        cart, position = number % carts, number // carts
+        offset = _number(plan.key, 'cart_offset', cart)
+        yield CartItem(
+            uuid=_uuid(plan.key, 'cart_item', number), cart_id=_uuid(plan.key, 'cart', cart),
+            service_id=plan.services[(offset + position) % len(plan.services)][0], quantity=rng.randint(1, 3),
+        )
+
+
+BUILDERS = {
+    'users': (User, build_users),
+    'profiles': (UserProfile, build_profiles),
+    'user_vehicles': (UserVehicle, build_user_vehicles),
+    'vehicles': (Vehicle, build_vehicles),
+    'sell_requests': (SellRequest, build_sell_requests),
+    'inspections': (InspectionReport, build_inspections),
+    'offers': (PurchaseOffer, build_offers),
+    'service_prices': (ServicePrice, build_service_prices),
+    'carts': (Cart, build_carts),
+    'cart_items': (CartItem, build_cart_items),
+}
+
+
+@contextmanager
+def generated_timestamps(model):
+    """Let bulk_create keep the timestamps set on the rows instead of stamping them with now"""
+    fields = [field for field in model._meta.concrete_fields if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def write_chunk(plan, table, index):
+    """Generate and insert chunk `index` of `table`; returns the number of rows"""
+    model, build = BUILDERS[table]
+    start = index * plan.batch_size
+    stop = min(start + plan.batch_size, plan.counts[table])
+    rng = random.Random(repr((plan.key, table, index)))
+    rows = list(build(plan, rng, start, stop))
+    with generated_timestamps(model), transaction.atomic():
+        model.objects.bulk_create(rows, batch_size=plan.batch_size)
+    return len(rows)
+
+
+def _start_worker():
+    django.setup()
+
+
+def generate(plan, workers=1, progress=None):
+    """
+    Write every table of `plan` after its reference data, phase by phase,
+    with `workers` processes; `progress(table, rows)` is told about each chunk
+    """
+    with transaction.atomic():
+        create_reference_data(plan)
+    chunks = [
+        [(table, index) for table in phase for index in range(math.ceil(plan.counts[table] / plan.batch_size))]
+        for phase in PHASES
+    ]
+    if workers <= 1:
+        for phase in chunks:
+            for table, index in phase:
+                rows = write_chunk(plan, table, index)
+                if progress:
+                    progress(table, rows)
+    else:
+        # Children open their own connections. Forked, they also keep settings
+        # changed at runtime, such as the test database of benchmarks/load.py
+        connections.close_all()
+        context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_start_worker) as pool:
+            for phase in chunks:
+                futures = {pool.submit(write_chunk, plan, table, index): table for table, index in phase}
+                for future, table in futures.items():
+                    rows = future.result()
+                    if progress:
+                        progress(table, rows)
+    reset_sequences()
+    refresh_derived_data()
+
+
+def reset_sequences():
+    """Move the id sequences past the ids assigned here (Postgres; SQLite keeps track itself)"""
+    models = [*INTEGER_KEYED.values(), VehicleType, Manufacturer, VehicleModel]
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+
+def refresh_derived_data():
+    """What the skipped signals would have invalidated, once"""
+    bump_pricing_version()
+    rebuild_catalogues()
+    invalidate_catalogue_tree()
+    invalidate_index()
+    invalidate_reference_data()
+    invalidate_registration_index()
+
+
+def default_workers():
+    """One per CPU, but SQLite takes one writer at a time"""
+    return 1 if connection.vendor == 'sqlite' else os.cpu_count() or 1
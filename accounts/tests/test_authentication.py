@@ -0,0 +1,85 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from accounts.authentication import ClaimsJWTAuthentication
+from accounts.models import User
+from accounts.serializers import get_tokens_for_user
+
+
+@pytest.fixture
+def rider(db):
+    cache.clear()
+    user = User.objects.create_user(username='rider', email='rider@example.com', password='Secret123!',
+                                    email_verified=True)
+    return user
+
+
+def _client(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(user)['access']}")
+    return client
+
+
+def _user_queries(queries):
+    return [query['sql'] for query in queries if 'FROM "accounts_user"' in query['sql']]
+
+
+def test_request_user_comes_from_claims(rider):
+    client = _client(rider)
+    client.get(reverse('sellrequest-list'))
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(reverse('sellrequest-list'))
+
+    assert response.status_code == 200
+    assert _user_queries(queries.captured_queries) == []
+
+
+def test_claims_user_behaves_like_the_row(rider):
+    token = RefreshToken(get_tokens_for_user(rider)['refresh']).access_token
+    user = ClaimsJWTAuthentication().get_user(token)
+
+    assert user == rider
+    assert (user.email, user.username, user.email_verified, user.is_staff) == (
+        'rider@example.com', 'rider', True, False,
+    )
+    assert user.is_authenticated
+    # Fields not in the token are loaded on first use
+    assert user.get_deferred_fields() >= {'first_name', 'password'}
+    assert user.first_name == ''
+
+
+def test_password_change_revokes_tokens(rider):
+    client = _client(rider)
+    assert client.get(reverse('sellrequest-list')).status_code == 200
+
+    rider.set_password('Another456!')
+    rider.save()
+
+    response = client.get(reverse('sellrequest-list'))
+    assert response.status_code == 401
+    assert response.data['code'] == 'password_changed'
+
+
+def test_deactivated_user_is_rejected(rider):
+    client = _client(rider)
+    assert client.get(reverse('sellrequest-list')).status_code == 200
+
+    rider.is_active = False
+    rider.save()
+
+    assert client.get(reverse('sellrequest-list')).status_code == 401
+
+
+def test_staff_flag_is_not_taken_from_the_token(rider):
+    client = _client(rider)
+    User.objects.filter(pk=rider.pk).update(is_staff=True)
+    cache.clear()
+
+    token = RefreshToken(get_tokens_for_user(rider)['refresh']).access_token
+    assert ClaimsJWTAuthentication().get_user(token).is_staff is True
+    assert client.get(reverse('sellrequest-list')).status_code == 200
@@ -0,0 +1,122 @@
+import io
+import smtplib
+import pytest
+from datetime import timedelta
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.email_queue import claim_batch, queue_email, retry_delay, send_queued_emails
+from accounts.models import QueuedEmail, User
+from accounts.ratelimit import get_rate_limiter
+
+
+class FlakyBackend(EmailBackend):
+    """Rejects messages to the given recipients, delivers the rest to mail.outbox"""
+
+    def __init__(self, rejected=(), **kwargs):
+        super().__init__(**kwargs)
+        self.rejected = set(rejected)
+        self.opened = 0
+
+    def open(self):
+        self.opened += 1
+
+    def send_messages(self, messages):
+        for message in messages:
+            if self.rejected & set(message.to):
+                raise smtplib.SMTPRecipientsRefused({message.to[0]: (550, b'No such user')})
+        return super().send_messages(messages)
+
+
+@pytest.fixture(autouse=True)
+def limits(settings):
+    settings.RATE_LIMITER_BACKEND = 'accounts.ratelimit.InMemoryRateLimiter'
+    get_rate_limiter.cache_clear()
+    yield
+    get_rate_limiter.cache_clear()
+
+
+@pytest.mark.django_db
+def test_signup_queues_verification_instead_of_sending():
+    response = APIClient().post(reverse('signup'), {
+        'username': 'newrider', 'email': 'new@example.com', 'password': 'Secret123!',
+    })
+
+    assert response.status_code == 201
+    assert mail.outbox == []
+    queued = QueuedEmail.objects.get()
+    assert queued.recipients == ['new@example.com']
+    assert '/api/accounts/verify-email/' in queued.body
+
+    call_command('send_queued_emails', stdout=io.StringIO())
+
+    assert [message.subject for message in mail.outbox] == ['Verify Your Email']
+    assert QueuedEmail.objects.get().status == 'sent'
+
+
+@pytest.mark.django_db
+def test_password_reset_is_queued():
+    User.objects.create_user(username='rider', email='rider@example.com', password='Secret123!')
+
+    response = APIClient().post(reverse('password-reset'), {'email': 'rider@example.com'})
+
+    assert response.status_code == 200
+    assert QueuedEmail.objects.get().subject == 'Password Reset Request'
+
+
+@pytest.mark.django_db
+def test_batch_shares_one_connection_and_retries_failures(settings):
+    settings.EMAIL_QUEUE_MAX_ATTEMPTS = 2
+    for n in range(3):
+        queue_email('Hello', 'Body', [f'rider{n}@example.com'])
+    backend = FlakyBackend(rejected={'rider1@example.com'})
+
+    assert send_queued_emails(connection=backend) == 3
+
+    assert backend.opened == 1
+    assert sorted(message.to[0] for message in mail.outbox) == ['rider0@example.com', 'rider2@example.com']
+    failed = QueuedEmail.objects.get(recipients=['rider1@example.com'])
+    assert (failed.status, failed.attempts) == ('pending', 1)
+    assert 'SMTPRecipientsRefused' in failed.last_error
+    assert failed.next_attempt_at > timezone.now() + timedelta(seconds=20)
+    # Not due yet
+    assert send_queued_emails(connection=backend) == 0
+
+    QueuedEmail.objects.filter(pk=failed.pk).update(next_attempt_at=timezone.now())
+    send_queued_emails(connection=backend)
+    assert QueuedEmail.objects.get(pk=failed.pk).status == 'failed'
+
+
+@pytest.mark.django_db
+def test_each_message_is_marked_sent_as_it_goes_out():
+    for n in range(3):
+        queue_email('Hello', 'Body', [f'rider{n}@example.com'])
+    already_sent = []
+
+    class CountingBackend(FlakyBackend):
+        def send_messages(self, messages):
+            already_sent.append(QueuedEmail.objects.filter(status='sent').count())
+            return super().send_messages(messages)
+
+    send_queued_emails(connection=CountingBackend())
+
+    assert already_sent == [0, 1, 2]
+
+
+@pytest.mark.django_db
+def test_lease_outlasts_a_batch_on_a_slow_relay(settings):
+    settings.EMAIL_TIMEOUT = 10
+    queue_email('Hello', 'Body', ['rider@example.com'])
+
+    claim_batch(50)
+
+    # 50 messages, each with several SMTP commands that may take 10s
+    assert QueuedEmail.objects.get().next_attempt_at > timezone.now() + timedelta(seconds=50 * 3 * 10)
+
+
+def test_retry_backoff_is_capped(settings):
+    assert [retry_delay(attempts).total_seconds() for attempts in (1, 2, 3)] == [30, 60, 120]
+    assert retry_delay(20).total_seconds() == settings.EMAIL_QUEUE_MAX_RETRY_SECONDS
@@ -0,0 +1,105 @@
+import time
+import pytest
+from django.contrib.auth import hashers
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+from accounts.models import User
+from accounts.login import MAX_FAILED_LOGINS
+from accounts.ratelimit import get_rate_limiter
+
+PASSWORD = 'Secret123!'
+
+
+@pytest.fixture
+def rider(db, settings):
+    # The budget counts the login's own queries, not the shared limiter's
+    settings.RATE_LIMITER_BACKEND = 'accounts.ratelimit.InMemoryRateLimiter'
+    get_rate_limiter.cache_clear()
+    cache.clear()
+    yield User.objects.create_user(username='rider', email='rider@example.com', password=PASSWORD)
+    get_rate_limiter.cache_clear()
+
+
+class CacheCalls:
+    """Counts round trips to the default cache; LocMemCache's get_many calling get is one"""
+
+    def __init__(self, monkeypatch):
+        self.calls = []
+        self.depth = 0
+        for name in ('get', 'get_many', 'set', 'add', 'incr', 'delete', 'delete_many'):
+            method = getattr(cache, name)
+            monkeypatch.setattr(cache, name, self._counted(name, method))
+
+    def _counted(self, name, method):
+        def counted(*args, **kwargs):
+            if not self.depth:
+                self.calls.append(name)
+            self.depth += 1
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.depth -= 1
+        return counted
+
+
+def _login(password=PASSWORD, email='rider@example.com', ip='10.1.0.1'):
+    return APIClient(REMOTE_ADDR=ip).post(reverse('login'), {'email': email, 'password': password})
+
+
+def test_login_fast_path_budget(rider, monkeypatch, django_assert_num_queries):
+    """Microbenchmark guard: one user query, one cache read, one password hash"""
+    verifications = []
+    check_password = hashers.check_password
+    monkeypatch.setattr(hashers, 'check_password', lambda *args: verifications.append(1) or check_password(*args))
+    cache_calls = CacheCalls(monkeypatch)
+
+    # Issuing tokens records nothing, so the user lookup is the only query
+    with django_assert_num_queries(1):
+        started = time.perf_counter()
+        response = _login()
+        elapsed = time.perf_counter() - started
+
+    assert response.status_code == 200
+    assert response.data['tokens']['access']
+    assert cache_calls.calls == ['get_many']
+    assert len(verifications) == 1
+    # One PBKDF2 verification dominates; generous to stay stable on slow CI
+    assert elapsed < 5
+
+
+def test_unknown_email_still_hashes(rider, monkeypatch):
+    hashed = []
+    make_password = hashers.make_password
+    monkeypatch.setattr(hashers, 'make_password', lambda *args: hashed.append(1) or make_password(*args))
+
+    assert _login(email='ghost@example.com').status_code == 401
+    assert hashed == [1]
+
+
+def test_inactive_user_must_verify(rider):
+    User.objects.filter(pk=rider.pk).update(is_active=False)
+
+    response = _login()
+
+    assert response.status_code == 401
+    assert response.data['email_verification_required'] is True
+
+
+def test_repeated_failures_lock_the_account(rider):
+    statuses = [_login('wrong', ip=f'10.2.0.{n}').status_code for n in range(MAX_FAILED_LOGINS)]
+    assert statuses == [401] * MAX_FAILED_LOGINS
+
+    response = _login(ip='10.3.0.1')
+    assert response.status_code == 429
+    assert 'Account locked' in response.data['error']
+
+
+def test_success_clears_failed_attempts(rider):
+    for n in range(MAX_FAILED_LOGINS - 1):
+        _login('wrong', ip=f'10.4.0.{n}')
+
+    assert _login(ip='10.5.0.1').status_code == 200
+    assert cache.get('login_attempts_rider@example.com') is None
+    assert _login('wrong', ip='10.5.0.2').status_code == 401
+    assert _login(ip='10.5.0.3').status_code == 200
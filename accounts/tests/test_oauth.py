@@ -0,0 +1,152 @@
+import json
+import threading
+import time
+import jwt
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.urls import reverse
+from rest_framework.test import APIClient
+from accounts.models import User
+from accounts.oauth import OAuthError, OpenIDProvider, get_google_provider
+
+CLIENT_ID = 'rmb-client'
+
+
+class ProviderStandIn(ThreadingHTTPServer):
+    """Local OpenID provider: discovery, JWKS and a token endpoint that signs `claims`"""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), ProviderHandler)
+        self.url = f'http://127.0.0.1:{self.server_address[1]}'
+        self.key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.kid = 'key-1'
+        self.claims = {}
+        self.requests = []
+        self.token_delay = 0
+
+    def id_token(self, **overrides):
+        now = int(time.time())
+        claims = {
+            'iss': self.url, 'aud': CLIENT_ID, 'sub': '1234', 'iat': now, 'exp': now + 300,
+            'email': 'rider@example.com', 'email_verified': True, 'name': 'rider',
+        }
+        claims.update(self.claims, **overrides)
+        return jwt.encode(claims, self.key, algorithm='RS256', headers={'kid': self.kid})
+
+    def handle_error(self, request, client_address):
+        # Clients that timed out hang up mid-response
+        pass
+
+
+class ProviderHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def reply(self, document):
+        body = json.dumps(document).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.path)
+        if self.path == '/.well-known/openid-configuration':
+            self.reply({'issuer': server.url, 'token_endpoint': f'{server.url}/token', 'jwks_uri': f'{server.url}/jwks'})
+        else:
+            jwk = jwt.algorithms.RSAAlgorithm.to_jwk(server.key.public_key(), as_dict=True)
+            self.reply({'keys': [dict(jwk, kid=server.kid, alg='RS256', use='sig')]})
+
+    def do_POST(self):
+        server = self.server
+        form = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode())
+        server.requests.append(self.path)
+        time.sleep(server.token_delay)
+        if form.get('code') != ['good-code']:
+            self.send_response(400)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.reply({'access_token': 'access', 'id_token': server.id_token()})
+
+
+@pytest.fixture
+def provider_server():
+    server = ProviderStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def google(provider_server, settings):
+    settings.GOOGLE_OAUTH_DISCOVERY_URL = f'{provider_server.url}/.well-known/openid-configuration'
+    settings.GOOGLE_CLIENT_ID = CLIENT_ID
+    get_google_provider.cache_clear()
+    yield provider_server
+    get_google_provider.cache_clear()
+
+
+@pytest.mark.django_db
+def test_sign_in_costs_one_call_once_metadata_is_cached(google):
+    client = APIClient()
+
+    response = client.get(reverse('google-callback'), {'code': 'good-code'})
+
+    assert response.status_code == 200
+    assert response.json()['user']['email'] == 'rider@example.com'
+    assert User.objects.get(email='rider@example.com').email_verified
+    assert google.requests == ['/.well-known/openid-configuration', '/jwks', '/token']
+
+    google.requests.clear()
+    assert client.get(reverse('google-callback'), {'code': 'good-code'}).status_code == 200
+    assert google.requests == ['/token']
+
+
+@pytest.mark.django_db
+def test_rejected_code_and_untrusted_tokens_fail_cleanly(google):
+    client = APIClient()
+
+    assert client.get(reverse('google-callback'), {'code': 'bad-code'}).status_code == 400
+
+    google.claims = {'aud': 'someone-else'}
+    assert client.get(reverse('google-callback'), {'code': 'good-code'}).status_code == 400
+
+    google.claims = {'email_verified': False}
+    assert client.get(reverse('google-callback'), {'code': 'good-code'}).status_code == 400
+    assert not User.objects.exists()
+
+
+def test_rotated_signing_key_is_refetched(provider_server):
+    clock = [0]
+    provider = OpenIDProvider(
+        f'{provider_server.url}/.well-known/openid-configuration', CLIENT_ID, 'secret', 'http://testserver/',
+        clock=lambda: clock[0],
+    )
+    provider.verify_id_token(provider_server.id_token())
+
+    provider_server.kid = 'key-2'
+    rotated = provider_server.id_token()
+    with pytest.raises(OAuthError):
+        # Unknown key ids refetch at most once a minute
+        provider.verify_id_token(rotated)
+    clock[0] = 61
+    assert provider.verify_id_token(rotated)['sub'] == '1234'
+    assert provider_server.requests.count('/jwks') == 2
+
+
+def test_slow_provider_times_out(provider_server, settings):
+    settings.OAUTH_HTTP_TIMEOUT = (1, 0.2)
+    provider_server.token_delay = 0.5
+    provider = OpenIDProvider(
+        f'{provider_server.url}/.well-known/openid-configuration', CLIENT_ID, 'secret', 'http://testserver/',
+    )
+
+    with pytest.raises(OAuthError, match='timed out'):
+        provider.authenticate('good-code')
@@ -0,0 +1,97 @@
+import io
+import re
+import pytest
+from datetime import timedelta
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import OneTimeToken, QueuedEmail, User
+from accounts.one_time_tokens import find_token, hash_token, issue_token, purge_expired_one_time_tokens
+from accounts.ratelimit import get_rate_limiter
+
+
+@pytest.fixture(autouse=True)
+def limits():
+    get_rate_limiter().clear()
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create_user(username='rider', email='rider@example.com', password='Secret123!')
+
+
+def emailed_token(path):
+    return re.search(rf'/api/accounts/{path}/(\w+)/', QueuedEmail.objects.latest('id').body).group(1)
+
+
+@pytest.mark.django_db
+def test_signup_link_verifies_once(django_assert_num_queries):
+    client = APIClient()
+    client.post(reverse('signup'), {'username': 'newrider', 'email': 'new@example.com', 'password': 'Secret123!'})
+    token = emailed_token('verify-email')
+
+    stored = OneTimeToken.objects.get()
+    assert stored.pk == hash_token(token) != token
+    assert stored.purpose == 'verify_email'
+
+    # Token with user, consume (two deletes), save; plus the savepoint pair
+    with django_assert_num_queries(6):
+        response = client.get(reverse('verify-email', args=[token]))
+
+    assert response.status_code == 200
+    user = User.objects.get(email='new@example.com')
+    assert user.is_active and user.email_verified
+    assert not OneTimeToken.objects.exists()
+    assert client.get(reverse('verify-email', args=[token])).status_code == 400
+
+
+@pytest.mark.django_db
+def test_expired_or_wrong_purpose_tokens_are_rejected(user):
+    token = issue_token(user, 'verify_email')
+
+    assert find_token(token, 'password_reset') is None
+    OneTimeToken.objects.update(expires_at=timezone.now())
+    assert find_token(token, 'verify_email') is None
+
+
+@pytest.mark.django_db
+def test_password_reset_voids_the_other_links(user):
+    client = APIClient()
+    client.post(reverse('password-reset'), {'email': 'rider@example.com'})
+    older = issue_token(user, 'password_reset')
+    token = emailed_token('password-reset')
+
+    response = client.post(reverse('password-reset-confirm', args=[token]), {'password': 'N3w-Secret!'})
+
+    assert response.status_code == 200
+    user.refresh_from_db()
+    assert user.check_password('N3w-Secret!')
+    assert client.post(
+        reverse('password-reset-confirm', args=[older]), {'password': 'Other-Secret1!'}
+    ).status_code == 400
+
+
+@pytest.mark.django_db
+def test_reused_password_keeps_the_link(user):
+    token = issue_token(user, 'password_reset')
+
+    response = APIClient().post(reverse('password-reset-confirm', args=[token]), {'password': 'Secret123!'})
+
+    assert response.status_code == 400
+    assert find_token(token, 'password_reset') is not None
+
+
+@pytest.mark.django_db
+def test_purge_deletes_expired_tokens_in_chunks(user):
+    for _ in range(5):
+        issue_token(user, 'verify_email')
+    live = issue_token(user, 'password_reset')
+    OneTimeToken.objects.filter(purpose='verify_email').update(expires_at=timezone.now() - timedelta(minutes=1))
+
+    assert purge_expired_one_time_tokens(batch_size=2) == 2
+    out = io.StringIO()
+    call_command('purge_expired_tokens', batch_size=2, pause=0, stdout=out)
+
+    assert 'Purged 3 expired one-time tokens' in out.getvalue()
+    assert list(OneTimeToken.objects.values_list('key', flat=True)) == [hash_token(live)]
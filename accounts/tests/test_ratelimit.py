@@ -0,0 +1,96 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from accounts.models import RateLimitBucket
+from accounts.ratelimit import DatabaseRateLimiter, InMemoryRateLimiter, get_rate_limiter, parse_rate
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def limiter():
+    get_rate_limiter().clear()
+    yield get_rate_limiter()
+    get_rate_limiter().clear()
+
+
+@pytest.mark.parametrize('rate, parsed', [
+    ('5/m', (5, 60)),
+    ('3/h', (3, 3600)),
+    ('10/15m', (10, 900)),
+])
+def test_parse_rate(rate, parsed):
+    assert parse_rate(rate) == parsed
+
+
+def test_parse_rate_rejects_garbage():
+    with pytest.raises(ValueError):
+        parse_rate('five per minute')
+
+
+def test_bucket_allows_burst_then_refills_smoothly():
+    clock = FakeClock()
+    limiter = InMemoryRateLimiter(clock=clock)
+
+    results = [limiter.hit('login:1.2.3.4', 5, 60) for _ in range(6)]
+
+    assert [allowed for allowed, _, _ in results] == [True] * 5 + [False]
+    assert [remaining for _, remaining, _ in results[:5]] == [4, 3, 2, 1, 0]
+    assert results[5][2] == pytest.approx(12)
+    # Other clients have their own bucket
+    assert limiter.hit('login:5.6.7.8', 5, 60)[0]
+
+    clock.now += 12
+    assert limiter.hit('login:1.2.3.4', 5, 60)[0]
+    assert not limiter.hit('login:1.2.3.4', 5, 60)[0]
+
+
+def test_full_buckets_are_swept(monkeypatch):
+    monkeypatch.setattr('accounts.ratelimit.SWEEP_EVERY', 3)
+    clock = FakeClock()
+    limiter = InMemoryRateLimiter(clock=clock)
+    limiter.hit('a', 1, 10)
+    limiter.hit('b', 1, 10)
+
+    clock.now += 10
+    limiter.hit('c', 1, 10)
+
+    assert set(limiter._tats) == {'c'}
+
+
+@pytest.mark.django_db
+def test_database_buckets_are_shared_by_workers(monkeypatch):
+    monkeypatch.setattr('accounts.ratelimit.SWEEP_EVERY', 4)
+    clock = FakeClock()
+    workers = [DatabaseRateLimiter(clock=clock), DatabaseRateLimiter(clock=clock)]
+
+    results = [workers[attempt % 2].hit('login:1.2.3.4', 3, 60) for attempt in range(4)]
+
+    assert [allowed for allowed, _, _ in results] == [True] * 3 + [False]
+    assert [remaining for _, remaining, _ in results[:3]] == [2, 1, 0]
+    assert results[3][2] == pytest.approx(20)
+
+    # Full buckets are swept
+    clock.now += 60
+    for key in ('a', 'b', 'c', 'd'):
+        workers[1].hit(key, 1, 1)
+    assert set(RateLimitBucket.objects.values_list('key', flat=True)) == {'a', 'b', 'c', 'd'}
+
+
+@pytest.mark.django_db
+def test_login_is_limited_per_ip(limiter):
+    url = reverse('login')
+    client = APIClient(REMOTE_ADDR='10.0.0.1')
+    statuses = [client.post(url, {'email': 'nobody@example.com', 'password': 'wrong'}).status_code for _ in range(6)]
+
+    assert statuses[:5] == [401] * 5
+    response = client.post(url, {'email': 'nobody@example.com', 'password': 'wrong'})
+    assert statuses[5] == response.status_code == 429
+    assert int(response['Retry-After']) > 0
+    assert APIClient(REMOTE_ADDR='10.0.0.2').post(url, {'email': 'a@example.com', 'password': 'x'}).status_code == 401
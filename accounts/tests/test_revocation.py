@@ -0,0 +1,99 @@
+import io
+import pytest
+from datetime import timedelta
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from accounts.models import User
+from accounts.revocation import get_revocation_store
+from accounts.serializers import get_tokens_for_user
+
+
+@pytest.fixture
+def memory_store(settings):
+    settings.TOKEN_REVOCATION_BACKEND = 'accounts.revocation.InMemoryRevocationStore'
+    get_revocation_store.cache_clear()
+    yield get_revocation_store()
+    get_revocation_store().clear()
+    get_revocation_store.cache_clear()
+
+
+@pytest.fixture
+def rider(db):
+    return User.objects.create_user(username='rider', email='rider@example.com', password='Secret123!')
+
+
+def _refresh(token):
+    return APIClient().post(reverse('token_refresh'), {'refresh': token})
+
+
+def test_issuing_tokens_writes_no_rows(rider):
+    get_tokens_for_user(rider)
+
+    assert not OutstandingToken.objects.exists()
+
+
+def test_rotated_token_is_rejected_without_touching_the_blacklist_tables(rider, memory_store):
+    old = get_tokens_for_user(rider)['refresh']
+    response = _refresh(old)
+    assert response.status_code == 200
+    rotated = response.data['refresh']
+    # The durable record of the revocation
+    assert BlacklistedToken.objects.count() == 1
+
+    with CaptureQueriesContext(connection) as queries:
+        response = _refresh(old)
+
+    assert response.status_code == 401
+    assert not [query for query in queries.captured_queries if 'token_blacklist' in query['sql']]
+    assert _refresh(rotated).status_code == 200
+
+
+def test_logout_revokes_refresh_token(rider):
+    refresh = get_tokens_for_user(rider)['refresh']
+
+    assert APIClient().post(reverse('logout'), {'refresh': refresh}).status_code == 200
+
+    assert _refresh(refresh).status_code == 401
+    assert APIClient().post(reverse('token_verify'), {'token': refresh}).status_code != 200
+
+
+def test_purge_deletes_expired_tokens_in_chunks(rider):
+    now = timezone.now()
+    for n in range(5):
+        token = OutstandingToken.objects.create(
+            user=rider, jti=f'expired-{n}', token='x', created_at=now, expires_at=now - timedelta(minutes=n + 1),
+        )
+        BlacklistedToken.objects.create(token=token)
+    OutstandingToken.objects.create(user=rider, jti='live', token='x', created_at=now, expires_at=now + timedelta(days=1))
+
+    out = io.StringIO()
+    call_command('purge_expired_tokens', batch_size=2, pause=0, stdout=out)
+
+    assert 'Purged 5' in out.getvalue()
+    assert list(OutstandingToken.objects.values_list('jti', flat=True)) == ['live']
+    assert not BlacklistedToken.objects.exists()
+
+
+def test_logged_out_token_stays_rejected_by_every_worker(rider):
+    """Without Redis the blacklist table answers, so other workers and restarts agree"""
+    refresh = get_tokens_for_user(rider)['refresh']
+    APIClient().post(reverse('logout'), {'refresh': refresh})
+    get_revocation_store.cache_clear()
+
+    assert _refresh(refresh).status_code == 401
+
+
+def test_restore_reloads_the_store_from_the_blacklist(rider, memory_store):
+    refresh = get_tokens_for_user(rider)['refresh']
+    APIClient().post(reverse('logout'), {'refresh': refresh})
+    # Lost, as when Redis is flushed
+    memory_store.clear()
+
+    call_command('purge_expired_tokens', restore=True, stdout=io.StringIO())
+
+    assert _refresh(refresh).status_code == 401
@@ -0,0 +1,32 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import BlacklistMixin, RefreshToken
+from .revocation import get_revocation_store
+
+
+class RevocableRefreshToken(RefreshToken):
+    """
+    Refresh token checked against the revocation store instead of the
+    BlacklistedToken table.
+
+    Issuing and rotating tokens no longer record OutstandingToken rows.
+    Blacklisting still writes the BlacklistedToken row, which is the
+    durable copy that restore_revocations() reloads the store from.
+    """
+
+    def check_blacklist(self):
+        if get_revocation_store().is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        get_revocation_store().revoke(self.payload[api_settings.JTI_CLAIM], self.payload['exp'])
+        return super().blacklist()
+
+    def outstand(self):
+        return None
+
+    @classmethod
+    def for_user(cls, user):
+        # Skip BlacklistMixin.for_user, which inserts an OutstandingToken per login
+        return super(BlacklistMixin, cls).for_user(user)
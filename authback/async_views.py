@@ -0,0 +1,45 @@
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
+from rest_framework.renderers import JSONRenderer
+from accounts.authentication import ClaimsJWTAuthentication
+
+
+class AsyncAPIView(View):
+    """
+    Coroutine counterpart of APIView for hot read endpoints.
+
+    DRF views are synchronous, so under the uvicorn workers each of them
+    holds a thread for the whole request. Subclasses define `async def get`
+    and await the async ORM and cache APIs instead; a worker then serves
+    many slow clients from one event loop. Under WSGI Django runs the same
+    handlers through async_to_sync, so both deployment modes share one
+    implementation.
+
+    Responses are rendered with DRF's JSONRenderer and errors keep DRF's
+    shapes, so clients see the same bytes as from the APIView it replaces.
+    """
+    # Public views skip authentication altogether
+    authentication_required = False
+
+    async def dispatch(self, request, *args, **kwargs):
+        if self.authentication_required:
+            try:
+                result = await ClaimsJWTAuthentication().aauthenticate(request)
+            except AuthenticationFailed as e:
+                return self.unauthorized(e.detail)
+            if result is None:
+                return self.unauthorized(NotAuthenticated.default_detail)
+            request.user, request.auth = result
+        return await super().dispatch(request, *args, **kwargs)
+
+    def unauthorized(self, detail):
+        data = detail if isinstance(detail, dict) else {'detail': detail}
+        response = self.json_response(data, status=status.HTTP_401_UNAUTHORIZED)
+        response['WWW-Authenticate'] = ClaimsJWTAuthentication().authenticate_header(None)
+        return response
+
+    @staticmethod
+    def json_response(data, status=status.HTTP_200_OK):
+        return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
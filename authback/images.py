@@ -0,0 +1,301 @@
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.db.models.signals import post_save
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.static import serve
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+FORMAT_EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+MISSING_MANIFEST_TTL = 60
+# Models and ImageFields registered with watch_image_fields(), for backfills
+WATCHED_FIELDS = []
+
+
+def render_derivatives(data, widths, formats, quality):
+    """
+    Resize an encoded image to each width in each format.
+
+    Pure Pillow with no Django access so it can run in a worker process.
+    Widths wider than the original are skipped (the original width is used
+    if every width is). Returns a list of (width, format, bytes).
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    targets = sorted({width for width in widths if width < image.width}) or [image.width]
+    rendered = []
+    for width in targets:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.Resampling.LANCZOS) if width != image.width else image
+        for fmt in formats:
+            frame = resized
+            if fmt == 'jpeg' and frame.mode != 'RGB':
+                frame = frame.convert('RGB')
+            elif fmt == 'webp' and frame.mode not in ('RGB', 'RGBA'):
+                frame = frame.convert('RGBA' if 'A' in frame.getbands() or 'transparency' in frame.info else 'RGB')
+            buffer = io.BytesIO()
+            frame.save(buffer, format=fmt.upper(), quality=quality, optimize=fmt == 'jpeg', progressive=fmt == 'jpeg')
+            rendered.append((width, fmt, buffer.getvalue()))
+    return rendered
+
+
+def derivative_name(digest, width, fmt):
+    """Content-addressed storage name; safe to cache forever"""
+    return f'{settings.IMAGE_DERIVATIVE_PREFIX}/{digest[:2]}/{digest}/{width}w.{FORMAT_EXTENSIONS[fmt]}'
+
+
+def _manifest_name(source):
+    return f'{settings.IMAGE_DERIVATIVE_PREFIX}/manifests/{hashlib.sha1(source.encode()).hexdigest()}.json'
+
+
+def _manifest_key(source):
+    return f'image_derivatives_{hashlib.sha1(source.encode()).hexdigest()}'
+
+
+def get_manifest(source):
+    """
+    Derivatives of a stored image as {'digest', 'formats': {format: [[width, name], ...]}},
+    or None if they have not been generated. The manifest is kept next to the
+    derivatives and cached without expiry.
+    """
+    manifest = cache.get(_manifest_key(source))
+    if manifest is None:
+        return _load_manifest(source)
+    return manifest or None
+
+
+def get_manifests(sources):
+    """get_manifest() for many images: one cache round trip, then storage only for uncached manifests"""
+    keys = {_manifest_key(source): source for source in set(sources)}
+    cached = cache.get_many(list(keys)) if keys else {}
+    return {
+        source: (cached[key] or None) if key in cached else _load_manifest(source)
+        for key, source in keys.items()
+    }
+
+
+def _load_manifest(source):
+    key = _manifest_key(source)
+    try:
+        with default_storage.open(_manifest_name(source)) as file:
+            manifest = json.load(file)
+    except FileNotFoundError:
+        # Remember the miss briefly so listings do not go to storage on every request
+        cache.set(key, False, timeout=MISSING_MANIFEST_TTL)
+        return None
+    cache.set(key, manifest, timeout=None)
+    return manifest
+
+
+def _store_derivatives(source, digest, rendered):
+    formats = {}
+    for width, fmt, data in rendered:
+        name = derivative_name(digest, width, fmt)
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(data))
+        formats.setdefault(fmt, []).append([width, name])
+    manifest = {'digest': digest, 'formats': formats}
+    manifest_name = _manifest_name(source)
+    if default_storage.exists(manifest_name):
+        default_storage.delete(manifest_name)
+    default_storage.save(manifest_name, ContentFile(json.dumps(manifest).encode()))
+    cache.set(_manifest_key(source), manifest, timeout=None)
+    return manifest
+
+
+def _read_source(source):
+    with default_storage.open(source) as file:
+        data = file.read()
+    return data, hashlib.sha256(data).hexdigest()
+
+
+def _render_args():
+    return settings.IMAGE_DERIVATIVE_WIDTHS, settings.IMAGE_DERIVATIVE_FORMATS, settings.IMAGE_DERIVATIVE_QUALITY
+
+
+def generate_derivatives(source):
+    """Synchronously build the derivatives of a stored image; unchanged content is skipped"""
+    data, digest = _read_source(source)
+    manifest = get_manifest(source)
+    if manifest is not None and manifest['digest'] == digest:
+        return manifest
+    return _store_derivatives(source, digest, render_derivatives(data, *_render_args()))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Process pool shared by a worker process, created on first use. Its
+    processes are spawned, not forked: forking a threaded gunicorn or
+    uvicorn worker can copy locks held by other threads into the child.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_DERIVATIVE_WORKERS, mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def _rendered(source, digest, future):
+    try:
+        _store_derivatives(source, digest, future.result())
+    except Exception:
+        logger.exception('Could not build image derivatives for %s', source)
+
+
+def schedule_derivatives(source):
+    """
+    Build the derivatives of a stored image in the background process pool.
+
+    Only the Pillow work runs in the pool; reading the original and saving
+    the results stay in this process, which owns the storage backend.
+    With IMAGE_DERIVATIVE_WORKERS = 0 the work is done inline.
+    """
+    if not settings.IMAGE_DERIVATIVE_WORKERS:
+        return generate_derivatives(source)
+    data, digest = _read_source(source)
+    manifest = get_manifest(source)
+    if manifest is not None and manifest['digest'] == digest:
+        return manifest
+    future = get_pool().submit(render_derivatives, data, *_render_args())
+    future.add_done_callback(partial(_rendered, source, digest))
+    return future
+
+
+def build_all_derivatives(sources):
+    """
+    Build derivatives for many stored images using the process pool and wait
+    for them. Returns {source: error} for the images that failed.
+    """
+    errors = {}
+    futures = {}
+    for source in sources:
+        try:
+            data, digest = _read_source(source)
+            manifest = get_manifest(source)
+            if manifest is not None and manifest['digest'] == digest:
+                continue
+            if settings.IMAGE_DERIVATIVE_WORKERS:
+                futures[source] = (digest, get_pool().submit(render_derivatives, data, *_render_args()))
+            else:
+                _store_derivatives(source, digest, render_derivatives(data, *_render_args()))
+        except (OSError, ValueError) as e:
+            errors[source] = e
+    for source, (digest, future) in futures.items():
+        try:
+            _store_derivatives(source, digest, future.result())
+        except (OSError, ValueError) as e:
+            errors[source] = e
+    return errors
+
+
+def _schedule_changed(field_names, sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    for field_name in field_names:
+        source = getattr(instance, field_name).name
+        # Stored names are never reused for different content, so a
+        # manifest means the current image is already processed
+        if source and get_manifest(source) is None:
+            transaction.on_commit(partial(schedule_derivatives, source))
+
+
+def watch_image_fields(model, *field_names):
+    """Generate derivatives whenever one of the model's ImageFields gets a new image"""
+    WATCHED_FIELDS.append((model, field_names))
+    post_save.connect(
+        partial(_schedule_changed, field_names), sender=model, weak=False,
+        dispatch_uid=f'image_derivatives_{model._meta.label_lower}',
+    )
+
+
+def image_srcset(field_file, manifests=None):
+    """
+    URL of the original plus srcset strings per format, e.g. {'webp': 'a.webp 160w, b.webp 320w'};
+    `manifests` are ones already read by get_manifests()
+    """
+    if not field_file:
+        return None
+    result = {'original': field_file.url, 'srcset': {}}
+    if manifests is not None and field_file.name in manifests:
+        manifest = manifests[field_file.name]
+    else:
+        manifest = get_manifest(field_file.name)
+    if manifest is not None:
+        for fmt, sources in manifest['formats'].items():
+            result['srcset'][fmt] = ', '.join(f'{default_storage.url(name)} {width}w' for width, name in sources)
+    return result
+
+
+class ImageSrcsetField(serializers.ReadOnlyField):
+    """Serializes an ImageField as its original URL and responsive derivative srcsets"""
+
+    def to_representation(self, value):
+        return image_srcset(value, self.context.get('image_manifests'))
+
+
+class ImageSrcsetListSerializer(serializers.ListSerializer):
+    """
+    List serializer (Meta.list_serializer_class) for serializers with
+    ImageSrcsetFields: the manifests of every image on the page are read
+    with one get_manifests() call instead of one cache read per image.
+    """
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        fields = [field for field in self.child._readable_fields if isinstance(field, ImageSrcsetField)]
+        sources = []
+        for item in items:
+            for field in fields:
+                value = field.get_attribute(item)
+                if value:
+                    sources.append(value.name)
+        self.context.setdefault('image_manifests', {}).update(get_manifests(sources))
+        return super().to_representation(items)
+
+
+def serve_derivative(request, path):
+    """
+    Serve a derivative from MEDIA_ROOT; content-hashed images can be cached
+    forever. Manifests are rewritten in place, so clients revalidate them
+    against their ETag.
+    """
+    if path.startswith(f'{settings.IMAGE_DERIVATIVE_PREFIX}/manifests/'):
+        return _serve_manifest(request, path)
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    patch_cache_control(response, public=True, max_age=60 * 60 * 24 * 365, immutable=True)
+    return response
+
+
+def _serve_manifest(request, path):
+    try:
+        with default_storage.open(path) as file:
+            data = file.read()
+    except FileNotFoundError:
+        raise Http404(path)
+    etag = f'"{hashlib.sha1(data).hexdigest()}"'
+    response = HttpResponse(data, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, no_cache=True)
+    return get_conditional_response(request, etag=etag, response=response)
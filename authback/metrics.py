@@ -0,0 +1,279 @@
+"""
+Per-view request metrics in Prometheus text format.
+
+MetricsMiddleware (authback.middleware) times every request and, through the
+RequestStats in a context variable, counts the queries run by any database
+connection and the hits and misses of the instrumented cache backends below.
+At the end of the request the totals are added to this process's registry,
+labelled by URL name, and `metrics_view` renders the registry at /metrics.
+
+Each thread adds to its own shard of the registry, so recording takes no
+lock; a scrape sums the shards. Every gunicorn worker keeps its own
+registry, so a scrape reports the worker that answered it.
+"""
+import threading
+import time
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django_redis.cache import RedisCache
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+UNMATCHED_VIEW = '<unmatched>'
+# Any other method is labelled OTHER_METHOD, so clients cannot add label values at will
+HTTP_METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+OTHER_METHOD = 'other'
+
+_request_stats = ContextVar('request_stats', default=None)
+_MISSING = object()
+START_TIME = time.time()
+
+
+class RequestStats:
+    """What one request did, filled in by the query tracker and the cache backends"""
+    __slots__ = ('queries', 'db_seconds', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def start_request():
+    """Begin collecting stats for the current request; returns (stats, token for finish_request)"""
+    stats = RequestStats()
+    return stats, _request_stats.set(stats)
+
+
+def finish_request(token):
+    _request_stats.reset(token)
+
+
+class Shard:
+    """One thread's share of the registry; only that thread writes to it"""
+
+    def __init__(self):
+        self.requests = {}        # (view, method, status) -> count
+        self.durations = {}       # (view, method) -> histogram
+        self.queries = {}         # view -> histogram
+        self.counters = {}        # (name, view) -> total
+
+
+class Registry:
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = Shard()
+            # Once per thread
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def record(self, view, method, status, duration, stats, response_bytes):
+        if method not in HTTP_METHODS:
+            method = OTHER_METHOD
+        shard = self._shard()
+        key = (view, method, status)
+        shard.requests[key] = shard.requests.get(key, 0) + 1
+        _observe(shard.durations, (view, method), DURATION_BUCKETS, duration)
+        _observe(shard.queries, view, QUERY_BUCKETS, stats.queries)
+        counters = shard.counters
+        for name, value in (
+            ('db_seconds', stats.db_seconds),
+            ('cache_hits', stats.cache_hits),
+            ('cache_misses', stats.cache_misses),
+            ('response_bytes', response_bytes),
+        ):
+            counters[name, view] = counters.get((name, view), 0) + value
+
+    def collect(self):
+        """The shards summed: (requests, durations, queries, counters)"""
+        requests, durations, queries, counters = {}, {}, {}, {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            # list() copies in one step, the owning thread may be adding keys
+            for key, count in list(shard.requests.items()):
+                requests[key] = requests.get(key, 0) + count
+            for merged, own in ((durations, shard.durations), (queries, shard.queries)):
+                for key, histogram in list(own.items()):
+                    total = merged.setdefault(key, [0] * len(histogram))
+                    for position, value in enumerate(list(histogram)):
+                        total[position] += value
+            for key, value in list(shard.counters.items()):
+                counters[key] = counters.get(key, 0) + value
+        return requests, durations, queries, counters
+
+    def clear(self):
+        with self._lock:
+            self._shards = []
+        self._local = threading.local()
+
+
+def _observe(histograms, key, buckets, value):
+    """Histograms are [count per bucket..., count above the last bucket, sum]"""
+    histogram = histograms.get(key)
+    if histogram is None:
+        histogram = histograms[key] = [0] * (len(buckets) + 2)
+    for position, bound in enumerate(buckets):
+        if value <= bound:
+            break
+    else:
+        position = len(buckets)
+    histogram[position] += 1
+    histogram[-1] += value
+
+
+registry = Registry()
+
+
+def track_query(execute, sql, params, many, context):
+    """Execute wrapper installed on every connection; counts into the current request"""
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+def install_query_tracker(connection):
+    if track_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(track_query)
+
+
+def install_on_open_connections():
+    """For connections this thread opened before the middleware was loaded"""
+    for connection in connections.all(initialized_only=True):
+        install_query_tracker(connection)
+
+
+def _on_connection_created(sender, connection, **kwargs):
+    install_query_tracker(connection)
+
+
+connection_created.connect(_on_connection_created, dispatch_uid='authback.metrics.track_query')
+
+
+def count_cache_lookups(hits, misses):
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+class CacheMetricsMixin:
+    """Counts get() hits and misses into the current request"""
+
+    def get(self, key, default=None, version=None, **kwargs):
+        value = super().get(key, _MISSING, version=version, **kwargs)
+        if value is _MISSING:
+            count_cache_lookups(0, 1)
+            return default
+        count_cache_lookups(1, 0)
+        return value
+
+
+class InstrumentedLocMemCache(CacheMetricsMixin, LocMemCache):
+    """LocMemCache with metrics; its get_many() goes through get()"""
+
+
+class InstrumentedRedisCache(CacheMetricsMixin, RedisCache):
+    """django-redis cache with metrics"""
+
+    def get_many(self, keys, version=None, **kwargs):
+        keys = list(keys)
+        found = super().get_many(keys, version=version, **kwargs)
+        count_cache_lookups(len(found), len(keys) - len(found))
+        return found
+
+
+def _labels(**labels):
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels.items()
+    )
+    return '{' + pairs + '}'
+
+
+def _format(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _histogram_lines(name, histograms, buckets, label_names):
+    lines = []
+    for key, histogram in sorted(histograms.items()):
+        labels = dict(zip(label_names, key if isinstance(key, tuple) else (key,)))
+        cumulative = 0
+        for bound, count in zip(buckets, histogram):
+            cumulative += count
+            lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {cumulative}')
+        count = cumulative + histogram[len(buckets)]
+        lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {count}')
+        lines.append(f'{name}_sum{_labels(**labels)} {_format(histogram[-1])}')
+        lines.append(f'{name}_count{_labels(**labels)} {count}')
+    return lines
+
+
+COUNTERS = (
+    ('db_seconds', 'http_request_db_seconds_total', 'Seconds spent in database queries.'),
+    ('cache_hits', 'http_request_cache_hits_total', 'Cache lookups that found a value.'),
+    ('cache_misses', 'http_request_cache_misses_total', 'Cache lookups that found nothing.'),
+    ('response_bytes', 'http_response_bytes_total', 'Bytes of response bodies.'),
+)
+
+
+def render_metrics():
+    requests, durations, queries, counters = registry.collect()
+    lines = [
+        '# HELP http_requests_total Requests by URL name, method and status.',
+        '# TYPE http_requests_total counter',
+    ]
+    for (view, method, status), count in sorted(requests.items()):
+        lines.append(f'http_requests_total{_labels(view=view, method=method, status=status)} {count}')
+    lines += [
+        '# HELP http_request_duration_seconds Time from the first middleware to the response.',
+        '# TYPE http_request_duration_seconds histogram',
+    ]
+    lines += _histogram_lines('http_request_duration_seconds', durations, DURATION_BUCKETS, ('view', 'method'))
+    lines += [
+        '# HELP http_request_db_queries Database queries per request.',
+        '# TYPE http_request_db_queries histogram',
+    ]
+    lines += _histogram_lines('http_request_db_queries', queries, QUERY_BUCKETS, ('view',))
+    for key, name, description in COUNTERS:
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} counter']
+        for (counter, view), value in sorted(counters.items()):
+            if counter == key:
+                lines.append(f'{name}{_labels(view=view)} {_format(value)}')
+    lines += [
+        '# HELP process_start_time_seconds Start time of the process since the epoch.',
+        '# TYPE process_start_time_seconds gauge',
+        f'process_start_time_seconds {_format(START_TIME)}',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; needs `Authorization: Bearer <METRICS_TOKEN>`, and is closed without one"""
+    if not settings.METRICS_TOKEN or not constant_time_compare(
+        request.headers.get('Authorization', ''), f'Bearer {settings.METRICS_TOKEN}'
+    ):
+        return HttpResponse(status=403)
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
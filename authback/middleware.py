@@ -0,0 +1,90 @@
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+from . import metrics
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that can sit in an async middleware chain.
+
+    WhiteNoiseMiddleware is sync-only, and one sync-only middleware makes
+    Django run every request below it in a thread, async views included.
+    Under ASGI this version passes everything that is not a static file
+    straight to the next middleware on the event loop; only serving a
+    static file leaves it.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class MetricsMiddleware:
+    """
+    Records latency, database queries and time, cache hits and misses and
+    response size of every request under its URL name; see authback.metrics.
+    Goes first in MIDDLEWARE so the timing covers the whole stack.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        metrics.install_on_open_connections()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        stats, token = metrics.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        self.record(request, response, started, stats)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        stats, token = metrics.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        self.record(request, response, started, stats)
+        return response
+
+    def record(self, request, response, started, stats):
+        match = request.resolver_match
+        if response.streaming:
+            size = int(response.get('Content-Length') or 0)
+        else:
+            size = len(response.content)
+        metrics.registry.record(
+            match.view_name if match else metrics.UNMATCHED_VIEW,
+            request.method,
+            response.status_code,
+            time.perf_counter() - started,
+            stats,
+            size,
+        )
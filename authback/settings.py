@@ -61,9 +61,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'authback.middleware.MetricsMiddleware',  # First, so its timings cover every other middleware
     'corsheaders.middleware.CorsMiddleware',  # Add this as the first middleware
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Add this after security middleware
+    'authback.middleware.StaticFilesMiddleware',  # WhiteNoise, async-capable; after security middleware
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -221,6 +222,13 @@ STATICFILES_DIRS = [
 MEDIA_ROOT =  os.path.join(BASE_DIR, 'public/static') 
 MEDIA_URL = '/media/'
 
+# Responsive image derivatives (WebP/JPEG at several widths) built in a process pool
+IMAGE_DERIVATIVE_PREFIX = 'derivatives'
+IMAGE_DERIVATIVE_WIDTHS = (160, 320, 640, 1280)
+IMAGE_DERIVATIVE_FORMATS = ('webp', 'jpeg')
+IMAGE_DERIVATIVE_QUALITY = 80
+IMAGE_DERIVATIVE_WORKERS = config('IMAGE_DERIVATIVE_WORKERS', default=2, cast=int)  # 0 builds inline
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -245,22 +253,25 @@ CSRF_TRUSTED_ORIGINS = [
     f"http://localhost:{SERVICE_PORTS['FRONTEND_VITE']}",
     'https://repairmybike.up.railway.app',
 ]
-# Rate Limiting Settings
-RATELIMIT_ENABLE = True
-RATELIMIT_USE_CACHE = 'default'
-RATELIMIT_KEY_PREFIX = 'ratelimit'
-RATELIMIT_BLOCK = True
-RATELIMIT_VIEW = 'accounts.views.rate_limit_view'
+# Rate Limiting Settings (accounts.ratelimit); rates are "<requests>/<s|m|h|d>"
+RATE_LIMITS = {
+    'login': '5/m',
+    'signup': '20/h',
+    'password_reset': '3/h',
+    'password_reset_email': '3/h',
+}
 
 # Cache Configuration
+USE_REDIS = config('USE_REDIS', default=False, cast=bool)
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'authback.metrics.InstrumentedLocMemCache',
         'LOCATION': 'unique-snowflake',
     }
-} if not config('USE_REDIS', default=False, cast=bool) else {
+} if not USE_REDIS else {
     'default': {
-        'BACKEND': 'django_redis.cache.RedisCache',
+        'BACKEND': 'authback.metrics.InstrumentedRedisCache',
         'LOCATION': config('REDIS_PUBLIC_URL', default=f'redis://127.0.0.1:{SERVICE_PORTS["REDIS"]}/1'),
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
@@ -280,10 +291,48 @@ CACHES = {
 CACHE_TTL = 60 * 5  # Cache timeout of 5 minutes
 CACHE_MIDDLEWARE_SECONDS = 60 * 5  # Cache middleware timeout of 5 minutes
 
+# Per-view request metrics (authback.metrics); /metrics asks for this bearer token and is closed while it is unset
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
 # Redis as the cache backend
 DJANGO_REDIS_IGNORE_EXCEPTIONS = True
 DJANGO_REDIS_LOG_IGNORED_EXCEPTIONS = True
 
+# Hot cart storage, written behind to Cart/CartItem by `manage.py flush_carts`;
+# without Redis carts are read and written in the database directly
+CART_STORE_BACKEND = (
+    'repairing_service.cart_store.RedisCartStore' if USE_REDIS
+    else 'repairing_service.cart_store.DatabaseCartStore'
+)
+CART_STORE_TTL = 60 * 60 * 24 * 7  # Active carts live for 7 days after the last change
+CART_FLUSH_BATCH_SIZE = 500
+
+# Revoked refresh token JTIs, shared by every worker; `manage.py purge_expired_tokens` compacts the blacklist tables
+TOKEN_REVOCATION_BACKEND = (
+    'accounts.revocation.RedisRevocationStore' if USE_REDIS
+    else 'accounts.revocation.DatabaseRevocationStore'
+)
+TOKEN_PURGE_BATCH_SIZE = 1000
+
+# Lifetime in seconds of emailed verification and password reset links
+ONE_TIME_TOKEN_TTLS = {
+    'verify_email': 60 * 60 * 24,
+    'password_reset': 60 * 60,
+}
+
+# Rate limit buckets must be shared by every worker, see RATE_LIMITS
+RATE_LIMITER_BACKEND = (
+    'accounts.ratelimit.RedisRateLimiter' if USE_REDIS
+    else 'accounts.ratelimit.DatabaseRateLimiter'
+)
+
+# Workshop booking
+BOOKING_TIME_ZONE = 'Asia/Kolkata'  # Opening hours are local workshop time
+BOOKING_OPEN_TIME = '09:00'
+BOOKING_CLOSE_TIME = '19:00'
+BOOKING_SLOT_MINUTES = 30
+BOOKING_HORIZON_DAYS = 30
+
 # JWT settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -300,12 +349,19 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
+    # Tokens carry a hash of the password hash and stop working when it changes
+    'CHECK_REVOKE_TOKEN': True,
+    # Blacklist lookups go to the revocation store (accounts.revocation), not the tables
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.RevocableTokenRefreshSerializer',
+    'TOKEN_VERIFY_SERIALIZER': 'accounts.serializers.RevocableTokenVerifySerializer',
 }
+# Seconds accounts.authentication trusts cached is_active/is_staff/password flags
+AUTH_USER_CACHE_TTL = 60
 
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.ClaimsJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -336,15 +392,36 @@ CELERY_FLOWER_PORT = SERVICE_PORTS['CELERY_FLOWER']
 
 
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = 'smtp.hostinger.com'  # Use your email provider's SMTP server
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = config('EMAIL_HOST_USER')  # Add this in your .env file
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')  # Add this in your .env file
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL')  # Add this in your .env file
+EMAIL_TIMEOUT = 10
+
+# Transactional email queue (sent by `manage.py send_queued_emails`)
+EMAIL_QUEUE_BATCH_SIZE = 50  # Messages sent over one SMTP connection
+EMAIL_QUEUE_MAX_ATTEMPTS = 8
+EMAIL_QUEUE_RETRY_SECONDS = 30  # Doubled after every failed attempt
+EMAIL_QUEUE_MAX_RETRY_SECONDS = 60 * 60
+# A batch claimed by a worker that died is retried after this, or after the
+# batch's worst-case SMTP time (batch size x EMAIL_TIMEOUT) if that is longer
+EMAIL_QUEUE_LEASE_SECONDS = 5 * 60
 
 # Authentication backends
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
-]
\ No newline at end of file
+]
+# Threads verifying login passwords (accounts.login); bounds the CPU a burst of logins takes
+PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', default=4, cast=int)
+
+# Google sign-in (accounts.oauth)
+GOOGLE_CLIENT_ID = config('GOOGLE_CLIENT_ID')
+GOOGLE_CLIENT_SECRET = config('GOOGLE_CLIENT_SECRET')
+GOOGLE_REDIRECT_URI = config('GOOGLE_REDIRECT_URI', default='http://localhost:8000/api/accounts/google/callback/')
+GOOGLE_OAUTH_DISCOVERY_URL = 'https://accounts.google.com/.well-known/openid-configuration'
+OAUTH_HTTP_TIMEOUT = (3.05, 10)  # Connect and read timeouts in seconds for calls to the provider
+OAUTH_HTTP_POOL_SIZE = 10  # Kept-alive connections per provider host
+OAUTH_DISCOVERY_TTL = 60 * 60 * 6  # Discovery document and signing keys
\ No newline at end of file
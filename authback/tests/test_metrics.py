@@ -0,0 +1,104 @@
+import re
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import AsyncClient
+from django.urls import reverse
+from vehicle.models import Manufacturer, VehicleModel, VehicleType
+from authback.metrics import registry, render_metrics
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    cache.clear()
+    registry.clear()
+
+
+@pytest.fixture
+def shine(db):
+    honda = Manufacturer.objects.create(name='Honda')
+    bike = VehicleType.objects.create(name='Bike')
+    return VehicleModel.objects.create(name='Shine', manufacturer=honda, vehicle_type=bike)
+
+
+def samples(text):
+    """{'name{labels}': value} of every sample line"""
+    return {
+        line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1])
+        for line in text.splitlines() if line and not line.startswith('#')
+    }
+
+
+@pytest.mark.django_db
+def test_requests_are_recorded_per_url_name(shine, client, settings):
+    settings.METRICS_TOKEN = 'scrape-me'
+    url = reverse('vehicle-model-services', args=[shine.id])
+    client.get(url)
+    client.get(url)
+    client.get(reverse('vehicle-model-services', args=[999]))
+
+    response = client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-me')
+
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    values = samples(response.content.decode())
+    view = 'view="vehicle-model-services"'
+    assert values[f'http_requests_total{{{view},method="GET",status="200"}}'] == 2
+    assert values[f'http_requests_total{{{view},method="GET",status="404"}}'] == 1
+    assert values[f'http_request_duration_seconds_count{{{view},method="GET"}}'] == 3
+    assert values[f'http_request_duration_seconds_bucket{{{view},method="GET",le="+Inf"}}'] == 3
+    # The first request built the catalogue, the second was served from the cache
+    assert values[f'http_request_cache_hits_total{{{view}}}'] >= 1
+    assert values[f'http_request_cache_misses_total{{{view}}}'] >= 2
+    assert values[f'http_request_db_queries_count{{{view}}}'] == 3
+    assert values[f'http_request_db_queries_bucket{{{view},le="0"}}'] >= 1
+    assert values[f'http_request_db_queries_sum{{{view}}}'] > 0
+    assert values[f'http_request_db_seconds_total{{{view}}}'] > 0
+    assert values[f'http_response_bytes_total{{{view}}}'] > 0
+
+
+@pytest.mark.django_db
+def test_async_requests_are_recorded(shine):
+    url = reverse('vehicle-model-services', args=[shine.id])
+
+    response = async_to_sync(AsyncClient().get)(url)
+
+    assert response.status_code == 200
+    values = samples(render_metrics())
+    assert values['http_requests_total{view="vehicle-model-services",method="GET",status="200"}'] == 1
+    assert values['http_request_db_queries_sum{view="vehicle-model-services"}'] > 0
+
+
+def test_histogram_buckets_are_cumulative():
+    stats = type('Stats', (), {'queries': 0, 'db_seconds': 0.0, 'cache_hits': 0, 'cache_misses': 0})
+    for duration in (0.004, 0.2, 30):
+        registry.record('demo', 'GET', 200, duration, stats, 0)
+
+    lines = render_metrics().splitlines()
+
+    buckets = [line for line in lines if line.startswith('http_request_duration_seconds_bucket{view="demo"')]
+    assert re.search(r'le="0.005"\} 1$', buckets[0])
+    assert buckets[5].endswith('le="0.25"} 2')
+    assert buckets[-2].endswith('le="10"} 2')
+    assert buckets[-1].endswith('le="+Inf"} 3')
+    assert 'http_request_duration_seconds_sum{view="demo",method="GET"} 30.204' in lines
+
+
+def test_unknown_methods_share_one_label():
+    stats = type('Stats', (), {'queries': 0, 'db_seconds': 0.0, 'cache_hits': 0, 'cache_misses': 0})
+    for method in ('GET', 'BREW', 'X-RANDOM-1'):
+        registry.record('demo', method, 405, 0.01, stats, 0)
+
+    values = samples(render_metrics())
+
+    assert values['http_requests_total{view="demo",method="other",status="405"}'] == 2
+    assert not [name for name in values if 'BREW' in name or 'X-RANDOM' in name]
+
+
+@pytest.mark.django_db
+def test_scrape_token(client, settings):
+    settings.METRICS_TOKEN = ''
+    assert client.get(reverse('metrics')).status_code == 403
+
+    settings.METRICS_TOKEN = 'scrape-me'
+    assert client.get(reverse('metrics')).status_code == 403
+    assert client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-me').status_code == 200
@@ -15,11 +15,14 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+import re
+from django.urls import path, re_path, include
 from django.conf.urls.static import static
 from django.conf import settings
 from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from django.views.generic import RedirectView
+from authback.images import serve_derivative
+from authback.metrics import metrics_view
 from accounts.views import accounts_root_view
 
 urlpatterns = [
@@ -29,6 +32,14 @@ urlpatterns = [
     path('api/vehicle/', include('vehicle.urls')),
     path('api/repairing_service/', include('repairing_service.urls')),
     path('api/marketplace/', include('marketplace.urls')),
+    path('metrics', metrics_view, name='metrics'),
+]
+
+urlpatterns += [
+    re_path(
+        r'^%s(?P<path>%s/.*)$' % (re.escape(settings.MEDIA_URL.lstrip('/')), re.escape(settings.IMAGE_DERIVATIVE_PREFIX)),
+        serve_derivative,
+    ),
 ]
 
 if settings.DEBUG:
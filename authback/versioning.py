@@ -0,0 +1,66 @@
+import threading
+import time
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+
+def get_cache_version(key):
+    """Current value of a version counter kept in the shared cache"""
+    version = cache.get(key)
+    if version is None:
+        version = 1
+        cache.add(key, version, timeout=None)
+    return version
+
+
+def bump_cache_version(key):
+    """Increment a version counter so every worker drops data derived from the old one"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, timeout=None)
+        return 2
+
+
+class LocalSnapshot:
+    """
+    Per-process copy of data that is expensive to load and rarely changes.
+
+    The value is built on first use and rebuilt when the shared version
+    counter under `version_key` moves. The counter is only consulted every
+    `check_interval` seconds, so most reads touch neither the cache nor the
+    database.
+    """
+
+    def __init__(self, version_key, build, check_interval=5):
+        self.version_key = version_key
+        self.build = build
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.value = None
+        self.version = None
+        self.checked_at = 0.0
+
+    def get(self):
+        now = time.monotonic()
+        if self.value is not None and now - self.checked_at < self.check_interval:
+            return self.value
+        version = get_cache_version(self.version_key)
+        if self.value is None or version != self.version:
+            with self.lock:
+                if self.value is None or version != self.version:
+                    self.value = self.build()
+                    self.version = version
+        self.checked_at = now
+        return self.value
+
+    async def aget(self):
+        """get() for async views; only a version check or rebuild leaves the event loop"""
+        if self.value is not None and time.monotonic() - self.checked_at < self.check_interval:
+            return self.value
+        return await sync_to_async(self.get)()
+
+    def invalidate(self):
+        """Make every worker rebuild on its next read"""
+        bump_cache_version(self.version_key)
+        self.checked_at = 0.0
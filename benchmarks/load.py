@@ -0,0 +1,380 @@
+"""
+Latency, throughput and queries per request of the API under a traffic mix.
+
+Requests go through the real URLconf and middleware stack in-process (Django's
+test client), so the numbers are the application's own cost without a server
+or network in front of it; benchmarks/serving.py covers the serving modes.
+Virtual users run journeys picked at random by weight:
+
+    browse   catalogue tree, manufacturers, a manufacturer's models, a
+             model's service catalogue, a category's services
+    search   autocomplete as the user types
+    filter   vehicle models by manufacturer, own sell requests by status
+    cart     add a service, cart summary for the vehicle, cart detail
+    login    email and password login
+    sell     submit a sell request, then list own sell requests
+
+Results are per URL name: p50/p95/p99 latency, requests per second and the
+queries per request counted by authback.metrics.
+
+    python benchmarks/load.py
+    python benchmarks/load.py --mix browse=6,search=3,cart=1 --requests 5000 --threads 4
+    python benchmarks/load.py --save-baseline benchmarks/baseline.json
+    python benchmarks/load.py --baseline benchmarks/baseline.json
+
+Runs against a fresh test database (test_<NAME>) of DJANGO_SETTINGS_MODULE, so
+SQLite by default or Postgres with DATABASE_URL, seeded with a small fixed
+catalogue, or with --scale by accounts.synthetic at that scale (--scale 1 is
+1M marketplace vehicles); --keepdb reuses it between runs. SQLite serialises writers, so
+concurrent write journeys can fail with "database is locked" there; measure
+--threads above 1 on Postgres.
+
+With --baseline the run exits 1 when a view needs more queries per request
+than the baseline, its p95 grew by more than --tolerance, or total throughput
+fell by more than --tolerance. Query counts carry over between machines;
+latencies only compare against a baseline taken on the same machine.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'authback.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.hashers import make_password  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from accounts.models import User  # noqa: E402
+from accounts.serializers import get_tokens_for_user  # noqa: E402
+from authback.metrics import registry  # noqa: E402
+from accounts.synthetic import DEFAULT_BATCH_SIZE, SYNTHETIC_PASSWORD, Plan, default_workers, generate, plan_counts  # noqa: E402
+from repairing_service.models import Service, ServiceCategory, ServicePrice  # noqa: E402
+from vehicle.models import Manufacturer, VehicleModel, VehicleType  # noqa: E402
+
+PASSWORD = 'Bench-pass-123'
+VIRTUAL_USER_ACCOUNTS = 200
+DEFAULT_MIX = 'browse=40,search=20,filter=15,cart=15,login=5,sell=5'
+SEARCH_TERMS = ('oil', 'brake', 'chain', 'hon', 'sh', 'servi', 'clutch', 'spark')
+
+
+def seed(users=50, manufacturers=8, models_per_manufacturer=6, categories=6, services_per_category=8):
+    """A fixed catalogue and a set of verified users sharing one password"""
+    types = VehicleType.objects.bulk_create([VehicleType(name=name) for name in ('Bike', 'Scooter')])
+    makers = Manufacturer.objects.bulk_create([Manufacturer(name=f'Maker {n}') for n in range(manufacturers)])
+    models = VehicleModel.objects.bulk_create([
+        VehicleModel(name=f'Model {maker.id}-{n}', manufacturer=maker, vehicle_type=types[n % 2])
+        for maker in makers for n in range(models_per_manufacturer)
+    ])
+    kinds = ('Oil Change', 'Brake Pads', 'Chain Lube', 'Clutch Plates', 'Spark Plug', 'General Service',
+             'Wheel Alignment', 'Battery Check')
+    groups = ServiceCategory.objects.bulk_create([
+        ServiceCategory(name=f'Category {n}', slug=f'category-{n}') for n in range(categories)
+    ])
+    services = Service.objects.bulk_create([
+        Service(name=f'{kinds[n % len(kinds)]} {group.slug[-1]}{n}', slug=f'{group.slug}-service-{n}',
+                category=group, base_price=Decimal(300 + 50 * n), description='Seeded for benchmarks',
+                duration='45 min', warranty='1 month', recommended='yes')
+        for group in groups for n in range(services_per_category)
+    ])
+    ServicePrice.objects.bulk_create([
+        ServicePrice(service=service, manufacturer=model.manufacturer, vehicles_model=model,
+                     price=service.base_price + model.id % 7 * 10)
+        for service in services for model in models[::3]
+    ])
+    for service in services:
+        service.manufacturers.set(makers)
+    # One hash for everyone; hashing per user would dominate the seeding
+    password = make_password(PASSWORD)
+    User.objects.bulk_create([
+        User(username=f'bench{n}', email=f'bench{n}@example.com', password=password,
+             is_active=True, email_verified=True)
+        for n in range(users)
+    ])
+
+
+class Catalogue:
+    """Ids the journeys pick from, read once after seeding"""
+
+    def __init__(self, password):
+        self.password = password
+        self.manufacturers = list(Manufacturer.objects.values_list('id', flat=True))
+        self.models = list(VehicleModel.objects.values_list('id', 'manufacturer_id'))
+        self.categories = [str(uuid) for uuid in ServiceCategory.objects.values_list('uuid', flat=True)]
+        self.services = [str(uuid) for uuid in Service.objects.values_list('uuid', flat=True)]
+        self.users = list(User.objects.filter(is_active=True, email_verified=True).order_by('id')[:VIRTUAL_USER_ACCOUNTS])
+        self.tokens = {user.id: get_tokens_for_user(user)['access'] for user in self.users}
+
+
+def browse(client, user, catalogue, rng):
+    model_id, manufacturer_id = rng.choice(catalogue.models)
+    yield client.get(reverse('catalogue-tree'))
+    yield client.get(reverse('manufacturer-list'))
+    yield client.get(reverse('vehicle-models', args=[manufacturer_id]))
+    yield client.get(reverse('vehicle-model-services', args=[model_id]))
+    yield client.get(reverse('service-list', args=[rng.choice(catalogue.categories)]))
+
+
+def search(client, user, catalogue, rng):
+    term = rng.choice(SEARCH_TERMS)
+    for length in range(2, len(term) + 1):
+        yield client.get(reverse('autocomplete'), {'q': term[:length]})
+
+
+def filter_(client, user, catalogue, rng):
+    yield client.get(reverse('vehiclemodel-list'), {'manufacturer': rng.choice(catalogue.manufacturers)})
+    yield client.get(reverse('sellrequest-list'), {'status': 'submitted'}, **bearer(catalogue, user))
+
+
+def cart(client, user, catalogue, rng):
+    model_id, manufacturer_id = rng.choice(catalogue.models)
+    auth = bearer(catalogue, user)
+    yield client.post(reverse('add-to-cart'), {'service_id': rng.choice(catalogue.services), 'quantity': 1},
+                      content_type='application/json', **auth)
+    yield client.get(reverse('cart-summary'), {'manufacturer': manufacturer_id, 'vehicle_model': model_id}, **auth)
+    yield client.get(reverse('cart-detail'), **auth)
+
+
+def login(client, user, catalogue, rng):
+    yield client.post(reverse('login'), {'email': user.email, 'password': catalogue.password}, content_type='application/json')
+
+
+def sell(client, user, catalogue, rng):
+    # A morning slot, inside business hours
+    slot = (timezone.now() + timedelta(days=rng.randint(1, 14))).replace(hour=10, minute=0, second=0, microsecond=0)
+    auth = bearer(catalogue, user)
+    yield client.post(reverse('sellrequest-list'), {
+        'pickup_slot': slot.isoformat(),
+        'pickup_address': '12 Bench Street',
+        'contact_number': f'98765{rng.randint(10000, 99999)}',
+        'documents': {'rc': 'rc.pdf', 'insurance': 'insurance.pdf', 'puc': 'puc.pdf'},
+        'photos': [{'view': view, 'path': f'{view}.jpg'} for view in ('front', 'back', 'left', 'right')],
+    }, content_type='application/json', **auth)
+    yield client.get(reverse('sellrequest-list'), **auth)
+
+
+JOURNEYS = {'browse': browse, 'search': search, 'filter': filter_, 'cart': cart, 'login': login, 'sell': sell}
+
+
+def bearer(catalogue, user):
+    return {'HTTP_AUTHORIZATION': f'Bearer {catalogue.tokens[user.id]}'}
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in JOURNEYS:
+            raise argparse.ArgumentTypeError(f'unknown journey {name!r}, pick from {", ".join(JOURNEYS)}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def run_user(number, budget, catalogue, mix, seed, samples, errors):
+    """One virtual user: journeys until `budget` (shared, thread-safe) has no requests left"""
+    rng = random.Random(seed + number)
+    # A server error is a failed request to report, not the end of the run
+    client = Client(raise_request_exception=False, REMOTE_ADDR=f'10.0.{number // 250}.{number % 250 + 1}')
+    names, weights = list(mix), list(mix.values())
+    while True:
+        user = rng.choice(catalogue.users)
+        journey = JOURNEYS[rng.choices(names, weights)[0]](client, user, catalogue, rng)
+        while True:
+            if not budget.take():
+                journey.close()
+                return
+            started = time.perf_counter()
+            try:
+                response = next(journey)
+            except StopIteration:
+                budget.give_back()
+                break
+            elapsed = time.perf_counter() - started
+            match = response.resolver_match
+            view = match.view_name if match else response.request['PATH_INFO']
+            samples.append((view, elapsed))
+            if response.status_code >= 400:
+                errors.append((view, response.status_code))
+
+
+class Budget:
+    def __init__(self, requests):
+        self.left = requests
+        self.lock = threading.Lock()
+
+    def take(self):
+        with self.lock:
+            if self.left <= 0:
+                return False
+            self.left -= 1
+            return True
+
+    def give_back(self):
+        with self.lock:
+            self.left += 1
+
+
+def drive(catalogue, mix, requests, threads, seed):
+    samples, errors = [], []
+    budget = Budget(requests)
+    workers = [
+        threading.Thread(target=run_user, args=(number, budget, catalogue, mix, seed, samples, errors))
+        for number in range(threads)
+    ]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return samples, errors, time.perf_counter() - started
+
+
+def percentile(values, fraction):
+    return statistics.quantiles(values, n=100)[int(fraction * 100) - 1] if len(values) > 1 else (values or [0])[0]
+
+
+def summarise(samples, errors, elapsed):
+    """{'total': {...}, 'views': {view: {...}}} with latencies in milliseconds"""
+    _, _, queries, _ = registry.collect()
+    by_view = {}
+    for view, latency in samples:
+        by_view.setdefault(view, []).append(latency)
+    failed = {}
+    for view, _ in errors:
+        failed[view] = failed.get(view, 0) + 1
+
+    def row(latencies, query_histograms, error_count):
+        # Histograms end with the sum; the counts before it add up to the requests
+        count = sum(sum(histogram[:-1]) for histogram in query_histograms)
+        total_queries = sum(histogram[-1] for histogram in query_histograms)
+        return {
+            'requests': len(latencies),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'queries_per_request': round(total_queries / count, 2) if count else 0,
+            'errors': error_count,
+        }
+
+    views = {
+        view: row(latencies, [queries[view]] if view in queries else [], failed.get(view, 0))
+        for view, latencies in sorted(by_view.items())
+    }
+    total = row([latency for _, latency in samples], list(queries.values()), len(errors))
+    total['requests_per_second'] = round(len(samples) / elapsed, 1) if elapsed else 0
+    return {'total': total, 'views': views}
+
+
+def print_report(results):
+    print(f"{'view':<36}{'requests':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'errors':>8}")
+    for view, row in [*results['views'].items(), ('total', results['total'])]:
+        print(f"{view:<36}{row['requests']:>9}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+              f"{row['queries_per_request']:>9.2f}{row['errors']:>8}")
+    print(f"{results['total']['requests_per_second']} requests/s")
+
+
+def regressions(results, baseline, tolerance, noise_ms):
+    """Human readable findings where `results` is worse than `baseline`"""
+    found = []
+    for view, before in baseline['views'].items():
+        now = results['views'].get(view)
+        if now is None:
+            continue
+        if now['queries_per_request'] > before['queries_per_request'] + 0.01:
+            found.append(f"{view}: {before['queries_per_request']} -> {now['queries_per_request']} queries per request")
+        if now['p95_ms'] > before['p95_ms'] * (1 + tolerance) and now['p95_ms'] - before['p95_ms'] > noise_ms:
+            found.append(f"{view}: p95 {before['p95_ms']} -> {now['p95_ms']} ms")
+        if now['errors'] > before['errors']:
+            found.append(f"{view}: {before['errors']} -> {now['errors']} errors")
+    before, now = baseline['total']['requests_per_second'], results['total']['requests_per_second']
+    if now < before * (1 - tolerance):
+        found.append(f'throughput {before} -> {now} requests/s')
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f'journey=weight,... ({DEFAULT_MIX})')
+    parser.add_argument('--requests', type=int, default=2000, help='Measured requests')
+    parser.add_argument('--warmup', type=int, default=200, help='Requests before measuring, to fill caches')
+    parser.add_argument('--threads', type=int, default=1, help='Concurrent virtual users')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--scale', type=float, help='Seed with generated data at this scale instead of the fixed catalogue')
+    parser.add_argument('--keepdb', action='store_true', help='Keep the test database, and its seed data, for the next run')
+    parser.add_argument('--baseline', type=Path, help='Compare with this JSON from --save-baseline; exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed fractional growth of p95 and drop in throughput')
+    parser.add_argument('--noise-ms', type=float, default=1.0, help='p95 changes below this are never regressions')
+    parser.add_argument('--save-baseline', type=Path, help='Write the results to this JSON file')
+    options = parser.parse_args()
+
+    if connection.vendor == 'sqlite':
+        # In-memory SQLite locks whole tables against other threads; a file is what gets deployed
+        connection.settings_dict['TEST']['NAME'] = str(Path(tempfile.gettempdir()) / 'rmb-load-benchmark.sqlite3')
+    setup_test_environment()
+    databases = setup_databases(verbosity=0, interactive=False, keepdb=options.keepdb)
+    try:
+        # Every login comes from a handful of addresses; the limiter is not what is measured here
+        with override_settings(RATE_LIMITS={name: '1000000/m' for name in django.conf.settings.RATE_LIMITS}):
+            if not Manufacturer.objects.exists():
+                if options.scale:
+                    generate(Plan(options.seed, plan_counts(options.scale), DEFAULT_BATCH_SIZE), default_workers())
+                else:
+                    seed()
+            catalogue = Catalogue(SYNTHETIC_PASSWORD if options.scale else PASSWORD)
+            drive(catalogue, options.mix, options.warmup, options.threads, options.seed)
+            registry.clear()
+            samples, errors, elapsed = drive(catalogue, options.mix, options.requests, options.threads, options.seed + 1000)
+    finally:
+        teardown_databases(databases, verbosity=0, keepdb=options.keepdb)
+
+    results = summarise(samples, errors, elapsed)
+    results['run'] = {
+        'database': connection.vendor,
+        'mix': options.mix,
+        'requests': options.requests,
+        'threads': options.threads,
+        'seed': options.seed,
+    }
+    if options.scale:
+        results['run']['scale'] = options.scale
+    print(f"{connection.vendor}, {options.threads} thread(s), mix "
+          + ', '.join(f'{name}={weight:g}' for name, weight in options.mix.items()))
+    print_report(results)
+    for view, status in sorted(set(errors)):
+        print(f'  {view} answered {status}')
+
+    if options.save_baseline:
+        options.save_baseline.write_text(json.dumps(results, indent=2) + '\n')
+        print(f'Baseline written to {options.save_baseline}')
+    if options.baseline:
+        baseline = json.loads(options.baseline.read_text())
+        if baseline['run'] != results['run']:
+            # Carts and sell requests pile up differently, so averages shift
+            print(f"Warning: the baseline ran {baseline['run']}, not {results['run']}")
+        found = regressions(results, baseline, options.tolerance, options.noise_ms)
+        if found:
+            print(f'Regressions against {options.baseline}:')
+            for finding in found:
+                print(f'  {finding}')
+            sys.exit(1)
+        print(f'No regressions against {options.baseline}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Throughput of the sync (WSGI) and async (ASGI) serving modes under slow clients.
+
+Starts gunicorn from gunicorn.conf.py once per SERVER_MODE on a local port and
+points the same load at it: `--clients` concurrent connections that each
+trickle their request over 0 to 2 x `--slow` seconds, the way mobile clients
+on bad networks do, then read the response. A sync worker is held for the
+whole trickle of the request it is reading, while requests that arrived in
+full queue behind it; uvicorn workers read every connection at once.
+
+    python benchmarks/serving.py
+    python benchmarks/serving.py --path /api/repairing_service/cart/summary/ \\
+        --header "Authorization: Bearer <access token>" --clients 500 --slow 1
+
+Uses the database and cache of DJANGO_SETTINGS_MODULE; migrate it first.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'gunicorn did not listen on {port} within {timeout}s')
+
+
+def start_server(mode, port, workers):
+    env = dict(os.environ, SERVER_MODE=mode, PYTHONUNBUFFERED='1')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+         '--access-logfile', '/dev/null', '--error-logfile', '/dev/null'],
+        cwd=ROOT, env=env,
+    )
+    wait_for_port(port, process)
+    return process
+
+
+async def client(port, request_head, slow, jitter, deadline, latencies, failures):
+    first, rest = request_head[:16], request_head[16:]
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(first)
+            await writer.drain()
+            await asyncio.sleep(jitter.uniform(0, 2 * slow))
+            writer.write(rest)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+        except OSError:
+            failures.append(1)
+            await asyncio.sleep(0.05)
+            continue
+        if response.startswith((b'HTTP/1.1 2', b'HTTP/1.1 3', b'HTTP/1.0 2', b'HTTP/1.0 3')):
+            latencies.append(time.monotonic() - started)
+        else:
+            failures.append(1)
+
+
+async def run_load(port, options):
+    headers = [f'Host: 127.0.0.1:{port}', 'Connection: close', *options.header]
+    request_head = (f'GET {options.path} HTTP/1.1\r\n' + '\r\n'.join(headers) + '\r\n\r\n').encode()
+    latencies, failures = [], []
+    # Same trickle delays in every mode
+    jitter = random.Random(options.seed)
+    started = time.monotonic()
+    deadline = started + options.duration
+    await asyncio.gather(*(
+        client(port, request_head, options.slow, jitter, deadline, latencies, failures)
+        for _ in range(options.clients)
+    ))
+    return latencies, failures, time.monotonic() - started
+
+
+def percentile(values, fraction):
+    return statistics.quantiles(values, n=100)[int(fraction * 100) - 1] if len(values) > 1 else (values or [0])[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--path', default='/api/repairing_service/catalogue/tree/')
+    parser.add_argument('--header', action='append', default=[], help='Extra request header, e.g. "Authorization: Bearer ..."')
+    parser.add_argument('--clients', type=int, default=200, help='Concurrent connections')
+    parser.add_argument('--slow', type=float, default=0.5, help='Mean seconds a client takes to send its request')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes in each mode')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--modes', default='wsgi,asgi')
+    options = parser.parse_args()
+
+    print(f'{options.clients} clients, {options.slow}s mean to send each request, {options.workers} workers, GET {options.path}')
+    print(f"{'mode':<6}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'failed':>8}")
+    for mode in options.modes.split(','):
+        process = start_server(mode, options.port, options.workers)
+        try:
+            latencies, failures, elapsed = asyncio.run(run_load(options.port, options))
+        finally:
+            process.terminate()
+            process.wait()
+        print(
+            f'{mode:<6}{len(latencies):>10}{len(latencies) / elapsed:>10.1f}'
+            f'{percentile(latencies, 0.50) * 1000:>10.0f}{percentile(latencies, 0.95) * 1000:>10.0f}'
+            f'{percentile(latencies, 0.99) * 1000:>10.0f}{len(failures):>8}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+"""
+Gunicorn settings, read by every `gunicorn` started from the project root
+(the Procfile and the Docker runner).
+
+SERVER_MODE picks how requests are served:
+
+    wsgi  (default) authback.wsgi on sync workers, one request per process
+    asgi            authback.asgi on uvicorn workers; the async views
+                    (catalogue, cart summary, Google callback) share one
+                    event loop per process and slow clients no longer pin a
+                    worker each
+
+The worker count comes from WEB_CONCURRENCY as usual.
+"""
+import os
+
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi')
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'authback.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+elif SERVER_MODE == 'wsgi':
+    wsgi_app = 'authback.wsgi:application'
+else:
+    raise ValueError(f'SERVER_MODE must be wsgi or asgi, not {SERVER_MODE!r}')
+
+bind = f"[::]:{os.environ.get('PORT', '8000')}"
+accesslog = '-'
+errorlog = '-'
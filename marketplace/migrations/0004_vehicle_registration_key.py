@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-19 14:02
+
+import re
+
+from django.db import migrations, models
+
+
+def set_registration_keys(apps, schema_editor):
+    # Rows whose canonical form collides with an earlier row keep a NULL key
+    model = apps.get_model("marketplace", "Vehicle")
+    seen = set()
+    changed = []
+    for row in model.objects.order_by("pk").only("pk", "registration_number"):
+        key = re.sub(r"[^0-9A-Z]", "", (row.registration_number or "").upper())
+        if key and key not in seen:
+            seen.add(key)
+            row.registration_key = key
+            changed.append(row)
+    model.objects.bulk_update(changed, ["registration_key"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("marketplace", "0003_vehiclepurchase_vehicle_emi_available_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="vehicle",
+            name="registration_key",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="Registration number in canonical form, set on save",
+                max_length=20,
+                null=True,
+            ),
+        ),
+        migrations.RunPython(set_registration_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="vehicle",
+            name="registration_key",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="Registration number in canonical form, set on save",
+                max_length=20,
+                null=True,
+                unique=True,
+            ),
+        ),
+    ]
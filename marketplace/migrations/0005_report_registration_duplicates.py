@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-19 14:41
+
+from django.db import migrations
+
+from vehicle.registration import report_registration_duplicates
+
+
+def report_duplicates(apps, schema_editor):
+    report_registration_duplicates(apps.get_model("marketplace", "Vehicle"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("marketplace", "0004_vehicle_registration_key"),
+    ]
+
+    operations = [
+        migrations.RunPython(report_duplicates, migrations.RunPython.noop),
+    ]
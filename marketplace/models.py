@@ -83,6 +83,14 @@ class Vehicle(BaseModel):
         blank=True,
         help_text="Vehicle registration number"
     )
+    registration_key = models.CharField(
+        max_length=20,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Registration number in canonical form, set on save"
+    )
     kms_driven = models.PositiveIntegerField(
         default=0,
         validators=[MinValueValidator(0)],
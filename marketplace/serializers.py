@@ -1,7 +1,9 @@
 from rest_framework import serializers
+from django.db import transaction, IntegrityError
 from django.utils import timezone
 from django.core.validators import RegexValidator
 from .models import Vehicle, SellRequest, InspectionReport, PurchaseOffer, VehiclePurchase
+from vehicle.registration import registration_taken
 
 class VehicleSerializer(serializers.ModelSerializer):
     """Serializer for Vehicle model with validation"""
@@ -22,6 +24,8 @@ class VehicleSerializer(serializers.ModelSerializer):
             'condition_rating'
         ]
         read_only_fields = ['status', 'status_display']
+        # Uniqueness is checked on the canonical registration key in validate_registration_number
+        extra_kwargs = {'registration_number': {'validators': []}}
 
     def get_short_description(self, obj):
         return f"{obj.year} {obj.brand} {obj.model} - {obj.kms_driven:,} km | {obj.fuel_type}"
@@ -81,7 +85,19 @@ class VehicleSerializer(serializers.ModelSerializer):
         if not value:
             raise serializers.ValidationError("Registration number is required")
         # Add your registration number format validation here
-        return value.upper()
+        value = value.strip().upper()
+        if registration_taken(Vehicle, value, exclude_pk=getattr(self.instance, 'pk', None)):
+            raise serializers.ValidationError("A vehicle with this registration number already exists")
+        return value
+
+    def save(self, **kwargs):
+        # The registration check can miss a vehicle saved by another worker
+        # moments ago; the unique index on registration_key has the last word
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        except IntegrityError:
+            raise serializers.ValidationError({'registration_number': ["A vehicle with this registration number already exists"]})
 
 class InspectionReportSerializer(serializers.ModelSerializer):
     """Serializer for inspection reports with computed fields"""
@@ -1,6 +1,6 @@
 # admin.py
 from django.contrib import admin
-from .models import Feature, ServiceCategory, Service, ServicePrice, Cart, CartItem
+from .models import Feature, ServiceCategory, Service, ServicePrice, Cart, CartItem, ServiceBay, Booking, BookingItem
 from vehicle.models import Manufacturer, VehicleModel
 
 class FeatureAdmin(admin.ModelAdmin):
@@ -49,6 +49,31 @@ class CartItemAdmin(admin.ModelAdmin):
     list_display = ('cart', 'service', 'quantity')
     search_fields = ('cart__user__email', 'service__name')
 
+class ServiceBayAdmin(admin.ModelAdmin):
+    list_display = ('name', 'is_active')
+    list_filter = ('is_active',)
+
+class BookingItemInline(admin.TabularInline):
+    model = BookingItem
+    extra = 0
+    readonly_fields = ('service', 'quantity', 'unit_price', 'total')
+
+class BookingAdmin(admin.ModelAdmin):
+    list_display = ('user', 'bay', 'start', 'end', 'status', 'total')
+    list_filter = ('status', 'bay')
+    search_fields = ('user__email',)
+    date_hierarchy = 'start'
+    # Status changes go through cancel_booking so the bay slots are released
+    readonly_fields = ('bay', 'start', 'end', 'status', 'total')
+    inlines = [BookingItemInline]
+    actions = ['cancel_bookings']
+
+    @admin.action(description='Cancel selected bookings')
+    def cancel_bookings(self, request, queryset):
+        from .booking import cancel_booking
+        for booking in queryset.filter(status='confirmed'):
+            cancel_booking(booking)
+
 # Register your models here
 admin.site.register(Feature, FeatureAdmin)
 admin.site.register(ServiceCategory, ServiceCategoryAdmin)
@@ -65,3 +90,5 @@ admin.site.register(CartItem, CartItemAdmin)
 
 
 
+admin.site.register(ServiceBay, ServiceBayAdmin)
+admin.site.register(Booking, BookingAdmin)
@@ -0,0 +1,229 @@
+import math
+import random
+import re
+from datetime import datetime, time, timedelta
+from functools import partial
+from zoneinfo import ZoneInfo
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.db.models import FilteredRelation, Q
+from django.utils import timezone
+from vehicle.models import Manufacturer, VehicleModel
+from .models import Service, ServiceBay, Booking, BookingItem, BayReservation
+from .cart import build_cart_summary
+from .cart_store import apply_items, load_cart, persist_cart
+
+DEFAULT_SERVICE_MINUTES = 60
+# "45 min", "1 hr 30 mins", "1-2 hours", "1 day"; a bare number is minutes
+DURATION_PATTERN = re.compile(r'(\d+(?:\.\d+)?)(?:\s*(?:-|to)\s*(\d+(?:\.\d+)?))?\s*([hmd])?', re.IGNORECASE)
+
+
+class BookingError(Exception):
+    """Raised when a booking request is invalid"""
+
+
+class SlotUnavailable(BookingError):
+    """Raised when no bay is free for the whole requested window"""
+
+
+def _parse_time(value):
+    hours, minutes = value.split(':')
+    return time(int(hours), int(minutes))
+
+
+def workshop_timezone():
+    return ZoneInfo(settings.BOOKING_TIME_ZONE)
+
+
+def _day_minutes():
+    open_time = _parse_time(settings.BOOKING_OPEN_TIME)
+    close_time = _parse_time(settings.BOOKING_CLOSE_TIME)
+    return (close_time.hour * 60 + close_time.minute) - (open_time.hour * 60 + open_time.minute)
+
+
+def slots_per_day():
+    return _day_minutes() // settings.BOOKING_SLOT_MINUTES
+
+
+def parse_duration_minutes(text):
+    """Minutes of workshop time for a Service.duration string; the upper bound of a range is used"""
+    total = 0
+    for low, high, unit in DURATION_PATTERN.findall(text or ''):
+        value = float(high or low)
+        unit = unit.lower()
+        if unit == 'h':
+            value *= 60
+        elif unit == 'd':
+            value *= _day_minutes()
+        total += value
+    return math.ceil(total) if total > 0 else DEFAULT_SERVICE_MINUTES
+
+
+def booking_minutes(quantities):
+    """Total workshop minutes for a cart given as {service_id: quantity}, with one query"""
+    durations = Service.objects.filter(uuid__in=list(quantities)).values_list('uuid', 'duration')
+    return sum(parse_duration_minutes(duration) * quantities[str(uuid)] for uuid, duration in durations)
+
+
+def slots_needed(minutes):
+    return max(1, math.ceil(minutes / settings.BOOKING_SLOT_MINUTES))
+
+
+def slot_start(day, slot):
+    """Aware start datetime of a slot on a day"""
+    opens = datetime.combine(day, _parse_time(settings.BOOKING_OPEN_TIME), tzinfo=workshop_timezone())
+    return opens + timedelta(minutes=slot * settings.BOOKING_SLOT_MINUTES)
+
+
+def slot_at(day, start):
+    """Slot index starting at the local time `start`, or None if it is not on the slot grid"""
+    opens = _parse_time(settings.BOOKING_OPEN_TIME)
+    offset = (start.hour * 60 + start.minute) - (opens.hour * 60 + opens.minute)
+    if offset < 0 or offset % settings.BOOKING_SLOT_MINUTES or start.second:
+        return None
+    return offset // settings.BOOKING_SLOT_MINUTES
+
+
+def first_bookable_slot(day, now=None):
+    """First slot of `day` that has not started yet"""
+    now = (now or timezone.now()).astimezone(workshop_timezone())
+    if day > now.date():
+        return 0
+    if day < now.date():
+        return slots_per_day()
+    opens = slot_start(day, 0)
+    return max(0, math.ceil((now - opens) / timedelta(minutes=settings.BOOKING_SLOT_MINUTES)))
+
+
+def validate_day(day, now=None):
+    today = (now or timezone.now()).astimezone(workshop_timezone()).date()
+    if day < today:
+        raise BookingError('Bookings cannot be made for past dates')
+    if day > today + timedelta(days=settings.BOOKING_HORIZON_DAYS):
+        raise BookingError(f'Bookings open {settings.BOOKING_HORIZON_DAYS} days in advance')
+
+
+def day_occupancy(day):
+    """
+    {bay_id: set of taken slots} for every active bay on a day.
+
+    A single LEFT JOIN of bays to that day's reservations, so bays with no
+    bookings are included with an empty set.
+    """
+    rows = ServiceBay.objects.filter(is_active=True).annotate(
+        day_reservations=FilteredRelation('reservations', condition=Q(reservations__day=day))
+    ).order_by('id').values_list('id', 'day_reservations__slot')
+    occupancy = {}
+    for bay_id, slot in rows:
+        taken = occupancy.setdefault(bay_id, set())
+        if slot is not None:
+            taken.add(slot)
+    return occupancy
+
+
+def _free_bays(occupancy, start_slot, needed):
+    window = set(range(start_slot, start_slot + needed))
+    return [bay_id for bay_id, taken in occupancy.items() if not taken & window]
+
+
+def available_windows(day, minutes, now=None):
+    """Start times on `day` at which a job of `minutes` fits in at least one bay"""
+    needed = slots_needed(minutes)
+    occupancy = day_occupancy(day)
+    windows = []
+    for start_slot in range(first_bookable_slot(day, now), slots_per_day() - needed + 1):
+        free = len(_free_bays(occupancy, start_slot, needed))
+        if free:
+            windows.append({
+                'start': slot_start(day, start_slot).isoformat(),
+                'end': slot_start(day, start_slot + needed).isoformat(),
+                'bays_available': free,
+            })
+    return windows
+
+
+def _clear_booked_items(user_id, quantities):
+    """Take the booked quantities out of the cart, keeping anything added since"""
+    apply_items(user_id, [(service_id, -quantity, True) for service_id, quantity in quantities.items()])
+    persist_cart(user_id)
+
+
+def create_booking(user, day, start, manufacturer_id=None, vehicle_model_id=None, now=None):
+    """
+    Turn a user's cart into a confirmed booking starting at local time `start` on `day`.
+
+    Every slot of the chosen bay is claimed with a row in BayReservation
+    whose (bay, day, slot) key is unique, so two concurrent requests for
+    overlapping windows cannot both commit: the loser gets an IntegrityError
+    on insert, rolls back its savepoint and moves on to the next free bay.
+    No rows are locked for reading, so bookings for different windows or
+    bays never wait on each other. Raises BookingError or SlotUnavailable.
+    """
+    validate_day(day, now)
+    start_slot = slot_at(day, start)
+    if start_slot is None:
+        raise BookingError(f'Start time must be on a {settings.BOOKING_SLOT_MINUTES} minute boundary within opening hours')
+    # Checked up front: the foreign keys are deferred, so a bad id would only fail at commit
+    if manufacturer_id and not Manufacturer.objects.filter(pk=manufacturer_id).exists():
+        raise BookingError('Unknown manufacturer')
+    if vehicle_model_id and not VehicleModel.objects.filter(pk=vehicle_model_id).exists():
+        raise BookingError('Unknown vehicle model')
+
+    persist_cart(user.id)
+    _, quantities = load_cart(user.id)
+    if not quantities:
+        raise BookingError('Cart is empty')
+    minutes = booking_minutes(quantities)
+    needed = slots_needed(minutes)
+    if start_slot < first_bookable_slot(day, now) or start_slot + needed > slots_per_day():
+        raise BookingError('The booking does not fit within opening hours')
+
+    candidates = _free_bays(day_occupancy(day), start_slot, needed)
+    # Spread simultaneous requests over the free bays so they rarely collide
+    random.shuffle(candidates)
+    summary = build_cart_summary(quantities, manufacturer_id, vehicle_model_id)
+
+    with transaction.atomic():
+        for bay_id in candidates:
+            try:
+                with transaction.atomic():
+                    booking = Booking.objects.create(
+                        user=user,
+                        bay_id=bay_id,
+                        manufacturer_id=manufacturer_id,
+                        vehicle_model_id=vehicle_model_id,
+                        start=slot_start(day, start_slot),
+                        end=slot_start(day, start_slot + needed),
+                        total=summary['total'],
+                    )
+                    BayReservation.objects.bulk_create([
+                        BayReservation(bay_id=bay_id, booking=booking, day=day, slot=slot)
+                        for slot in range(start_slot, start_slot + needed)
+                    ])
+                break
+            except IntegrityError:
+                continue
+        else:
+            raise SlotUnavailable('No bay is free for the requested time')
+
+        BookingItem.objects.bulk_create([
+            BookingItem(
+                booking=booking,
+                service_id=item['service'],
+                quantity=item['quantity'],
+                unit_price=item['discounted_unit_price'],
+                total=item['total'],
+            )
+            for item in summary['items']
+        ])
+        transaction.on_commit(partial(_clear_booked_items, user.id, quantities))
+    return booking
+
+
+def cancel_booking(booking):
+    """Cancel a booking and release its bay slots"""
+    with transaction.atomic():
+        booking.status = 'cancelled'
+        booking.save(update_fields=['status'])
+        BayReservation.objects.filter(booking=booking).delete()
+    return booking
@@ -0,0 +1,88 @@
+from decimal import Decimal
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from .models import Service
+from .cart_store import load_cart
+from .pricing import get_pricing_version, resolve_prices, apply_discount
+
+
+def _summary_key(user_id, version, manufacturer_id, vehicle_model_id):
+    return (
+        f'cart_summary_{user_id}_{version}_{get_pricing_version()}'
+        f'_{manufacturer_id or 0}_{vehicle_model_id or 0}'
+    )
+
+
+def build_cart_summary(quantities, manufacturer_id=None, vehicle_model_id=None):
+    """
+    Build the priced summary of a cart given as {service_id: quantity}.
+
+    Services come from one Service query and prices from one batched
+    ServicePrice lookup, whatever the number of items.
+    """
+    rows = list(
+        Service.objects.filter(uuid__in=list(quantities))
+        .order_by('name')
+        .values('uuid', 'name', 'slug', 'base_price', 'discount')
+    )
+    prices = resolve_prices(
+        ((row['uuid'], row['base_price']) for row in rows),
+        manufacturer_id=manufacturer_id,
+        vehicle_model_id=vehicle_model_id,
+    )
+
+    items = []
+    subtotal = Decimal('0.00')
+    total = Decimal('0.00')
+    item_count = 0
+    for row in rows:
+        quantity = quantities[str(row['uuid'])]
+        unit_price = prices[row['uuid']]
+        unit_discounted = apply_discount(unit_price, row['discount'])
+        line_subtotal = unit_price * quantity
+        line_total = unit_discounted * quantity
+        subtotal += line_subtotal
+        total += line_total
+        item_count += quantity
+        items.append({
+            'service': str(row['uuid']),
+            'service_name': row['name'],
+            'service_slug': row['slug'],
+            'quantity': quantity,
+            'unit_price': str(unit_price),
+            'discount_percent': str(row['discount']),
+            'discounted_unit_price': str(unit_discounted),
+            'subtotal': str(line_subtotal),
+            'discount_amount': str(line_subtotal - line_total),
+            'total': str(line_total),
+        })
+
+    return {
+        'items': items,
+        'item_count': item_count,
+        'subtotal': str(subtotal),
+        'discount_amount': str(subtotal - total),
+        'total': str(total),
+        'manufacturer': manufacturer_id,
+        'vehicle_model': vehicle_model_id,
+    }
+
+
+def get_cart_summary(user_id, manufacturer_id=None, vehicle_model_id=None):
+    """Cached cart summary; the key embeds the cart and pricing versions"""
+    version, quantities = load_cart(user_id)
+    key = _summary_key(user_id, version, manufacturer_id, vehicle_model_id)
+    summary = cache.get(key)
+    if summary is None:
+        summary = build_cart_summary(quantities, manufacturer_id, vehicle_model_id)
+        cache.set(key, summary, timeout=settings.CACHE_TTL)
+    return summary
+
+
+async def aget_cart_summary(user_id, manufacturer_id=None, vehicle_model_id=None):
+    """
+    get_cart_summary() for async views. The cart store client is synchronous,
+    so the whole lookup takes one thread hop rather than one per round trip.
+    """
+    return await sync_to_async(get_cart_summary)(user_id, manufacturer_id, vehicle_model_id)
@@ -0,0 +1,456 @@
+import hashlib
+import threading
+import uuid
+from functools import lru_cache
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+from .models import Service, Cart, CartItem
+
+
+class CartStore:
+    """
+    Storage engine for active carts.
+
+    A cart is a mapping of service id -> quantity plus a version string that
+    changes on every mutation. Mutating calls return None when the cart is
+    not loaded yet ("cold"); callers warm it from the database and retry.
+    Mutated carts are queued as dirty and written behind to Cart/CartItem by
+    flush_dirty_carts().
+    """
+
+    def get(self, user_id):
+        """Return (version, {service_id: quantity}) or None if the cart is cold"""
+        raise NotImplementedError
+
+    def load(self, user_id, items):
+        """Warm a cold cart from persisted items; a hot cart is left untouched"""
+        raise NotImplementedError
+
+    def add(self, user_id, service_id, quantity):
+        """Atomically add to a quantity and return the new quantity"""
+        raise NotImplementedError
+
+    def set(self, user_id, service_id, quantity):
+        """Set a quantity, removing the service when it drops to zero"""
+        raise NotImplementedError
+
+    def apply(self, user_id, operations):
+        """
+        Atomically apply (service_id, quantity, increment) operations in order
+        and return {service_id: new quantity}, or None if the cart is cold
+        """
+        raise NotImplementedError
+
+    def pop_dirty(self, count):
+        """Take up to `count` user ids whose carts need writing behind"""
+        raise NotImplementedError
+
+    def mark_dirty(self, user_ids):
+        """Queue carts for writing behind again, e.g. after a failed flush"""
+        raise NotImplementedError
+
+    def evict(self, user_id):
+        """Drop a cart from the store so it is reloaded from the database"""
+        raise NotImplementedError
+
+    def clear(self):
+        """Drop every cart and the dirty queue"""
+        raise NotImplementedError
+
+
+class DatabaseCartStore(CartStore):
+    """
+    Carts kept straight in the Cart/CartItem tables; the default without
+    Redis, so every worker and flush_carts see the same carts. Mutations
+    are written synchronously, leaving nothing to write behind, and a cart
+    is never cold. The version is a digest of the items.
+    """
+
+    def get(self, user_id):
+        items = {
+            str(service_id): quantity
+            for service_id, quantity in CartItem.objects.filter(cart__user_id=user_id).values_list('service_id', 'quantity')
+        }
+        digest = hashlib.md5(repr(sorted(items.items())).encode()).hexdigest()
+        return f'db.{digest}', items
+
+    def load(self, user_id, items):
+        pass
+
+    def apply(self, user_id, operations):
+        with transaction.atomic():
+            # Locking the cart row serializes concurrent changes to one cart
+            cart = Cart.objects.select_for_update().filter(user_id=user_id).order_by('pk').first()
+            if cart is None:
+                cart = Cart.objects.create(user_id=user_id)
+            rows = {str(item.service_id): item for item in CartItem.objects.filter(cart=cart)}
+            quantities = {service_id: item.quantity for service_id, item in rows.items()}
+            results = {}
+            for service_id, quantity, increment in operations:
+                service_id = str(service_id)
+                if increment:
+                    quantity = quantities.get(service_id, 0) + quantity
+                quantity = max(quantity, 0)
+                quantities[service_id] = results[service_id] = quantity
+
+            to_create, to_update, to_delete = [], [], []
+            for service_id in results:
+                item, quantity = rows.get(service_id), quantities[service_id]
+                if quantity == 0:
+                    if item is not None:
+                        to_delete.append(item.pk)
+                elif item is None:
+                    to_create.append(CartItem(cart=cart, service_id=service_id, quantity=quantity))
+                elif item.quantity != quantity:
+                    item.quantity = quantity
+                    to_update.append(item)
+            CartItem.objects.bulk_create(to_create)
+            CartItem.objects.bulk_update(to_update, ['quantity'])
+            if to_delete:
+                CartItem.objects.filter(pk__in=to_delete).delete()
+            return results
+
+    def add(self, user_id, service_id, quantity):
+        return self.apply(user_id, [(service_id, quantity, True)])[str(service_id)]
+
+    def set(self, user_id, service_id, quantity):
+        return self.apply(user_id, [(service_id, quantity, False)])[str(service_id)]
+
+    def pop_dirty(self, count):
+        return []
+
+    def mark_dirty(self, user_ids):
+        pass
+
+    def evict(self, user_id):
+        pass
+
+    def clear(self):
+        pass
+
+
+class InMemoryCartStore(CartStore):
+    """Process-local cart store for tests; other workers and flush_carts do not see its carts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._carts = {}
+        self._dirty = set()
+
+    def get(self, user_id):
+        with self._lock:
+            cart = self._carts.get(user_id)
+            if cart is None:
+                return None
+            return f"{cart['id']}.{cart['version']}", dict(cart['items'])
+
+    def load(self, user_id, items):
+        with self._lock:
+            if user_id not in self._carts:
+                self._carts[user_id] = {
+                    'id': uuid.uuid4().hex,
+                    'version': 1,
+                    'items': {str(service_id): quantity for service_id, quantity in items},
+                }
+
+    def apply(self, user_id, operations):
+        with self._lock:
+            cart = self._carts.get(user_id)
+            if cart is None:
+                return None
+            results = {}
+            for service_id, quantity, increment in operations:
+                service_id = str(service_id)
+                if increment:
+                    quantity = cart['items'].get(service_id, 0) + quantity
+                if quantity > 0:
+                    cart['items'][service_id] = quantity
+                else:
+                    cart['items'].pop(service_id, None)
+                    quantity = 0
+                results[service_id] = quantity
+            cart['version'] += 1
+            self._dirty.add(user_id)
+            return results
+
+    def add(self, user_id, service_id, quantity):
+        results = self.apply(user_id, [(service_id, quantity, True)])
+        return None if results is None else results[str(service_id)]
+
+    def set(self, user_id, service_id, quantity):
+        results = self.apply(user_id, [(service_id, quantity, False)])
+        return None if results is None else results[str(service_id)]
+
+    def pop_dirty(self, count):
+        with self._lock:
+            user_ids = [self._dirty.pop() for _ in range(min(count, len(self._dirty)))]
+        return user_ids
+
+    def mark_dirty(self, user_ids):
+        with self._lock:
+            self._dirty.update(user_ids)
+
+    def evict(self, user_id):
+        with self._lock:
+            self._carts.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._carts.clear()
+            self._dirty.clear()
+
+
+# KEYS: cart hash, dirty set. ARGV: field, quantity, user id, ttl, increment flag
+MUTATE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return false
+end
+local quantity
+if ARGV[5] == '1' then
+    quantity = redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+else
+    quantity = tonumber(ARGV[2])
+    redis.call('HSET', KEYS[1], ARGV[1], quantity)
+end
+if quantity <= 0 then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    quantity = 0
+end
+redis.call('HINCRBY', KEYS[1], '_v', 1)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('SADD', KEYS[2], ARGV[3])
+return quantity
+"""
+
+# KEYS: cart hash, dirty set. ARGV: user id, ttl, then field/quantity/increment flag triples.
+# Returns the new quantities in the order of the triples
+APPLY_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return false
+end
+local results = {}
+for i = 3, #ARGV, 3 do
+    local quantity
+    if ARGV[i + 2] == '1' then
+        quantity = redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+    else
+        quantity = tonumber(ARGV[i + 1])
+        redis.call('HSET', KEYS[1], ARGV[i], quantity)
+    end
+    if quantity <= 0 then
+        redis.call('HDEL', KEYS[1], ARGV[i])
+        quantity = 0
+    end
+    table.insert(results, quantity)
+end
+redis.call('HINCRBY', KEYS[1], '_v', 1)
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('SADD', KEYS[2], ARGV[1])
+return results
+"""
+
+# KEYS: cart hash. ARGV: cart id, ttl, then field/quantity pairs
+LOAD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], '_id', ARGV[1], '_v', 1)
+for i = 3, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+class RedisCartStore(CartStore):
+    """
+    Cart store keeping each active cart in a Redis hash.
+
+    Fields are `s:<service uuid>` -> quantity plus `_id`/`_v` for the cart
+    version. Mutations run as Lua scripts so the increment, version bump and
+    dirty marking happen atomically in one round trip.
+    """
+    prefix = 'cart'
+
+    def __init__(self, alias='default'):
+        from django_redis import get_redis_connection
+        self.client = get_redis_connection(alias)
+        self.ttl = settings.CART_STORE_TTL
+        self.dirty_key = f'{self.prefix}:dirty'
+        self._mutate_script = self.client.register_script(MUTATE_SCRIPT)
+        self._apply_script = self.client.register_script(APPLY_SCRIPT)
+        self._load_script = self.client.register_script(LOAD_SCRIPT)
+
+    def _key(self, user_id):
+        return f'{self.prefix}:{user_id}'
+
+    def get(self, user_id):
+        data = self.client.hgetall(self._key(user_id))
+        if not data:
+            return None
+        items = {}
+        for field, value in data.items():
+            field = field.decode()
+            if field.startswith('s:'):
+                items[field[2:]] = int(value)
+        return f"{data[b'_id'].decode()}.{int(data[b'_v'])}", items
+
+    def load(self, user_id, items):
+        args = [uuid.uuid4().hex, self.ttl]
+        for service_id, quantity in items:
+            args.extend([f's:{service_id}', quantity])
+        self._load_script(keys=[self._key(user_id)], args=args)
+
+    def _mutate(self, user_id, service_id, quantity, increment):
+        return self._mutate_script(
+            keys=[self._key(user_id), self.dirty_key],
+            args=[f's:{service_id}', int(quantity), user_id, self.ttl, '1' if increment else '0'],
+        )
+
+    def add(self, user_id, service_id, quantity):
+        return self._mutate(user_id, service_id, quantity, increment=True)
+
+    def set(self, user_id, service_id, quantity):
+        return self._mutate(user_id, service_id, quantity, increment=False)
+
+    def apply(self, user_id, operations):
+        operations = [(str(service_id), int(quantity), increment) for service_id, quantity, increment in operations]
+        args = [user_id, self.ttl]
+        for service_id, quantity, increment in operations:
+            args.extend([f's:{service_id}', quantity, '1' if increment else '0'])
+        quantities = self._apply_script(keys=[self._key(user_id), self.dirty_key], args=args)
+        if quantities is None:
+            return None
+        return {service_id: quantity for (service_id, _, _), quantity in zip(operations, quantities)}
+
+    def pop_dirty(self, count):
+        return [int(user_id) for user_id in self.client.spop(self.dirty_key, count) or []]
+
+    def mark_dirty(self, user_ids):
+        if user_ids:
+            self.client.sadd(self.dirty_key, *user_ids)
+
+    def evict(self, user_id):
+        self.client.delete(self._key(user_id))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(f'{self.prefix}:*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+@lru_cache(maxsize=None)
+def get_cart_store():
+    return import_string(settings.CART_STORE_BACKEND)()
+
+
+def load_cart(user_id):
+    """Return (version, items) for a user's cart, warming it from the database if cold"""
+    store = get_cart_store()
+    cart = store.get(user_id)
+    if cart is None:
+        store.load(user_id, CartItem.objects.filter(cart__user_id=user_id).values_list('service_id', 'quantity'))
+        cart = store.get(user_id)
+    return cart
+
+
+def _mutate(method, user_id, service_id, quantity):
+    store = get_cart_store()
+    result = getattr(store, method)(user_id, service_id, quantity)
+    if result is None:
+        load_cart(user_id)
+        result = getattr(store, method)(user_id, service_id, quantity)
+    return result
+
+
+def add_item(user_id, service_id, quantity=1):
+    """Add to the quantity of a service in a user's cart and return the new quantity"""
+    return _mutate('add', user_id, service_id, quantity)
+
+
+def set_item(user_id, service_id, quantity):
+    """Set the quantity of a service in a user's cart; zero removes it"""
+    return _mutate('set', user_id, service_id, quantity)
+
+
+def apply_items(user_id, operations):
+    """
+    Apply many (service_id, quantity, increment) operations to a user's cart
+    as one atomic change with a single version bump; returns {service_id: new quantity}
+    """
+    store = get_cart_store()
+    results = store.apply(user_id, operations)
+    if results is None:
+        load_cart(user_id)
+        results = store.apply(user_id, operations)
+    return results
+
+
+def _write_carts(carts):
+    """Persist {user_id: items} snapshots to Cart/CartItem in one transaction"""
+    service_ids = {service_id for items in carts.values() for service_id in items}
+    known_services = {
+        str(service_id) for service_id in Service.objects.filter(uuid__in=service_ids).values_list('uuid', flat=True)
+    }
+
+    with transaction.atomic():
+        cart_rows = {}
+        for cart in Cart.objects.filter(user_id__in=list(carts)).order_by('user_id'):
+            cart_rows.setdefault(cart.user_id, cart)
+        new_carts = [Cart(user_id=user_id) for user_id, items in carts.items() if user_id not in cart_rows and items]
+        Cart.objects.bulk_create(new_carts)
+        cart_rows.update({cart.user_id: cart for cart in new_carts})
+
+        existing = {
+            (item.cart_id, str(item.service_id)): item
+            for item in CartItem.objects.filter(cart__in=list(cart_rows.values()))
+        }
+        to_create, to_update = [], []
+        for user_id, items in carts.items():
+            cart = cart_rows.get(user_id)
+            if cart is None:
+                continue
+            for service_id, quantity in items.items():
+                if service_id not in known_services:
+                    continue
+                item = existing.pop((cart.pk, service_id), None)
+                if item is None:
+                    to_create.append(CartItem(cart=cart, service_id=service_id, quantity=quantity))
+                elif item.quantity != quantity:
+                    item.quantity = quantity
+                    to_update.append(item)
+        to_delete = [item.pk for item in existing.values()]
+
+        batch_size = settings.CART_FLUSH_BATCH_SIZE
+        CartItem.objects.bulk_create(to_create, batch_size=batch_size)
+        CartItem.objects.bulk_update(to_update, ['quantity'], batch_size=batch_size)
+        if to_delete:
+            CartItem.objects.filter(pk__in=to_delete).delete()
+
+
+def flush_dirty_carts(batch_size=None):
+    """Write one batch of dirty carts behind to the database; returns the number written"""
+    store = get_cart_store()
+    user_ids = store.pop_dirty(batch_size or settings.CART_FLUSH_BATCH_SIZE)
+    if not user_ids:
+        return 0
+    carts = {}
+    for user_id in user_ids:
+        cart = store.get(user_id)
+        if cart is not None:
+            carts[user_id] = cart[1]
+    try:
+        _write_carts(carts)
+    except Exception:
+        store.mark_dirty(user_ids)
+        raise
+    return len(carts)
+
+
+def persist_cart(user_id):
+    """Synchronously write a user's cart to the database, e.g. at checkout"""
+    cart = get_cart_store().get(user_id)
+    if cart is not None:
+        _write_carts({user_id: cart[1]})
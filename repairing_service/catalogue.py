@@ -0,0 +1,214 @@
+import threading
+from collections import defaultdict
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from authback.versioning import bump_cache_version, get_cache_version
+from vehicle.models import VehicleModel
+from .models import Service, ServicePrice
+from .pricing import apply_discount
+
+CATALOGUE_BATCH_SIZE = 500
+# Cached documents are stored as (version, document); a bump marks them all stale
+CATALOGUE_VERSION_KEY = 'catalogue_version'
+
+
+def _catalogue_key(vehicle_model_id):
+    return f'catalogue_{vehicle_model_id}'
+
+
+def build_catalogues(model_ids=None):
+    """
+    Build the "services for my bike" documents of many vehicle models at once.
+
+    A service fits a model when the model or its manufacturer is linked to
+    it, or when it is linked to neither (a universal service). Prices follow
+    Service.get_price precedence. The cost is a fixed handful of queries
+    regardless of the number of models or services.
+    Returns a dict of vehicle_model_id -> document.
+    """
+    vehicle_models = VehicleModel.objects.order_by('id')
+    if model_ids is not None:
+        vehicle_models = vehicle_models.filter(id__in=list(model_ids))
+    vehicle_models = list(vehicle_models.values('id', 'name', 'manufacturer_id', 'manufacturer__name'))
+    if not vehicle_models:
+        return {}
+
+    services = list(
+        Service.objects.order_by('category__name', 'name').values(
+            'uuid', 'name', 'slug', 'base_price', 'discount', 'duration', 'warranty',
+            'recommended', 'image', 'category_id', 'category__name', 'category__slug',
+        )
+    )
+
+    linked_models = defaultdict(set)
+    for service_id, model_id in Service.vehicles_models.through.objects.values_list('service_id', 'vehiclemodel_id'):
+        linked_models[service_id].add(model_id)
+    linked_manufacturers = defaultdict(set)
+    for service_id, manufacturer_id in Service.manufacturers.through.objects.values_list('service_id', 'manufacturer_id'):
+        linked_manufacturers[service_id].add(manufacturer_id)
+
+    prices = ServicePrice.objects.all()
+    if model_ids is not None:
+        prices = prices.filter(
+            Q(vehicles_model_id__in=[vm['id'] for vm in vehicle_models]) |
+            Q(vehicles_model__isnull=True, manufacturer_id__in={vm['manufacturer_id'] for vm in vehicle_models})
+        )
+    model_prices = {}
+    manufacturer_prices = {}
+    for service_id, manufacturer_id, model_id, price in prices.values_list(
+        'service_id', 'manufacturer_id', 'vehicles_model_id', 'price'
+    ):
+        if model_id is not None:
+            model_prices.setdefault((service_id, model_id), price)
+        else:
+            manufacturer_prices.setdefault((service_id, manufacturer_id), price)
+
+    documents = {}
+    for vm in vehicle_models:
+        categories = {}
+        for service in services:
+            service_id = service['uuid']
+            models_for_service = linked_models.get(service_id)
+            manufacturers_for_service = linked_manufacturers.get(service_id)
+            if (models_for_service or manufacturers_for_service) and not (
+                (models_for_service and vm['id'] in models_for_service) or
+                (manufacturers_for_service and vm['manufacturer_id'] in manufacturers_for_service)
+            ):
+                continue
+
+            price = model_prices.get((service_id, vm['id']))
+            if price is None:
+                price = manufacturer_prices.get((service_id, vm['manufacturer_id']), service['base_price'])
+
+            category_id = service['category_id']
+            if category_id not in categories:
+                categories[category_id] = {
+                    'uuid': str(category_id) if category_id else None,
+                    'name': service['category__name'],
+                    'slug': service['category__slug'],
+                    'services': [],
+                }
+            categories[category_id]['services'].append({
+                'uuid': str(service_id),
+                'name': service['name'],
+                'slug': service['slug'],
+                'price': str(price),
+                'discount': str(service['discount']),
+                'discounted_price': str(apply_discount(price, service['discount'])),
+                'duration': service['duration'],
+                'warranty': service['warranty'],
+                'recommended': service['recommended'],
+                'image': default_storage.url(service['image']) if service['image'] else None,
+            })
+
+        documents[vm['id']] = {
+            'manufacturer': {'id': vm['manufacturer_id'], 'name': vm['manufacturer__name']},
+            'vehicle_model': {'id': vm['id'], 'name': vm['name']},
+            'categories': list(categories.values()),
+        }
+    return documents
+
+
+def rebuild_catalogues(model_ids=None):
+    """Rebuild and cache the catalogues of `model_ids` (every model when None)"""
+    version = get_cache_version(CATALOGUE_VERSION_KEY)
+    if model_ids is None:
+        model_ids = list(VehicleModel.objects.order_by('id').values_list('id', flat=True))
+    model_ids = list(model_ids)
+    for start in range(0, len(model_ids), CATALOGUE_BATCH_SIZE):
+        batch = model_ids[start:start + CATALOGUE_BATCH_SIZE]
+        documents = build_catalogues(batch)
+        cache.set_many({_catalogue_key(model_id): (version, doc) for model_id, doc in documents.items()}, timeout=None)
+        removed = [model_id for model_id in batch if model_id not in documents]
+        if removed:
+            cache.delete_many([_catalogue_key(model_id) for model_id in removed])
+    return len(model_ids)
+
+
+def invalidate_catalogues():
+    """Mark every cached catalogue stale; each is rebuilt on its next read or by `manage.py build_catalogue`"""
+    bump_cache_version(CATALOGUE_VERSION_KEY)
+
+
+def get_catalogue(vehicle_model_id):
+    """
+    Cached catalogue of one vehicle model, built on a miss or when stale;
+    None if the model does not exist. The version and the document are read
+    in one round trip.
+    """
+    key = _catalogue_key(vehicle_model_id)
+    cached = cache.get_many([CATALOGUE_VERSION_KEY, key])
+    version = cached.get(CATALOGUE_VERSION_KEY) or get_cache_version(CATALOGUE_VERSION_KEY)
+    entry = cached.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    document = build_catalogues([vehicle_model_id]).get(vehicle_model_id)
+    if document is not None:
+        cache.set(key, (version, document), timeout=None)
+    return document
+
+
+async def aget_catalogue(vehicle_model_id):
+    """get_catalogue() for async views, in one thread hop"""
+    return await sync_to_async(get_catalogue)(vehicle_model_id)
+
+
+def models_for_services(service_ids):
+    """Ids of the vehicle models whose catalogue lists any of the services; None means every model"""
+    service_ids = set(service_ids)
+    model_links = Service.vehicles_models.through.objects.filter(service_id__in=service_ids)
+    manufacturer_links = Service.manufacturers.through.objects.filter(service_id__in=service_ids)
+    linked = set(model_links.values_list('service_id', flat=True)) | set(
+        manufacturer_links.values_list('service_id', flat=True)
+    )
+    if service_ids - linked:
+        return None
+    return set(
+        VehicleModel.objects.filter(
+            Q(id__in=model_links.values('vehiclemodel_id')) |
+            Q(manufacturer_id__in=manufacturer_links.values('manufacturer_id'))
+        ).values_list('id', flat=True)
+    )
+
+
+# Models whose catalogues changed in this thread's transaction
+_pending = threading.local()
+
+
+def _pending_changes():
+    if not hasattr(_pending, 'model_ids'):
+        _pending.model_ids = set()
+        _pending.everything = False
+    return _pending
+
+
+def _apply_pending():
+    pending = _pending_changes()
+    model_ids, everything = pending.model_ids, pending.everything
+    pending.model_ids, pending.everything = set(), False
+    if everything:
+        invalidate_catalogues()
+    elif model_ids:
+        rebuild_catalogues(model_ids)
+
+
+def schedule_rebuild(model_ids=None):
+    """
+    Rebuild the catalogues of `model_ids` after commit. When None, every
+    catalogue is marked stale instead of rebuilding them all in the request.
+
+    Changes are collected per thread, so everything changed in one
+    transaction, e.g. an admin save touching a service and its three M2M
+    relations, is handled by the first of its on-commit callbacks and the
+    others find nothing left. Models from a rolled-back transaction are only
+    rebuilt, needlessly, with the next commit.
+    """
+    pending = _pending_changes()
+    if model_ids is None:
+        pending.everything = True
+    else:
+        pending.model_ids.update(model_ids)
+    transaction.on_commit(_apply_pending)
@@ -0,0 +1,76 @@
+import gzip
+import hashlib
+import json
+from django.core.files.storage import default_storage
+from authback.versioning import LocalSnapshot
+from vehicle.models import VehicleType, Manufacturer, VehicleModel
+from .models import ServiceCategory
+
+CATALOGUE_TREE_VERSION_KEY = 'catalogue_tree_version'
+CATALOGUE_TREE_CHECK_INTERVAL = 5
+
+
+def _image_url(name):
+    return default_storage.url(name) if name else None
+
+
+class CatalogueTree:
+    """The serialized tree in identity and gzip encodings, with an ETag for each"""
+
+    def __init__(self, document):
+        self.body = json.dumps(document, separators=(',', ':')).encode()
+        # mtime=0 keeps the compressed bytes identical across workers
+        self.gzipped = gzip.compress(self.body, compresslevel=9, mtime=0)
+        digest = hashlib.sha1(self.body).hexdigest()
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'
+
+
+def build_catalogue_tree():
+    """
+    VehicleType -> Manufacturer -> VehicleModel tree plus the category index,
+    everything a client needs to let the user pick a bike and a category.
+
+    A manufacturer is listed under every vehicle type it has models of.
+    """
+    manufacturers = {
+        pk: {'id': pk, 'name': name, 'image': _image_url(image)}
+        for pk, name, image in Manufacturer.objects.order_by('name').values_list('id', 'name', 'image')
+    }
+    tree = {}
+    for vehicle_type_id, name, image in VehicleType.objects.order_by('name').values_list('id', 'name', 'image'):
+        tree[vehicle_type_id] = {'id': vehicle_type_id, 'name': name, 'image': _image_url(image), 'manufacturers': {}}
+
+    for pk, name, image, manufacturer_id, vehicle_type_id in VehicleModel.objects.order_by(
+        'manufacturer__name', 'name'
+    ).values_list('id', 'name', 'image', 'manufacturer_id', 'vehicle_type_id'):
+        type_manufacturers = tree[vehicle_type_id]['manufacturers']
+        if manufacturer_id not in type_manufacturers:
+            type_manufacturers[manufacturer_id] = dict(manufacturers[manufacturer_id], models=[])
+        type_manufacturers[manufacturer_id]['models'].append({'id': pk, 'name': name, 'image': _image_url(image)})
+
+    vehicle_types = []
+    for vehicle_type in tree.values():
+        vehicle_type['manufacturers'] = list(vehicle_type['manufacturers'].values())
+        vehicle_types.append(vehicle_type)
+
+    categories = [
+        {'uuid': str(uuid), 'name': name, 'slug': slug, 'image': _image_url(image)}
+        for uuid, name, slug, image in ServiceCategory.objects.order_by('name').values_list('uuid', 'name', 'slug', 'image')
+    ]
+    return CatalogueTree({'vehicle_types': vehicle_types, 'categories': categories})
+
+
+_snapshot = LocalSnapshot(CATALOGUE_TREE_VERSION_KEY, build_catalogue_tree, CATALOGUE_TREE_CHECK_INTERVAL)
+
+
+def get_catalogue_tree():
+    return _snapshot.get()
+
+
+async def aget_catalogue_tree():
+    return await _snapshot.aget()
+
+
+def invalidate_catalogue_tree():
+    _snapshot.invalidate()
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from repairing_service.catalogue import rebuild_catalogues
+
+
+class Command(BaseCommand):
+    help = 'Precompute the per vehicle model service catalogue documents into the cache, e.g. to warm them after a category change marked them all stale'
+
+    def add_arguments(self, parser):
+        parser.add_argument('vehicle_model_ids', nargs='*', type=int, help='Only rebuild these vehicle models')
+
+    def handle(self, *args, **options):
+        count = rebuild_catalogues(options['vehicle_model_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Built catalogues for {count} vehicle models'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from authback.images import WATCHED_FIELDS, build_all_derivatives
+
+
+class Command(BaseCommand):
+    help = 'Build responsive WebP/JPEG derivatives for every stored catalogue and vehicle image'
+
+    def handle(self, *args, **options):
+        sources = set()
+        for model, field_names in WATCHED_FIELDS:
+            for field_name in field_names:
+                sources.update(model.objects.exclude(**{field_name: ''}).values_list(field_name, flat=True))
+        sources.discard(None)
+
+        errors = build_all_derivatives(sorted(sources))
+        for source, error in errors.items():
+            self.stderr.write(f'{source}: {error}')
+        self.stdout.write(self.style.SUCCESS(f'Processed {len(sources) - len(errors)} images, {len(errors)} failed'))
@@ -0,0 +1,25 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from repairing_service.cart_store import flush_dirty_carts
+
+
+class Command(BaseCommand):
+    help = 'Write dirty carts from the hot cart store behind to the Cart/CartItem tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.CART_FLUSH_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='Keep flushing until interrupted')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when idle in --loop mode')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            flushed = flush_dirty_carts(options['batch_size'])
+            total += flushed
+            if flushed:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Flushed {total} carts'))
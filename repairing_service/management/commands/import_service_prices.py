@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from repairing_service.price_import import import_price_list, PriceImportError, PRICE_IMPORT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        'Upsert ServicePrice rows from a CSV price list with the columns '
+        'service, manufacturer, vehicle_model (optional) and price'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='Path to the CSV file (export XLSX sheets as CSV first)')
+        parser.add_argument('--batch-size', type=int, default=PRICE_IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['csv_file'], 'rb') as file:
+                result = import_price_list(file, batch_size=options['batch_size'])
+        except PriceImportError as e:
+            for error in e.errors:
+                self.stderr.write(f"Line {error['line']}: {error['error']}")
+            raise CommandError('Price list rejected, nothing was imported')
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['rows']} prices "
+            f"({result['model_prices']} model prices upserted, "
+            f"{result['manufacturer_prices_created']} manufacturer prices created, "
+            f"{result['manufacturer_prices_updated']} updated)"
+        ))
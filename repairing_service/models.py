@@ -106,3 +106,60 @@ class CartItem(models.Model):
 
 
 
+class ServiceBay(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.name
+
+
+class Booking(models.Model):
+    STATUS_CHOICES = [
+        ('confirmed', 'Confirmed'),
+        ('cancelled', 'Cancelled'),
+        ('completed', 'Completed'),
+    ]
+
+    uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='bookings', on_delete=models.CASCADE)
+    bay = models.ForeignKey(ServiceBay, related_name='bookings', on_delete=models.PROTECT)
+    manufacturer = models.ForeignKey(Manufacturer, null=True, blank=True, on_delete=models.SET_NULL)
+    vehicle_model = models.ForeignKey(VehicleModel, null=True, blank=True, on_delete=models.SET_NULL)
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='confirmed')
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', '-start'])]
+
+    def __str__(self):
+        return f'Booking for {self.user.email} at {self.start:%Y-%m-%d %H:%M}'
+
+
+class BookingItem(models.Model):
+    booking = models.ForeignKey(Booking, related_name='items', on_delete=models.CASCADE)
+    service = models.ForeignKey(Service, related_name='booking_items', on_delete=models.PROTECT)
+    quantity = models.PositiveIntegerField(default=1)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f'{self.quantity} of {self.service.name}'
+
+
+class BayReservation(models.Model):
+    """One booked slot of a bay; the unique key is what prevents double-booking"""
+    bay = models.ForeignKey(ServiceBay, related_name='reservations', on_delete=models.CASCADE)
+    booking = models.ForeignKey(Booking, related_name='reservations', on_delete=models.CASCADE)
+    day = models.DateField()
+    slot = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('bay', 'day', 'slot')
+        indexes = [models.Index(fields=['day'])]
+
+    def __str__(self):
+        return f'{self.bay} on {self.day} slot {self.slot}'
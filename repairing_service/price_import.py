@@ -0,0 +1,156 @@
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from vehicle.models import Manufacturer, VehicleModel
+from .models import Service, ServicePrice
+from .catalogue import schedule_rebuild
+from .pricing import bump_pricing_version
+
+PRICE_IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+REQUIRED_COLUMNS = ('service', 'manufacturer', 'price')
+
+
+class PriceImportError(Exception):
+    """Raised when a price list fails validation; nothing is written"""
+
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} invalid rows')
+        self.errors = errors
+
+
+def _lookup_maps():
+    """ID maps used to validate rows without a query per row"""
+    services = {}
+    for uuid, slug, name in Service.objects.values_list('uuid', 'slug', 'name'):
+        services[str(uuid)] = uuid
+        services[slug.lower()] = uuid
+        services.setdefault(name.strip().lower(), uuid)
+    manufacturers = {}
+    for pk, name in Manufacturer.objects.values_list('id', 'name'):
+        manufacturers[str(pk)] = pk
+        manufacturers[name.strip().lower()] = pk
+    vehicle_models = {}
+    for pk, name, manufacturer_id in VehicleModel.objects.values_list('id', 'name', 'manufacturer_id'):
+        vehicle_models[(manufacturer_id, str(pk))] = pk
+        vehicle_models[(manufacturer_id, name.strip().lower())] = pk
+    return services, manufacturers, vehicle_models
+
+
+def read_price_rows(rows):
+    """
+    Validate price list rows and return {(service, manufacturer, vehicles_model): price}.
+
+    Each row is a mapping with `service` (uuid, slug or name), `manufacturer`
+    (id or name), optional `vehicle_model` (id or name, blank for a
+    manufacturer-wide price) and `price`. Later rows win over earlier ones
+    for the same key. Raises PriceImportError listing the invalid rows.
+    """
+    services, manufacturers, vehicle_models = _lookup_maps()
+    prices = {}
+    errors = []
+    for line, row in enumerate(rows, start=2):
+        row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key is not None}
+        missing = [column for column in REQUIRED_COLUMNS if not row.get(column)]
+        if missing:
+            errors.append({'line': line, 'error': f"Missing {', '.join(missing)}"})
+        else:
+            service_id = services.get(row['service'].lower())
+            manufacturer_id = manufacturers.get(row['manufacturer'].lower())
+            vehicle_model_id = None
+            try:
+                price = Decimal(row['price'])
+            except InvalidOperation:
+                price = None
+            if row.get('vehicle_model') and manufacturer_id:
+                vehicle_model_id = vehicle_models.get((manufacturer_id, row['vehicle_model'].lower()))
+
+            if service_id is None:
+                errors.append({'line': line, 'error': f"Unknown service '{row['service']}'"})
+            elif manufacturer_id is None:
+                errors.append({'line': line, 'error': f"Unknown manufacturer '{row['manufacturer']}'"})
+            elif row.get('vehicle_model') and vehicle_model_id is None:
+                errors.append({'line': line, 'error': f"Unknown vehicle model '{row['vehicle_model']}' for this manufacturer"})
+            elif price is None or not price.is_finite() or price < 0 or price.as_tuple().exponent < -2 or price >= Decimal('1e8'):
+                errors.append({'line': line, 'error': f"Invalid price '{row['price']}'"})
+            else:
+                prices[(service_id, manufacturer_id, vehicle_model_id)] = price
+        if len(errors) >= MAX_REPORTED_ERRORS:
+            break
+    if errors:
+        raise PriceImportError(errors)
+    return prices
+
+
+def upsert_service_prices(prices, batch_size=PRICE_IMPORT_BATCH_SIZE):
+    """
+    Write {(service, manufacturer, vehicles_model): price} in one transaction.
+
+    Model specific prices are upserted with bulk_create(update_conflicts=True)
+    on the unique_together key. Manufacturer-wide prices have a NULL model,
+    which unique constraints never treat as conflicting, so those are matched
+    against the existing rows and split into bulk_create/bulk_update instead.
+    Price caches are invalidated once, after commit.
+    """
+    model_rows = []
+    wide_prices = {}
+    for (service_id, manufacturer_id, vehicle_model_id), price in prices.items():
+        if vehicle_model_id is None:
+            wide_prices[(service_id, manufacturer_id)] = price
+        else:
+            model_rows.append(ServicePrice(
+                service_id=service_id, manufacturer_id=manufacturer_id,
+                vehicles_model_id=vehicle_model_id, price=price,
+            ))
+
+    with transaction.atomic():
+        for start in range(0, len(model_rows), batch_size):
+            ServicePrice.objects.bulk_create(
+                model_rows[start:start + batch_size],
+                update_conflicts=True,
+                unique_fields=['service', 'manufacturer', 'vehicles_model'],
+                update_fields=['price'],
+            )
+
+        to_update = []
+        if wide_prices:
+            existing = ServicePrice.objects.filter(
+                vehicles_model__isnull=True,
+                manufacturer_id__in={manufacturer_id for _, manufacturer_id in wide_prices},
+            ).only('uuid', 'service_id', 'manufacturer_id', 'price')
+            for service_price in existing.iterator(chunk_size=batch_size):
+                price = wide_prices.pop((service_price.service_id, service_price.manufacturer_id), None)
+                if price is not None:
+                    service_price.price = price
+                    to_update.append(service_price)
+        to_create = [
+            ServicePrice(service_id=service_id, manufacturer_id=manufacturer_id, price=price)
+            for (service_id, manufacturer_id), price in wide_prices.items()
+        ]
+        ServicePrice.objects.bulk_update(to_update, ['price'], batch_size=batch_size)
+        ServicePrice.objects.bulk_create(to_create, batch_size=batch_size)
+
+        affected_models = {vehicle_model_id for _, _, vehicle_model_id in prices if vehicle_model_id is not None}
+        affected_manufacturers = {manufacturer_id for _, manufacturer_id, vehicle_model_id in prices if vehicle_model_id is None}
+        if affected_manufacturers:
+            affected_models.update(
+                VehicleModel.objects.filter(manufacturer_id__in=affected_manufacturers).values_list('id', flat=True)
+            )
+        transaction.on_commit(bump_pricing_version)
+        schedule_rebuild(affected_models)
+
+    return {
+        'rows': len(prices),
+        'model_prices': len(model_rows),
+        'manufacturer_prices_created': len(to_create),
+        'manufacturer_prices_updated': len(to_update),
+    }
+
+
+def import_price_list(file, batch_size=PRICE_IMPORT_BATCH_SIZE):
+    """Validate and upsert a CSV price list read from a binary or text file object"""
+    file = getattr(file, 'file', file)  # Unwrap Django's UploadedFile
+    if isinstance(file.read(0), bytes):
+        file = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    return upsert_service_prices(read_price_rows(csv.DictReader(file)), batch_size=batch_size)
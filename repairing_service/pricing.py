@@ -0,0 +1,61 @@
+from decimal import Decimal, ROUND_HALF_UP
+from authback.versioning import get_cache_version, bump_cache_version
+from .models import ServicePrice
+
+PRICING_VERSION_KEY = 'pricing_version'
+TWO_PLACES = Decimal('0.01')
+
+
+def get_pricing_version():
+    """Current version of the service price data, bumped on every price change"""
+    return get_cache_version(PRICING_VERSION_KEY)
+
+
+def bump_pricing_version():
+    """Invalidate every cached document that embeds resolved prices"""
+    return bump_cache_version(PRICING_VERSION_KEY)
+
+
+def resolve_prices(services, manufacturer_id=None, vehicle_model_id=None):
+    """
+    Resolve the effective price of many services at once.
+
+    Follows the same precedence as Service.get_price (model price, then
+    manufacturer-wide price, then base price) but with a single ServicePrice
+    query. `services` is an iterable of (service_id, base_price) pairs.
+    Returns a dict of service_id -> Decimal.
+    """
+    base_prices = dict(services)
+    prices = dict(base_prices)
+    if not base_prices or not (manufacturer_id or vehicle_model_id):
+        return prices
+
+    rows = ServicePrice.objects.filter(service_id__in=list(base_prices))
+    if vehicle_model_id and manufacturer_id:
+        rows = rows.filter(vehicles_model_id=vehicle_model_id) | rows.filter(
+            manufacturer_id=manufacturer_id, vehicles_model__isnull=True
+        )
+    elif vehicle_model_id:
+        rows = rows.filter(vehicles_model_id=vehicle_model_id)
+    else:
+        rows = rows.filter(manufacturer_id=manufacturer_id, vehicles_model__isnull=True)
+
+    model_prices = {}
+    manufacturer_prices = {}
+    for service_id, model_id, price in rows.values_list('service_id', 'vehicles_model_id', 'price'):
+        if model_id is not None:
+            model_prices.setdefault(service_id, price)
+        else:
+            manufacturer_prices.setdefault(service_id, price)
+
+    for service_id in base_prices:
+        if service_id in model_prices:
+            prices[service_id] = model_prices[service_id]
+        elif service_id in manufacturer_prices:
+            prices[service_id] = manufacturer_prices[service_id]
+    return prices
+
+
+def apply_discount(price, discount):
+    """Price after a percentage discount, rounded to paise"""
+    return (price - (price * (discount / 100))).quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
@@ -0,0 +1,103 @@
+import re
+from bisect import bisect_left
+from authback.versioning import LocalSnapshot
+from vehicle.models import Manufacturer, VehicleModel
+from .models import Feature, Service
+
+SEARCH_INDEX_VERSION_KEY = 'search_index_version'
+# How often a worker checks the shared version for changes made by other workers
+SEARCH_INDEX_CHECK_INTERVAL = 5
+MAX_SUGGESTIONS = 20
+# Bounds the work done for very short prefixes such as a single letter
+MAX_SCANNED_KEYS = 1000
+# Breaks ties between equally long matches of different kinds
+TYPE_RANKS = {'service': 0, 'vehicle_model': 1, 'manufacturer': 2, 'feature': 3}
+
+
+def normalize(text):
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', text.lower()).split())
+
+
+class PrefixIndex:
+    """
+    Sorted-array prefix index for typeahead suggestions.
+
+    Every entry is indexed under its full normalised name and under each
+    word suffix ("chain lubrication" is also found as "lubrication"), so a
+    lookup is a binary search followed by a short scan of matching keys.
+    """
+
+    def __init__(self, entries):
+        pairs = []
+        for position, entry in enumerate(entries):
+            words = normalize(entry['name']).split()
+            for start in range(len(words)):
+                pairs.append((' '.join(words[start:]), start, position))
+        pairs.sort()
+        self.keys = [key for key, _, _ in pairs]
+        self.postings = [(start, position) for _, start, position in pairs]
+        self.entries = list(entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def suggest(self, query, limit=10):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        matches = {}
+        index = bisect_left(self.keys, prefix)
+        end = min(len(self.keys), index + MAX_SCANNED_KEYS)
+        while index < end and self.keys[index].startswith(prefix):
+            start, position = self.postings[index]
+            if position not in matches or start < matches[position]:
+                matches[position] = start
+            index += 1
+        ranked = sorted(
+            matches.items(),
+            key=lambda match: (
+                match[1] > 0,
+                len(self.entries[match[0]]['name']),
+                TYPE_RANKS[self.entries[match[0]]['type']],
+                self.entries[match[0]]['name'],
+            ),
+        )
+        return [self.entries[position] for position, _ in ranked[:limit]]
+
+
+def build_index():
+    """Load every searchable name with one query per model"""
+    entries = []
+    for uuid, name, slug, category_id in Service.objects.values_list('uuid', 'name', 'slug', 'category_id'):
+        entries.append({
+            'type': 'service', 'id': str(uuid), 'name': name, 'slug': slug,
+            'category': str(category_id) if category_id else None,
+        })
+    for uuid, name in Feature.objects.values_list('uuid', 'name'):
+        entries.append({'type': 'feature', 'id': str(uuid), 'name': name})
+    for pk, name in Manufacturer.objects.values_list('id', 'name'):
+        entries.append({'type': 'manufacturer', 'id': pk, 'name': name})
+    for pk, name, manufacturer_id, manufacturer_name in VehicleModel.objects.values_list(
+        'id', 'name', 'manufacturer_id', 'manufacturer__name'
+    ):
+        entries.append({
+            'type': 'vehicle_model', 'id': pk, 'name': f'{manufacturer_name} {name}',
+            'manufacturer': manufacturer_id,
+        })
+    return PrefixIndex(entries)
+
+
+_holder = LocalSnapshot(SEARCH_INDEX_VERSION_KEY, build_index, SEARCH_INDEX_CHECK_INTERVAL)
+
+
+def get_index():
+    return _holder.get()
+
+
+def invalidate_index():
+    """Make every worker rebuild its index on its next lookup"""
+    _holder.invalidate()
+
+
+def autocomplete(query, limit=10):
+    return get_index().suggest(query, limit=min(limit, MAX_SUGGESTIONS))
@@ -1,7 +1,9 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
+from authback.images import ImageSrcsetField, ImageSrcsetListSerializer
 from .models import (
     Manufacturer, VehicleModel, Service, ServicePrice,
-    ServiceCategory, Feature, Cart, CartItem
+    ServiceCategory, Feature, Cart, CartItem, Booking, BookingItem
 )
 from vehicle.models import *
 
@@ -23,15 +25,51 @@ class ServicePriceSerializer(serializers.ModelSerializer):
 
 class ServiceSerializer(serializers.ModelSerializer):
     discounted_price = serializers.ReadOnlyField()
+    image_srcset = ImageSrcsetField(source='image')
 
     class Meta:
         model = Service
+        list_serializer_class = ImageSrcsetListSerializer
         fields = '__all__'
 
 
+class ServiceListSerializer(serializers.ModelSerializer):
+    """
+    Listing representation of a service with its M2M relations inlined.
+
+    Use setup_eager_loading() on the queryset so each relation costs one
+    query for the whole page instead of one per service.
+    """
+    discounted_price = serializers.ReadOnlyField()
+    manufacturers = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    vehicles_models = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    features = serializers.SlugRelatedField(many=True, read_only=True, slug_field='name')
+    image_srcset = ImageSrcsetField(source='image')
+
+    class Meta:
+        model = Service
+        list_serializer_class = ImageSrcsetListSerializer
+        fields = [
+            'uuid', 'name', 'slug', 'category', 'base_price', 'discount', 'discounted_price',
+            'description', 'duration', 'warranty', 'recommended', 'image', 'image_srcset',
+            'manufacturers', 'vehicles_models', 'features',
+        ]
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.prefetch_related(
+            Prefetch('manufacturers', queryset=Manufacturer.objects.only('id')),
+            Prefetch('vehicles_models', queryset=VehicleModel.objects.only('id')),
+            Prefetch('features', queryset=Feature.objects.only('uuid', 'name').order_by('name')),
+        )
+
+
 class ServiceCategorySerializer(serializers.ModelSerializer):
+    image_srcset = ImageSrcsetField(source='image')
+
     class Meta:
         model = ServiceCategory
+        list_serializer_class = ImageSrcsetListSerializer
         fields = '__all__'
 
 
@@ -50,10 +88,33 @@ class CartSerializer(serializers.ModelSerializer):
 
 class CartItemSerializer(serializers.ModelSerializer):
     service_name = serializers.CharField(source="service.name", read_only=True)
-    manufacturer_name = serializers.CharField(source="manufacturer.name", read_only=True)
-    vehicle_model_name = serializers.CharField(source="vehicle_model.name", read_only=True)
 
     class Meta:
         model = CartItem
-        fields = ['id', 'cart', 'service', 'service_name', 'manufacturer', 'manufacturer_name', 'vehicle_model', 'vehicle_model_name', 'quantity']
+        fields = ['uuid', 'cart', 'service', 'service_name', 'quantity']
 
+
+class BookingItemSerializer(serializers.ModelSerializer):
+    service_name = serializers.CharField(source="service.name", read_only=True)
+
+    class Meta:
+        model = BookingItem
+        fields = ['service', 'service_name', 'quantity', 'unit_price', 'total']
+
+
+class BookingSerializer(serializers.ModelSerializer):
+    bay_name = serializers.CharField(source="bay.name", read_only=True)
+    items = BookingItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Booking
+        fields = ['uuid', 'bay', 'bay_name', 'manufacturer', 'vehicle_model', 'start', 'end',
+                  'status', 'total', 'created_at', 'items']
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('bay').prefetch_related(
+            Prefetch('items', queryset=BookingItem.objects.select_related('service').only(
+                'booking', 'service__name', 'quantity', 'unit_price', 'total'
+            ))
+        )
@@ -0,0 +1,112 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from authback.images import watch_image_fields
+from vehicle.models import VehicleType, Manufacturer, VehicleModel
+from .models import Feature, ServiceCategory, Service, ServicePrice, Cart
+from .cart_store import get_cart_store
+from .catalogue import models_for_services, schedule_rebuild
+from .catalogue_tree import invalidate_catalogue_tree
+from .pricing import bump_pricing_version
+from .search import invalidate_index
+
+
+def _merge(model_ids, other_ids):
+    """Union of two affected-model sets where None stands for every model"""
+    if model_ids is None or other_ids is None:
+        return None
+    return set(model_ids) | set(other_ids)
+
+
+def _models_for_price(manufacturer_id, vehicles_model_id):
+    if vehicles_model_id:
+        return {vehicles_model_id}
+    return set(VehicleModel.objects.filter(manufacturer_id=manufacturer_id).values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Cart)
+def evict_deleted_cart(sender, instance, **kwargs):
+    get_cart_store().evict(instance.user_id)
+
+@receiver([post_save, post_delete], sender=Service)
+@receiver([post_save, post_delete], sender=ServicePrice)
+def invalidate_prices(sender, instance, **kwargs):
+    bump_pricing_version()
+
+# Compatibility catalogue
+
+@receiver(post_save, sender=Service)
+def rebuild_catalogue_on_service_save(sender, instance, **kwargs):
+    schedule_rebuild(models_for_services([instance.pk]))
+
+@receiver(pre_delete, sender=Service)
+def capture_catalogue_on_service_delete(sender, instance, **kwargs):
+    instance._catalogue_models = models_for_services([instance.pk])
+
+@receiver(post_delete, sender=Service)
+def rebuild_catalogue_on_service_delete(sender, instance, **kwargs):
+    schedule_rebuild(getattr(instance, '_catalogue_models', None))
+
+@receiver(pre_save, sender=ServicePrice)
+def capture_catalogue_on_price_change(sender, instance, **kwargs):
+    instance._catalogue_models = set()
+    if not instance._state.adding:
+        previous = ServicePrice.objects.filter(pk=instance.pk).values_list('manufacturer_id', 'vehicles_model_id').first()
+        if previous:
+            instance._catalogue_models = _models_for_price(*previous)
+
+@receiver([post_save, post_delete], sender=ServicePrice)
+def rebuild_catalogue_on_price_change(sender, instance, **kwargs):
+    schedule_rebuild(_merge(
+        getattr(instance, '_catalogue_models', set()),
+        _models_for_price(instance.manufacturer_id, instance.vehicles_model_id),
+    ))
+
+@receiver(m2m_changed, sender=Service.manufacturers.through)
+@receiver(m2m_changed, sender=Service.vehicles_models.through)
+def rebuild_catalogue_on_link_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action.startswith('pre_'):
+        if not reverse:
+            service_ids = {instance.pk}
+        elif pk_set is not None:
+            service_ids = set(pk_set)
+        else:
+            service_ids = set(instance.services.values_list('uuid', flat=True))
+        instance._catalogue_links = (service_ids, models_for_services(service_ids))
+    else:
+        service_ids, model_ids = getattr(instance, '_catalogue_links', (set(), set()))
+        schedule_rebuild(_merge(model_ids, models_for_services(service_ids)))
+
+@receiver([post_save, post_delete], sender=VehicleModel)
+def rebuild_catalogue_on_model_change(sender, instance, **kwargs):
+    schedule_rebuild([instance.pk])
+
+@receiver(post_save, sender=Manufacturer)
+def rebuild_catalogue_on_manufacturer_change(sender, instance, **kwargs):
+    schedule_rebuild(VehicleModel.objects.filter(manufacturer=instance).values_list('id', flat=True))
+
+@receiver([post_save, post_delete], sender=ServiceCategory)
+def rebuild_catalogue_on_category_change(sender, instance, **kwargs):
+    schedule_rebuild()
+
+# Autocomplete index
+
+@receiver([post_save, post_delete], sender=Service)
+@receiver([post_save, post_delete], sender=Feature)
+@receiver([post_save, post_delete], sender=Manufacturer)
+@receiver([post_save, post_delete], sender=VehicleModel)
+def refresh_search_index(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_index)
+
+# Catalogue tree
+
+@receiver([post_save, post_delete], sender=VehicleType)
+@receiver([post_save, post_delete], sender=Manufacturer)
+@receiver([post_save, post_delete], sender=VehicleModel)
+@receiver([post_save, post_delete], sender=ServiceCategory)
+def refresh_catalogue_tree(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_catalogue_tree)
+
+
+watch_image_fields(ServiceCategory, 'image')
+watch_image_fields(Service, 'image')
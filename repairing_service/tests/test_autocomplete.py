@@ -0,0 +1,26 @@
+import pytest
+from decimal import Decimal
+from django.urls import reverse
+from vehicle.models import VehicleType, Manufacturer, VehicleModel
+from repairing_service.models import Feature, Service
+from repairing_service.search import invalidate_index
+
+
+@pytest.mark.django_db
+def test_autocomplete_matches_word_prefixes_without_queries(client, django_assert_num_queries):
+    honda = Manufacturer.objects.create(name='Honda')
+    VehicleModel.objects.create(name='Shine', manufacturer=honda, vehicle_type=VehicleType.objects.create(name='Bike'))
+    Service.objects.create(name='Chain Lubrication', base_price=Decimal('100.00'), description='',
+                           duration='15 min', warranty='', recommended='')
+    Feature.objects.create(name='Free Pickup')
+    invalidate_index()
+    url = reverse('autocomplete')
+
+    assert [r['name'] for r in client.get(url, {'q': 'lub'}).json()['results']] == ['Chain Lubrication']
+    with django_assert_num_queries(0):
+        response = client.get(url, {'q': 'sh'})
+    assert response.json()['results'] == [
+        {'type': 'vehicle_model', 'id': honda.vehiclemodel_set.get().id, 'name': 'Honda Shine', 'manufacturer': honda.id}
+    ]
+    assert [r['type'] for r in client.get(url, {'q': 'h'}).json()['results']] == ['manufacturer', 'vehicle_model']
+    assert client.get(url, {'q': '  '}).json()['results'] == []
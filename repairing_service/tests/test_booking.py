@@ -0,0 +1,173 @@
+import pytest
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import User
+from repairing_service import booking as booking_module
+from repairing_service.booking import parse_duration_minutes, workshop_timezone
+from repairing_service.models import Service, ServiceBay, Booking, BayReservation, CartItem
+from repairing_service.cart_store import get_cart_store, add_item, load_cart
+
+
+@pytest.fixture
+def workshop(db):
+    cache.clear()
+    get_cart_store().clear()
+    bays = [ServiceBay.objects.create(name='Bay 1'), ServiceBay.objects.create(name='Bay 2')]
+    oil = Service.objects.create(name='Oil Change', base_price=Decimal('500.00'), discount=Decimal('10'),
+                                 description='', duration='30 min', warranty='', recommended='')
+    chain = Service.objects.create(name='Chain Lube', base_price=Decimal('200.00'),
+                                   description='', duration='15 min', warranty='', recommended='')
+    tomorrow = timezone.now().astimezone(workshop_timezone()).date() + timedelta(days=1)
+    return bays, oil, chain, tomorrow
+
+
+def _rider(name, *services):
+    user = User.objects.create_user(username=name, email=f'{name}@example.com', password='Secret123!')
+    for service, quantity in services:
+        add_item(user.id, service.uuid, quantity)
+    client = APIClient()
+    client.force_authenticate(user)
+    return user, client
+
+
+def _start(day, hour, minute=0):
+    return datetime.combine(day, time(hour, minute)).isoformat()
+
+
+@pytest.mark.parametrize('text, minutes', [
+    ('30 min', 30),
+    ('2 hours', 120),
+    ('1 hr 30 mins', 90),
+    ('1-2 hours', 120),
+    ('1.5 hrs', 90),
+    ('45', 45),
+    ('Half a day', 60),
+])
+def test_parse_duration_minutes(text, minutes):
+    assert parse_duration_minutes(text) == minutes
+
+
+def test_availability_in_one_query(workshop, django_assert_num_queries):
+    bays, oil, chain, day = workshop
+    user, client = _rider('early', (oil, 1))
+    assert client.post(reverse('booking-list'), {'start': _start(day, 9)}).status_code == 201
+
+    with django_assert_num_queries(1):
+        response = APIClient().get(reverse('booking-availability'), {'date': day.isoformat(), 'duration': 60})
+
+    assert response.status_code == 200
+    windows = {window['start'][11:16]: window['bays_available'] for window in response.data['windows']}
+    assert windows['09:00'] == 1
+    assert windows['09:30'] == 2
+    assert windows['18:00'] == 2
+    assert '18:30' not in windows
+
+
+def test_availability_sized_for_cart(workshop):
+    bays, oil, chain, day = workshop
+    user, client = _rider('sizer', (oil, 2), (chain, 1))
+
+    response = client.get(reverse('booking-availability'), {'date': day.isoformat()})
+
+    assert response.data['duration_minutes'] == 75
+    first = response.data['windows'][0]
+    assert first['start'][11:16] == '09:00'
+    assert first['end'][11:16] == '10:30'
+
+
+def test_booking_reserves_bay_and_clears_cart(workshop, django_capture_on_commit_callbacks):
+    bays, oil, chain, day = workshop
+    user, client = _rider('rider', (oil, 2), (chain, 1))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(reverse('booking-list'), {'start': _start(day, 10)})
+
+    assert response.status_code == 201
+    assert response.data['total'] == '1100.00'
+    assert datetime.fromisoformat(response.data['start']) == datetime.combine(day, time(10), tzinfo=workshop_timezone())
+    assert len(response.data['items']) == 2
+    assert BayReservation.objects.filter(day=day).count() == 3
+    assert load_cart(user.id)[1] == {}
+    assert not CartItem.objects.filter(cart__user=user).exists()
+
+
+def test_service_re_added_while_booking_stays_in_cart(workshop, django_capture_on_commit_callbacks):
+    bays, oil, chain, day = workshop
+    user, client = _rider('rider', (oil, 2))
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        assert client.post(reverse('booking-list'), {'start': _start(day, 10)}).status_code == 201
+    add_item(user.id, oil.uuid, 1)
+    for callback in callbacks:
+        callback()
+
+    assert load_cart(user.id)[1] == {str(oil.uuid): 1}
+
+
+def test_unknown_vehicle_is_rejected(workshop):
+    bays, oil, chain, day = workshop
+    user, client = _rider('rider', (oil, 1))
+
+    for field in ('manufacturer', 'vehicle_model'):
+        response = client.post(reverse('booking-list'), {'start': _start(day, 10), field: 999})
+        assert response.status_code == 400
+    assert not Booking.objects.exists()
+
+
+def test_overlapping_bookings_fill_bays_then_conflict(workshop):
+    bays, oil, chain, day = workshop
+    responses = []
+    for name in ('first', 'second', 'third'):
+        user, client = _rider(name, (oil, 2))
+        responses.append(client.post(reverse('booking-list'), {'start': _start(day, 11)}))
+
+    assert [response.status_code for response in responses] == [201, 201, 409]
+    assert {response.data['bay'] for response in responses[:2]} == {bay.id for bay in bays}
+    # The third rider keeps their cart
+    assert load_cart(User.objects.get(username='third').id)[1] == {str(oil.uuid): 2}
+
+
+def test_concurrent_booking_loses_on_unique_slot(workshop, monkeypatch):
+    bays, oil, chain, day = workshop
+    user, client = _rider('winner', (oil, 1))
+    assert client.post(reverse('booking-list'), {'start': _start(day, 12)}).status_code == 201
+    taken = Booking.objects.get(user=user).bay_id
+
+    # A request that read availability before the winner committed still sees every bay free
+    monkeypatch.setattr(booking_module, 'day_occupancy', lambda day: {bay.id: set() for bay in bays})
+    monkeypatch.setattr(booking_module.random, 'shuffle', lambda candidates: candidates.sort(key=lambda bay_id: bay_id != taken))
+    user, client = _rider('loser', (oil, 1))
+    response = client.post(reverse('booking-list'), {'start': _start(day, 12)})
+
+    assert response.status_code == 201
+    assert response.data['bay'] != taken
+    assert Booking.objects.count() == 2
+
+
+def test_rejects_invalid_start(workshop):
+    bays, oil, chain, day = workshop
+    user, client = _rider('picky', (oil, 1))
+    url = reverse('booking-list')
+
+    assert client.post(url, {'start': _start(day, 10, 10)}).status_code == 400
+    assert client.post(url, {'start': _start(day, 19)}).status_code == 400
+    assert client.post(url, {'start': _start(day - timedelta(days=2), 10)}).status_code == 400
+    empty_user, empty_client = _rider('empty')
+    assert empty_client.post(url, {'start': _start(day, 10)}).data['error'] == 'Cart is empty'
+
+
+def test_cancel_releases_slots(workshop):
+    bays, oil, chain, day = workshop
+    user, client = _rider('canceller', (oil, 1))
+    booking_id = client.post(reverse('booking-list'), {'start': _start(day, 14)}).data['uuid']
+
+    response = client.post(reverse('booking-cancel', args=[booking_id]))
+
+    assert response.status_code == 200
+    assert Booking.objects.get(uuid=booking_id).status == 'cancelled'
+    assert not BayReservation.objects.exists()
+    assert client.get(reverse('booking-list')).data[0]['status'] == 'cancelled'
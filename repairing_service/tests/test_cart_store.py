@@ -0,0 +1,151 @@
+import pytest
+from decimal import Decimal
+from django.urls import reverse
+from rest_framework.test import APIClient
+from accounts.models import User
+from repairing_service.models import Service, Cart, CartItem
+from repairing_service.cart_store import DatabaseCartStore, get_cart_store, flush_dirty_carts, set_item
+
+
+@pytest.fixture
+def store(settings):
+    settings.CART_STORE_BACKEND = 'repairing_service.cart_store.InMemoryCartStore'
+    get_cart_store.cache_clear()
+    yield get_cart_store()
+    get_cart_store().clear()
+    get_cart_store.cache_clear()
+
+
+@pytest.fixture
+def services(db):
+    return [
+        Service.objects.create(name=name, base_price=Decimal('100.00'), description='',
+                               duration='30 min', warranty='', recommended='')
+        for name in ('Oil Change', 'Chain Lube', 'Brake Pads')
+    ]
+
+
+def test_add_to_cart_is_written_behind(store, services, django_assert_num_queries):
+    user = User.objects.create_user(username='rider', email='rider@example.com', password='Secret123!')
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse('add-to-cart')
+
+    client.post(url, {'service_id': str(services[0].uuid)}, format='json')
+    with django_assert_num_queries(1):
+        response = client.post(url, {'service_id': str(services[0].uuid), 'quantity': 2}, format='json')
+    assert response.status_code == 201
+    assert response.data['quantity'] == 3
+    assert not CartItem.objects.exists()
+
+    client.post(url, {'service_id': str(services[1].uuid)}, format='json')
+    assert flush_dirty_carts() == 1
+    quantities = dict(CartItem.objects.filter(cart__user=user).values_list('service__name', 'quantity'))
+    assert quantities == {'Oil Change': 3, 'Chain Lube': 1}
+
+    set_item(user.id, services[0].uuid, 0)
+    set_item(user.id, services[1].uuid, 5)
+    assert flush_dirty_carts() == 1
+    quantities = dict(CartItem.objects.filter(cart__user=user).values_list('service__name', 'quantity'))
+    assert quantities == {'Chain Lube': 5}
+    assert Cart.objects.filter(user=user).count() == 1
+
+
+def test_cold_cart_is_loaded_before_increment(store, services):
+    user = User.objects.create_user(username='rider', email='rider@example.com', password='Secret123!')
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.create(cart=cart, service=services[2], quantity=4)
+
+    client = APIClient()
+    client.force_authenticate(user)
+    response = client.post(reverse('add-to-cart'), {'service_id': str(services[2].uuid)}, format='json')
+
+    assert response.data['quantity'] == 5
+    flush_dirty_carts()
+    assert CartItem.objects.get(cart=cart).quantity == 5
+
+
+def test_batch_update_applies_all_items_at_once(store, services, django_assert_max_num_queries):
+    user = User.objects.create_user(username='rider', email='rider@example.com', password='Secret123!')
+    client = APIClient()
+    client.force_authenticate(user)
+    client.post(reverse('add-to-cart'), {'service_id': str(services[0].uuid)}, format='json')
+    url = reverse('cart-batch')
+    items = [{'service_id': str(service.uuid), 'quantity': 2} for service in services]
+
+    # Service lookup plus the summary's service and price queries
+    with django_assert_max_num_queries(3):
+        response = client.post(url, {'items': items}, format='json')
+
+    assert response.status_code == 200
+    assert {item['service_name']: item['quantity'] for item in response.data['items']} == {
+        'Oil Change': 3, 'Chain Lube': 2, 'Brake Pads': 2,
+    }
+    assert response.data['total'] == '700.00'
+
+    response = client.post(url, {'mode': 'set', 'items': [
+        {'service_id': str(services[0].uuid), 'quantity': 0},
+        {'service_id': str(services[1].uuid), 'quantity': 1},
+    ]}, format='json')
+    assert response.data['item_count'] == 3
+
+    assert flush_dirty_carts() == 1
+    quantities = dict(CartItem.objects.filter(cart__user=user).values_list('service__name', 'quantity'))
+    assert quantities == {'Chain Lube': 1, 'Brake Pads': 2}
+
+
+def test_batch_update_is_all_or_nothing(store, services):
+    user = User.objects.create_user(username='rider', email='rider@example.com', password='Secret123!')
+    client = APIClient()
+    client.force_authenticate(user)
+    missing = '00000000-0000-0000-0000-000000000000'
+
+    response = client.post(reverse('cart-batch'), {'items': [
+        {'service_id': str(services[0].uuid), 'quantity': 1},
+        {'service_id': missing, 'quantity': 1},
+    ]}, format='json')
+    assert response.status_code == 404
+    assert response.data['service_ids'] == [missing]
+
+    response = client.post(reverse('cart-batch'), {'items': [
+        {'service_id': str(services[0].uuid), 'quantity': 0},
+    ]}, format='json')
+    assert response.status_code == 400
+    assert store.get(user.id) is None
+
+
+def test_without_redis_carts_are_written_straight_to_the_database(services):
+    user = User.objects.create_user(username='rider', email='rider@example.com', password='Secret123!')
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse('add-to-cart')
+
+    client.post(url, {'service_id': str(services[0].uuid)}, format='json')
+    response = client.post(url, {'service_id': str(services[0].uuid), 'quantity': 2}, format='json')
+
+    assert response.data['quantity'] == 3
+    # Every worker, and a restart, sees the same cart
+    assert CartItem.objects.get(cart__user=user).quantity == 3
+    before = get_cart_store().get(user.id)[0]
+    set_item(user.id, services[0].uuid, 0)
+    assert get_cart_store().get(user.id)[0] != before
+    assert not CartItem.objects.exists()
+    assert flush_dirty_carts() == 0
+
+
+def test_database_store_writes_a_batch_in_bulk(services, django_assert_max_num_queries):
+    user = User.objects.create_user(username='rider', email='rider@example.com', password='Secret123!')
+    store = DatabaseCartStore()
+    store.apply(user.id, [(services[0].uuid, 1, False), (services[1].uuid, 1, False)])
+
+    # Lock the cart, read its items, one insert, one update, one delete, the savepoint pair
+    with django_assert_max_num_queries(7):
+        results = store.apply(user.id, [
+            (services[0].uuid, 2, True),
+            (services[1].uuid, 0, False),
+            (services[2].uuid, 1, True),
+            (services[2].uuid, 4, False),
+        ])
+
+    assert results == {str(services[0].uuid): 3, str(services[1].uuid): 0, str(services[2].uuid): 4}
+    assert store.get(user.id)[1] == {str(services[0].uuid): 3, str(services[2].uuid): 4}
@@ -0,0 +1,85 @@
+import pytest
+from decimal import Decimal
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+from accounts.authentication import get_auth_flags
+from accounts.models import User
+from accounts.serializers import get_tokens_for_user
+from vehicle.models import VehicleType, Manufacturer, VehicleModel
+from repairing_service.models import Service, ServicePrice, Cart, CartItem
+from repairing_service.cart_store import get_cart_store, set_item
+
+
+@pytest.fixture
+def priced_cart(db, settings):
+    cache.clear()
+    # The hot store Redis provides in production
+    settings.CART_STORE_BACKEND = 'repairing_service.cart_store.InMemoryCartStore'
+    get_cart_store.cache_clear()
+    get_cart_store().clear()
+    user = User.objects.create_user(username='rider', email='rider@example.com', password='Secret123!')
+    manufacturer = Manufacturer.objects.create(name='Honda')
+    bike = VehicleType.objects.create(name='Bike')
+    model = VehicleModel.objects.create(name='Shine', manufacturer=manufacturer, vehicle_type=bike)
+    oil = Service.objects.create(name='Oil Change', base_price=Decimal('500.00'), discount=Decimal('10'),
+                                 description='', duration='30 min', warranty='', recommended='')
+    chain = Service.objects.create(name='Chain Lube', base_price=Decimal('200.00'),
+                                   description='', duration='15 min', warranty='', recommended='')
+    ServicePrice.objects.create(service=oil, manufacturer=manufacturer, vehicles_model=model, price=Decimal('600.00'))
+    ServicePrice.objects.create(service=chain, manufacturer=manufacturer, price=Decimal('250.00'))
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.create(cart=cart, service=oil, quantity=2)
+    CartItem.objects.create(cart=cart, service=chain, quantity=1)
+    yield user, manufacturer, model
+    get_cart_store().clear()
+    get_cart_store.cache_clear()
+
+
+def authenticated_client(user):
+    # The summary view is async and reads the bearer token itself
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(user)['access']}")
+    return client
+
+
+def test_cart_summary_resolves_vehicle_prices(priced_cart, django_assert_max_num_queries):
+    user, manufacturer, model = priced_cart
+    client = authenticated_client(user)
+    url = reverse('cart-summary')
+    # Warm the auth flag cache so the budget only counts the summary
+    get_auth_flags(user.id)
+
+    with django_assert_max_num_queries(3):
+        response = client.get(url, {'manufacturer': manufacturer.id, 'vehicle_model': model.id})
+
+    assert response.status_code == 200
+    summary = response.json()
+    items = {item['service_name']: item for item in summary['items']}
+    assert items['Oil Change']['unit_price'] == '600.00'
+    assert items['Oil Change']['total'] == '1080.00'
+    assert items['Chain Lube']['unit_price'] == '250.00'
+    assert summary['subtotal'] == '1450.00'
+    assert summary['total'] == '1330.00'
+    assert summary['item_count'] == 3
+
+    with django_assert_max_num_queries(0):
+        client.get(url, {'manufacturer': manufacturer.id, 'vehicle_model': model.id})
+
+
+def test_cart_summary_invalidated_on_mutation(priced_cart):
+    user, manufacturer, model = priced_cart
+    client = authenticated_client(user)
+    url = reverse('cart-summary')
+
+    assert client.get(url).json()['subtotal'] == '1200.00'
+    set_item(user.id, Service.objects.get(name='Chain Lube').uuid, 0)
+    assert client.get(url).json()['subtotal'] == '1000.00'
+
+
+def test_cart_summary_requires_a_token(priced_cart):
+    response = APIClient().get(reverse('cart-summary'))
+
+    assert response.status_code == 401
+    assert response.json() == {'detail': 'Authentication credentials were not provided.'}
+    assert response['WWW-Authenticate'].startswith('Bearer')
@@ -0,0 +1,82 @@
+import pytest
+from decimal import Decimal
+from django.core.cache import cache
+from django.urls import reverse
+from vehicle.models import VehicleType, Manufacturer, VehicleModel
+from repairing_service.models import ServiceCategory, Service, ServicePrice
+from repairing_service.catalogue import rebuild_catalogues
+
+
+def make_service(name, category, **kwargs):
+    return Service.objects.create(name=name, category=category, base_price=Decimal('100.00'), description='',
+                                  duration='30 min', warranty='', recommended='', **kwargs)
+
+
+@pytest.fixture
+def catalogue_data(db, django_capture_on_commit_callbacks):
+    cache.clear()
+    with django_capture_on_commit_callbacks(execute=True):
+        return _create_catalogue_data()
+
+
+def _create_catalogue_data():
+    bike = VehicleType.objects.create(name='Bike')
+    honda = Manufacturer.objects.create(name='Honda')
+    bajaj = Manufacturer.objects.create(name='Bajaj')
+    shine = VehicleModel.objects.create(name='Shine', manufacturer=honda, vehicle_type=bike)
+    pulsar = VehicleModel.objects.create(name='Pulsar', manufacturer=bajaj, vehicle_type=bike)
+    general = ServiceCategory.objects.create(name='General Service')
+    make_service('Wash', general)
+    honda_tune = make_service('Honda Tune Up', general)
+    honda_tune.manufacturers.add(honda)
+    pulsar_kit = make_service('Pulsar Chain Kit', general)
+    pulsar_kit.vehicles_models.add(pulsar)
+    ServicePrice.objects.create(service=honda_tune, manufacturer=honda, vehicles_model=shine, price=Decimal('150.00'))
+    return shine, pulsar, honda_tune
+
+
+def service_prices(document):
+    return {service['name']: service['price'] for category in document['categories'] for service in category['services']}
+
+
+def test_catalogue_lists_compatible_services(catalogue_data, client, django_assert_num_queries):
+    shine, pulsar, _ = catalogue_data
+    rebuild_catalogues()
+
+    with django_assert_num_queries(0):
+        response = client.get(reverse('vehicle-model-services', args=[shine.id]))
+    assert response.status_code == 200
+    assert service_prices(response.json()) == {'Honda Tune Up': '150.00', 'Wash': '100.00'}
+    assert service_prices(client.get(reverse('vehicle-model-services', args=[pulsar.id])).json()) == {
+        'Pulsar Chain Kit': '100.00', 'Wash': '100.00'
+    }
+    assert client.get(reverse('vehicle-model-services', args=[999])).status_code == 404
+
+
+def test_catalogue_rebuilt_on_price_and_link_change(catalogue_data, client, django_capture_on_commit_callbacks):
+    shine, pulsar, honda_tune = catalogue_data
+    with django_capture_on_commit_callbacks(execute=True):
+        ServicePrice.objects.filter(service=honda_tune).update(price=Decimal('175.00'))
+        ServicePrice.objects.get(service=honda_tune).save()
+        honda_tune.vehicles_models.add(pulsar)
+
+    assert service_prices(client.get(reverse('vehicle-model-services', args=[shine.id])).json())['Honda Tune Up'] == '175.00'
+    assert 'Honda Tune Up' in service_prices(client.get(reverse('vehicle-model-services', args=[pulsar.id])).json())
+
+
+def test_category_change_marks_catalogues_stale_without_rebuilding(
+    catalogue_data, client, django_capture_on_commit_callbacks, django_assert_num_queries,
+):
+    shine, pulsar, honda_tune = catalogue_data
+    rebuild_catalogues()
+    category = honda_tune.category
+    category.name = 'Routine Care'
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        category.save()
+    with django_assert_num_queries(0):
+        for callback in callbacks:
+            callback()
+
+    document = client.get(reverse('vehicle-model-services', args=[shine.id])).json()
+    assert [category['name'] for category in document['categories']] == ['Routine Care']
@@ -0,0 +1,82 @@
+import gzip
+import json
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+from vehicle.models import VehicleType, Manufacturer, VehicleModel
+from repairing_service.models import ServiceCategory
+from repairing_service.catalogue_tree import invalidate_catalogue_tree
+
+
+@pytest.fixture
+def tree_data(db, django_capture_on_commit_callbacks):
+    cache.clear()
+    with django_capture_on_commit_callbacks(execute=True):
+        bike = VehicleType.objects.create(name='Bike')
+        scooter = VehicleType.objects.create(name='Scooter')
+        honda = Manufacturer.objects.create(name='Honda')
+        bajaj = Manufacturer.objects.create(name='Bajaj')
+        VehicleModel.objects.create(name='Shine', manufacturer=honda, vehicle_type=bike)
+        VehicleModel.objects.create(name='Activa', manufacturer=honda, vehicle_type=scooter)
+        VehicleModel.objects.create(name='Pulsar', manufacturer=bajaj, vehicle_type=bike)
+        ServiceCategory.objects.create(name='Engine')
+    invalidate_catalogue_tree()
+    return honda
+
+
+def test_tree_is_one_compressed_response(tree_data, django_assert_max_num_queries):
+    client = APIClient()
+    url = reverse('catalogue-tree')
+    client.get(url)
+
+    with django_assert_max_num_queries(0):
+        response = client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+
+    assert response['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response['Vary']
+    tree = json.loads(gzip.decompress(response.content))
+    bike, scooter = tree['vehicle_types']
+    assert [manufacturer['name'] for manufacturer in bike['manufacturers']] == ['Bajaj', 'Honda']
+    assert [model['name'] for model in bike['manufacturers'][1]['models']] == ['Shine']
+    assert scooter['manufacturers'][0]['models'][0]['name'] == 'Activa'
+    assert tree['categories'][0]['slug'] == 'engine'
+
+    plain = client.get(url)
+    assert 'Content-Encoding' not in plain
+    assert json.loads(plain.content) == tree
+    assert plain['ETag'] != response['ETag']
+
+
+def test_tree_honours_gzip_quality(tree_data):
+    client = APIClient()
+    url = reverse('catalogue-tree')
+
+    for refused in ('gzip;q=0, identity', 'br, *;q=0', 'GZIP; q=0.0'):
+        assert 'Content-Encoding' not in client.get(url, HTTP_ACCEPT_ENCODING=refused)
+    for accepted in ('identity, gzip;q=0.5', '*', 'br;q=1, x-gzip'):
+        assert client.get(url, HTTP_ACCEPT_ENCODING=accepted)['Content-Encoding'] == 'gzip'
+
+    gzip_etag = client.get(url, HTTP_ACCEPT_ENCODING='gzip')['ETag']
+    assert client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=gzip_etag).status_code == 304
+    assert client.get(url, HTTP_IF_NONE_MATCH=gzip_etag).status_code == 200
+
+
+def test_tree_etag_revalidation(tree_data, django_capture_on_commit_callbacks):
+    honda = tree_data
+    client = APIClient()
+    url = reverse('catalogue-tree')
+    etag = client.get(url)['ETag']
+
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+    assert response.content == b''
+
+    with django_capture_on_commit_callbacks(execute=True):
+        honda.name = 'Honda Motors'
+        honda.save()
+
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+    assert b'Honda Motors' in response.content
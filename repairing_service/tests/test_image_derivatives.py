@@ -0,0 +1,127 @@
+import io
+import pytest
+from decimal import Decimal
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from PIL import Image
+from authback import images
+from authback.images import get_manifest, render_derivatives, schedule_derivatives
+from repairing_service.models import Service
+from repairing_service.serializers import ServiceListSerializer
+from vehicle.models import Manufacturer
+
+
+def _png(width, height, color=(200, 30, 30)):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def media(db, settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.IMAGE_DERIVATIVE_WORKERS = 0
+    cache.clear()
+    return tmp_path
+
+
+def test_render_skips_widths_above_original():
+    rendered = render_derivatives(_png(500, 250), (160, 320, 640), ('webp', 'jpeg'), 80)
+
+    assert [(width, fmt) for width, fmt, _ in rendered] == [
+        (160, 'webp'), (160, 'jpeg'), (320, 'webp'), (320, 'jpeg'),
+    ]
+    with Image.open(io.BytesIO(rendered[0][2])) as image:
+        assert image.format == 'WEBP'
+        assert image.size == (160, 80)
+
+
+def test_image_change_builds_content_hashed_derivatives(media, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        service = Service.objects.create(
+            name='Oil Change', base_price=Decimal('500.00'), discount=Decimal('0'), description='', duration='30 min',
+            warranty='', recommended='', image=SimpleUploadedFile('oil.png', _png(2000, 1000)),
+        )
+
+    manifest = get_manifest(service.image.name)
+    assert [width for width, _ in manifest['formats']['webp']] == [160, 320, 640, 1280]
+    for width, name in manifest['formats']['jpeg']:
+        assert manifest['digest'] in name
+        assert default_storage.exists(name)
+
+    data = ServiceListSerializer(service).data
+    assert data['image_srcset']['original'].endswith(service.image.name)
+    assert data['image_srcset']['srcset']['webp'].endswith(f"/media/{manifest['formats']['webp'][-1][1]} 1280w")
+
+    # Saving without a new image does not rebuild
+    with django_capture_on_commit_callbacks() as callbacks:
+        service.save()
+    assert not [callback for callback in callbacks if getattr(callback, 'func', None) is schedule_derivatives]
+
+
+def test_list_reads_manifests_in_one_batch(media, django_capture_on_commit_callbacks, monkeypatch):
+    with django_capture_on_commit_callbacks(execute=True):
+        services = [
+            Service.objects.create(
+                name=f'Service {n}', base_price=Decimal('100.00'), description='', duration='30 min', warranty='',
+                recommended='', image=SimpleUploadedFile(f'service{n}.png', _png(400, 200)),
+            )
+            for n in range(3)
+        ]
+    Service.objects.create(name='No Image', base_price=Decimal('100.00'), description='', duration='30 min',
+                           warranty='', recommended='')
+    reads = []
+    monkeypatch.setattr(images, 'get_manifest', lambda source: reads.append(source))
+    get_many = images.cache.get_many
+    monkeypatch.setattr(images.cache, 'get_many', lambda keys: reads.append(len(keys)) or get_many(keys))
+
+    data = ServiceListSerializer(Service.objects.order_by('name'), many=True).data
+
+    assert reads == [3]
+    assert [bool(item['image_srcset'] and item['image_srcset']['srcset']) for item in data] == [False, True, True, True]
+    assert services[0].image.name in data[1]['image_srcset']['original']
+
+
+def test_backfill_command(media):
+    manufacturer = Manufacturer.objects.create(name='Honda')
+    Manufacturer.objects.filter(pk=manufacturer.pk).update(
+        image=default_storage.save('manufacturer_images/honda.png', io.BytesIO(_png(400, 400)))
+    )
+    cache.clear()
+
+    call_command('build_image_derivatives', stdout=io.StringIO())
+
+    manifest = get_manifest('manufacturer_images/honda.png')
+    assert [width for width, _ in manifest['formats']['jpeg']] == [160, 320]
+
+
+def test_derivatives_are_served_with_immutable_caching(media, client, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        manufacturer = Manufacturer.objects.create(name='Bajaj', image=SimpleUploadedFile('bajaj.png', _png(300, 300)))
+    name = get_manifest(manufacturer.image.name)['formats']['webp'][0][1]
+
+    response = client.get(f'/media/{name}')
+
+    assert response.status_code == 200
+    assert 'immutable' in response['Cache-Control']
+    assert 'max-age=31536000' in response['Cache-Control']
+
+
+def test_manifests_are_revalidated(media, client, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        manufacturer = Manufacturer.objects.create(name='Bajaj', image=SimpleUploadedFile('bajaj.png', _png(300, 300)))
+    url = f'/media/{images._manifest_name(manufacturer.image.name)}'
+
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert 'no-cache' in response['Cache-Control']
+    assert 'immutable' not in response['Cache-Control']
+    assert client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code == 304
+
+    # A rebuild rewrites the manifest under the same name
+    images._store_derivatives(manufacturer.image.name, 'rebuilt', [])
+    assert client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code == 200
+    assert client.get('/media/derivatives/manifests/missing.json').status_code == 404
@@ -0,0 +1,58 @@
+import io
+import pytest
+from decimal import Decimal
+from vehicle.models import VehicleType, Manufacturer, VehicleModel
+from repairing_service.models import Service, ServicePrice
+from repairing_service.price_import import import_price_list, PriceImportError
+
+
+@pytest.fixture
+def price_list_data(db):
+    bike = VehicleType.objects.create(name='Bike')
+    honda = Manufacturer.objects.create(name='Honda')
+    VehicleModel.objects.create(name='Shine', manufacturer=honda, vehicle_type=bike)
+    VehicleModel.objects.create(name='Unicorn', manufacturer=honda, vehicle_type=bike)
+    Service.objects.create(name='Oil Change', base_price=Decimal('500.00'), description='',
+                           duration='30 min', warranty='', recommended='')
+
+
+def csv_file(text):
+    return io.BytesIO(text.encode())
+
+
+def current_prices():
+    return {
+        (price.vehicles_model.name if price.vehicles_model else None): price.price
+        for price in ServicePrice.objects.select_related('vehicles_model')
+    }
+
+
+def test_price_list_is_upserted(price_list_data):
+    result = import_price_list(csv_file(
+        'service,manufacturer,vehicle_model,price\n'
+        'oil-change,Honda,Shine,550\n'
+        'Oil Change,honda,,520.50\n'
+    ))
+    assert result['rows'] == 2
+    assert current_prices() == {'Shine': Decimal('550.00'), None: Decimal('520.50')}
+
+    import_price_list(csv_file(
+        'service,manufacturer,vehicle_model,price\n'
+        'oil-change,Honda,Shine,600\n'
+        'oil-change,Honda,Unicorn,610\n'
+        'oil-change,Honda,,530\n'
+    ))
+    assert current_prices() == {'Shine': Decimal('600.00'), 'Unicorn': Decimal('610.00'), None: Decimal('530.00')}
+
+
+def test_invalid_price_list_is_rejected(price_list_data):
+    with pytest.raises(PriceImportError) as excinfo:
+        import_price_list(csv_file(
+            'service,manufacturer,vehicle_model,price\n'
+            'oil-change,Honda,Shine,550\n'
+            'tyre-change,Honda,,100\n'
+            'oil-change,Honda,Activa,100\n'
+            'oil-change,Honda,,abc\n'
+        ))
+    assert [error['line'] for error in excinfo.value.errors] == [3, 4, 5]
+    assert not ServicePrice.objects.exists()
@@ -0,0 +1,39 @@
+import pytest
+from decimal import Decimal
+from django.urls import reverse
+from vehicle.models import VehicleType, Manufacturer, VehicleModel
+from repairing_service.models import Feature, ServiceCategory, Service
+
+# Category pages: services + manufacturers + vehicle models + features
+SERVICE_LIST_QUERY_BUDGET = 4
+
+
+def create_services(category, count):
+    bike = VehicleType.objects.get_or_create(name='Bike')[0]
+    honda = Manufacturer.objects.get_or_create(name='Honda')[0]
+    shine = VehicleModel.objects.get_or_create(name='Shine', manufacturer=honda, vehicle_type=bike)[0]
+    features = [Feature.objects.get_or_create(name=name)[0] for name in ('Pickup', 'Genuine Parts')]
+    for i in range(count):
+        service = Service.objects.create(name=f'{category.name} {i}', category=category, base_price=Decimal('100.00'),
+                                         description='', duration='1 hour', warranty='', recommended='')
+        service.manufacturers.add(honda)
+        service.vehicles_models.add(shine)
+        service.features.add(*features)
+    return honda, shine
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('count', [1, 20])
+def test_service_list_stays_within_query_budget(client, django_assert_max_num_queries, count):
+    category = ServiceCategory.objects.create(name='General Service')
+    honda, shine = create_services(category, count)
+
+    with django_assert_max_num_queries(SERVICE_LIST_QUERY_BUDGET):
+        response = client.get(reverse('service-list', args=[category.uuid]))
+
+    assert response.status_code == 200
+    services = response.json()
+    assert len(services) == count
+    assert services[0]['manufacturers'] == [honda.id]
+    assert services[0]['vehicles_models'] == [shine.id]
+    assert services[0]['features'] == ['Genuine Parts', 'Pickup']
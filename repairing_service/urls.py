@@ -45,10 +45,19 @@ from repairing_service.views import (
     VehicleModelListView,
     ServiceCategoryListView,
     ServiceListByCategoryView,
+    VehicleModelServiceCatalogueView,
+    CatalogueTreeView,
+    AutocompleteView,
     ServicePriceDetailView,
+    ServicePriceImportView,
     AddToCartView,
+    BatchCartView,
     CartDetailView,
-    RemoveCartItemView
+    CartSummaryView,
+    RemoveCartItemView,
+    BookingAvailabilityView,
+    BookingListCreateView,
+    BookingCancelView
 )
 
 urlpatterns = [
@@ -58,16 +67,29 @@ urlpatterns = [
     # Service Categories & Services
     path('categories/', ServiceCategoryListView.as_view(), name='category-list'),
     path('categories/<uuid:category_id>/services/', ServiceListByCategoryView.as_view(), name='service-list'),
+    path('models/<int:vehicle_model_id>/services/', VehicleModelServiceCatalogueView.as_view(), name='vehicle-model-services'),
+    path('catalogue/tree/', CatalogueTreeView.as_view(), name='catalogue-tree'),
+
+    # Search
+    path('search/autocomplete/', AutocompleteView.as_view(), name='autocomplete'),
 
     # Service Pricing
     # path('services/<uuid:service_id>/manufacturers/<uuid:manufacturer_id>/models/<uuid:vehicle_model_id>/price/', ServicePriceDetailView.as_view(), name='service-price-detail'),
     path('services/<uuid:service_id>/manufacturers/<int:manufacturer_id>/models/<int:vehicle_model_id>/price/', ServicePriceDetailView.as_view(), name='service-price-detail'),
+    path('service-prices/import/', ServicePriceImportView.as_view(), name='service-price-import'),
 
     # Cart Operations
     path('cart/add/', AddToCartView.as_view(), name='add-to-cart'),
+    path('cart/items/', BatchCartView.as_view(), name='cart-batch'),
     path('cart/', CartDetailView.as_view(), name='cart-detail'),
+    path('cart/summary/', CartSummaryView.as_view(), name='cart-summary'),
     # path('cart/add/<int:service_id>/', AddToCartView.as_view(), name='add-to-cart'),
     path('cart/item/<uuid:cart_item_id>/remove/', RemoveCartItemView.as_view(), name='remove-cart-item'),
+
+    # Workshop Bookings
+    path('bookings/availability/', BookingAvailabilityView.as_view(), name='booking-availability'),
+    path('bookings/', BookingListCreateView.as_view(), name='booking-list'),
+    path('bookings/<uuid:booking_id>/cancel/', BookingCancelView.as_view(), name='booking-cancel'),
 ]
 
 # path('services/<uuid:service_id>/manufacturers/<int:manufacturer_id>/models/<int:vehicle_model_id>/price/', ServicePriceDetailView.as_view(), name='service-price-detail'),
@@ -164,11 +164,13 @@
 
 from rest_framework.generics import CreateAPIView
 
+import csv
 from rest_framework.views import APIView
 from uuid import UUID
 from rest_framework import viewsets, generics, status
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
+from rest_framework.parsers import MultiPartParser
 from rest_framework.decorators import action
 from django.shortcuts import get_object_or_404
 from rest_framework.exceptions import ValidationError
@@ -185,13 +187,21 @@ from .serializers import (
     VehicleModelSerializer,
     ServiceCategorySerializer,
     FeatureSerializer,
-    ServiceSerializer,
+    ServiceListSerializer,
     ServicePriceSerializer,
     CartSerializer,
     CartItemSerializer,
 )
 from vehicle.serializers import ManufacturerSerializer
 from vehicle.models import Manufacturer
+from vehicle.reference import get_reference_data
+from .catalogue import aget_catalogue
+from .price_import import import_price_list, PriceImportError
+from .search import autocomplete
+from .catalogue_tree import aget_catalogue_tree
+from authback.async_views import AsyncAPIView
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
 
 # List all Manufacturers
 class ManufacturerListView(generics.ListAPIView):
@@ -199,6 +209,11 @@ class ManufacturerListView(generics.ListAPIView):
     serializer_class = ManufacturerSerializer
     permission_classes = [AllowAny]
 
+    def list(self, request, *args, **kwargs):
+        # Served from the in-process reference snapshot, without queries
+        serializer = self.get_serializer(get_reference_data().manufacturers, many=True)
+        return Response(serializer.data)
+
 # List all Vehicle Models for a Manufacturer
 # class VehicleModelListView(generics.ListAPIView):
 #     serializer_class = VehicleModelSerializer
@@ -233,6 +248,11 @@ class VehicleModelListView(generics.ListAPIView):
         manufacturer_id = self.kwargs['manufacturer_id']
         return VehicleModel.objects.filter(manufacturer_id=manufacturer_id)
 
+    def list(self, request, *args, **kwargs):
+        vehicle_models = get_reference_data().vehicle_models_for(self.kwargs['manufacturer_id'])
+        serializer = self.get_serializer(vehicle_models, many=True)
+        return Response(serializer.data)
+
 # List all Service Categories
 class ServiceCategoryListView(generics.ListAPIView):
     queryset = ServiceCategory.objects.all()
@@ -241,11 +261,76 @@ class ServiceCategoryListView(generics.ListAPIView):
 
 # List Services for a Specific Subcategory
 class ServiceListByCategoryView(generics.ListAPIView):
-    serializer_class = ServiceSerializer
+    serializer_class = ServiceListSerializer
     permission_classes = [AllowAny]
 
     def get_queryset(self):
-        return Service.objects.filter(category_id=self.kwargs['category_id'])
+        queryset = Service.objects.filter(category_id=self.kwargs['category_id']).order_by('name')
+        return ServiceListSerializer.setup_eager_loading(queryset)
+
+# Services that fit a Vehicle Model, grouped by Category
+class VehicleModelServiceCatalogueView(AsyncAPIView):
+    async def get(self, request, vehicle_model_id, *args, **kwargs):
+        catalogue = await aget_catalogue(vehicle_model_id)
+        if catalogue is None:
+            return self.json_response({"error": "Vehicle model not found"}, status=status.HTTP_404_NOT_FOUND)
+        return self.json_response(catalogue, status=status.HTTP_200_OK)
+
+def _accepts_gzip(accept_encoding):
+    """Whether an Accept-Encoding header allows gzip, honouring q=0 and '*'"""
+    qualities = {}
+    for item in accept_encoding.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    for coding in ('gzip', 'x-gzip', '*'):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+# Whole Vehicle Type -> Manufacturer -> Model Tree and Category Index in one Response
+class CatalogueTreeView(AsyncAPIView):
+    async def get(self, request, *args, **kwargs):
+        tree = await aget_catalogue_tree()
+        if _accepts_gzip(request.headers.get('Accept-Encoding', '')):
+            body, etag = tree.gzipped, tree.gzip_etag
+        else:
+            body, etag = tree.body, tree.etag
+        if_none_match = request.headers.get('If-None-Match', '')
+        etags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        if etag in etags or '*' in etags:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(body, content_type='application/json')
+            if body is tree.gzipped:
+                response['Content-Encoding'] = 'gzip'
+        response['ETag'] = etag
+        patch_vary_headers(response, ['Accept-Encoding'])
+        # Clients revalidate every time; an unchanged tree costs a 304 with no body
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
+
+# Typeahead Suggestions over Services, Features, Manufacturers and Models
+class AutocompleteView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '')
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'query': query,
+            'results': autocomplete(query, limit=max(limit, 1))
+        }, status=status.HTTP_200_OK)
 
 # Get Pricing for a Service, Manufacturer, and Vehicle Model
 # class ServicePriceDetailView(generics.RetrieveAPIView):
@@ -286,6 +371,24 @@ class ServicePriceDetailView(generics.RetrieveAPIView):
             vehicles_model_id=vehicle_model_id
         )
 
+# Bulk Import of a Workshop Price List
+class ServicePriceImportView(APIView):
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request, *args, **kwargs):
+        price_list = request.FILES.get('file')
+        if not price_list:
+            return Response({"error": "A CSV file is required in the 'file' field"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result = import_price_list(price_list)
+        except PriceImportError as e:
+            return Response({"error": "Price list rejected, nothing was imported", "rows": e.errors},
+                            status=status.HTTP_400_BAD_REQUEST)
+        except (UnicodeDecodeError, csv.Error) as e:
+            return Response({"error": f"Could not read the price list: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_200_OK)
+
 # Add Service to Cart
 # class AddToCartView(generics.CreateAPIView):
 #     serializer_class = CartItemSerializer
@@ -431,19 +534,27 @@ class ServicePriceDetailView(generics.RetrieveAPIView):
 
 
 from uuid import UUID
-from django.db import transaction, IntegrityError
 from django.shortcuts import get_object_or_404
 from rest_framework import status, generics
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from .models import Service, Cart, CartItem
 from .serializers import CartItemSerializer, CartSerializer
+from .cart import get_cart_summary, aget_cart_summary
+from .cart_store import add_item, set_item, apply_items, load_cart, persist_cart
+from .models import Booking
+from .serializers import BookingSerializer
+from .booking import (
+    BookingError, SlotUnavailable, available_windows, booking_minutes, cancel_booking,
+    create_booking, validate_day, workshop_timezone,
+)
+from datetime import date, datetime
+from django.conf import settings
 
 class AddToCartView(generics.CreateAPIView):
     serializer_class = CartItemSerializer
     permission_classes = [IsAuthenticated]
 
-    @transaction.atomic
     def create(self, request, *args, **kwargs):
         user = request.user
         service_id = request.data.get('service_id')
@@ -453,45 +564,75 @@ class AddToCartView(generics.CreateAPIView):
         if not service_id:
             return Response({"error": "service_id is required"}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            service_uuid = UUID(service_id)
+            service_uuid = UUID(str(service_id))
         except ValueError:
             return Response({"error": "Invalid UUID format for service_id"}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Retrieve the Service instance; returns 404 if not found
-        service = get_object_or_404(Service, uuid=service_uuid)
-
         try:
-            # Ensure the user exists
-            if not user.is_authenticated:
-                return Response({"error": "User authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
-
-            # Ensure the user has a cart
-            cart, created = Cart.objects.get_or_create(user=user)
-            if created:
-                print(f"✅ Cart created for user {user.id}")
-
-            # Ensure the service exists before adding to cart
-            if not service:
-                return Response({"error": "Service not found"}, status=status.HTTP_404_NOT_FOUND)
-
-            # Get or create the CartItem; unique_together ensures one entry per service in a cart
-            cart_item, created = CartItem.objects.get_or_create(
-                cart=cart,
-                service=service,
-                defaults={'quantity': quantity}
-            )
-
-            # If the item already exists, update the quantity
-            if not created:
-                cart_item.quantity += int(quantity)
-                cart_item.save()
-
-        except IntegrityError:
-            # Rollback transaction automatically and return error response
-            return Response({"error": "Integrity error: related foreign key record might be missing."},
-                            status=status.HTTP_400_BAD_REQUEST)
-
-        return Response({'message': 'Service added to cart'}, status=status.HTTP_201_CREATED)
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            quantity = 0
+        if quantity < 1:
+            return Response({"error": "quantity must be a positive integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not Service.objects.filter(uuid=service_uuid).exists():
+            return Response({"error": "Service not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        # The hot cart store increments atomically; Cart/CartItem rows are written behind
+        new_quantity = add_item(user.id, service_uuid, quantity)
+
+        return Response({
+            'message': 'Service added to cart',
+            'service_id': str(service_uuid),
+            'quantity': new_quantity
+        }, status=status.HTTP_201_CREATED)
+
+# Add or Update many Cart Items at once
+class BatchCartView(APIView):
+    permission_classes = [IsAuthenticated]
+    max_items = 50
+
+    def post(self, request, *args, **kwargs):
+        items = request.data.get('items')
+        mode = request.data.get('mode', 'add')
+        if mode not in ('add', 'set'):
+            return Response({"error": "mode must be 'add' or 'set'"}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(items, list) or not items:
+            return Response({"error": "items must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.max_items:
+            return Response({"error": f"At most {self.max_items} items per request"}, status=status.HTTP_400_BAD_REQUEST)
+        manufacturer_id = request.data.get('manufacturer')
+        vehicle_model_id = request.data.get('vehicle_model')
+        try:
+            manufacturer_id = int(manufacturer_id) if manufacturer_id else None
+            vehicle_model_id = int(vehicle_model_id) if vehicle_model_id else None
+        except (TypeError, ValueError):
+            return Response({"error": "manufacturer and vehicle_model must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Adding zero is pointless, setting zero removes the service
+        min_quantity = 1 if mode == 'add' else 0
+        operations = []
+        for position, item in enumerate(items):
+            try:
+                service_uuid = UUID(str(item['service_id']))
+                quantity = int(item.get('quantity', 1))
+            except (TypeError, KeyError, ValueError, AttributeError):
+                return Response({"error": f"items[{position}] needs a valid service_id and integer quantity"}, status=status.HTTP_400_BAD_REQUEST)
+            if quantity < min_quantity:
+                return Response({"error": f"items[{position}] quantity must be at least {min_quantity}"}, status=status.HTTP_400_BAD_REQUEST)
+            operations.append((service_uuid, quantity, mode == 'add'))
+
+        requested = {service_uuid for service_uuid, _, _ in operations}
+        found = set(Service.objects.filter(uuid__in=requested).values_list('uuid', flat=True))
+        if requested - found:
+            return Response({
+                "error": "Service not found",
+                "service_ids": sorted(str(service_uuid) for service_uuid in requested - found)
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        # One atomic store mutation; Cart/CartItem rows are written behind in bulk
+        apply_items(request.user.id, operations)
+        summary = get_cart_summary(request.user.id, manufacturer_id, vehicle_model_id)
+        return Response(summary, status=status.HTTP_200_OK)
 
 # Show Cart
 class CartDetailView(generics.RetrieveAPIView):
@@ -499,19 +640,123 @@ class CartDetailView(generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
+        persist_cart(self.request.user.id)
         cart, _ = Cart.objects.get_or_create(user=self.request.user)
         return cart
 
+# Priced Cart Summary
+class CartSummaryView(AsyncAPIView):
+    authentication_required = True
+
+    async def get(self, request, *args, **kwargs):
+        manufacturer_id = request.GET.get('manufacturer')
+        vehicle_model_id = request.GET.get('vehicle_model')
+        try:
+            manufacturer_id = int(manufacturer_id) if manufacturer_id else None
+            vehicle_model_id = int(vehicle_model_id) if vehicle_model_id else None
+        except ValueError:
+            return self.json_response({"error": "manufacturer and vehicle_model must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        summary = await aget_cart_summary(request.user.id, manufacturer_id, vehicle_model_id)
+        return self.json_response(summary, status=status.HTTP_200_OK)
+
 # Remove Item from Cart
 class RemoveCartItemView(generics.DestroyAPIView):
     permission_classes = [IsAuthenticated]
 
     def delete(self, request, *args, **kwargs):
-        cart_item = get_object_or_404(CartItem, id=kwargs['cart_item_id'], cart__user=request.user)
-        cart_item.delete()
+        # Items not written behind yet have no CartItem row, so the service uuid is accepted too
+        service_id = CartItem.objects.filter(
+            uuid=kwargs['cart_item_id'], cart__user=request.user
+        ).values_list('service_id', flat=True).first() or kwargs['cart_item_id']
+
+        _, items = load_cart(request.user.id)
+        if str(service_id) not in items:
+            return Response({"error": "Cart item not found"}, status=status.HTTP_404_NOT_FOUND)
+        set_item(request.user.id, service_id, 0)
         return Response({'message': 'Item removed from cart'}, status=status.HTTP_204_NO_CONTENT)
 
 
+# Open Workshop Windows for a Day
+class BookingAvailabilityView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            day = date.fromisoformat(request.query_params.get('date', ''))
+        except ValueError:
+            return Response({"error": "date must be in YYYY-MM-DD format"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            validate_day(day)
+        except BookingError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Without an explicit duration, size the windows for the caller's cart
+        duration = request.query_params.get('duration')
+        if duration:
+            try:
+                minutes = int(duration)
+            except ValueError:
+                minutes = 0
+            if minutes < 1:
+                return Response({"error": "duration must be a positive number of minutes"}, status=status.HTTP_400_BAD_REQUEST)
+        elif request.user.is_authenticated:
+            _, quantities = load_cart(request.user.id)
+            minutes = booking_minutes(quantities) if quantities else settings.BOOKING_SLOT_MINUTES
+        else:
+            minutes = settings.BOOKING_SLOT_MINUTES
+
+        return Response({
+            'date': day.isoformat(),
+            'duration_minutes': minutes,
+            'windows': available_windows(day, minutes)
+        }, status=status.HTTP_200_OK)
+
+# List Bookings / Book the Cart
+class BookingListCreateView(generics.ListCreateAPIView):
+    serializer_class = BookingSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = Booking.objects.filter(user=self.request.user).order_by('-start')
+        return BookingSerializer.setup_eager_loading(queryset)
+
+    def create(self, request, *args, **kwargs):
+        try:
+            start = datetime.fromisoformat(str(request.data.get('start', '')))
+        except ValueError:
+            return Response({"error": "start must be an ISO date and time, e.g. 2025-01-04T10:30"}, status=status.HTTP_400_BAD_REQUEST)
+        manufacturer_id = request.data.get('manufacturer')
+        vehicle_model_id = request.data.get('vehicle_model')
+        try:
+            manufacturer_id = int(manufacturer_id) if manufacturer_id else None
+            vehicle_model_id = int(vehicle_model_id) if vehicle_model_id else None
+        except (TypeError, ValueError):
+            return Response({"error": "manufacturer and vehicle_model must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if start.tzinfo is not None:
+            start = start.astimezone(workshop_timezone())
+        try:
+            booking = create_booking(request.user, start.date(), start.time(), manufacturer_id, vehicle_model_id)
+        except SlotUnavailable as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+        except BookingError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        booking = BookingSerializer.setup_eager_loading(Booking.objects.all()).get(pk=booking.pk)
+        return Response(BookingSerializer(booking).data, status=status.HTTP_201_CREATED)
+
+# Cancel a Booking
+class BookingCancelView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, booking_id, *args, **kwargs):
+        booking = get_object_or_404(Booking, uuid=booking_id, user=request.user)
+        if booking.status != 'confirmed':
+            return Response({"error": "Only confirmed bookings can be cancelled"}, status=status.HTTP_400_BAD_REQUEST)
+        cancel_booking(booking)
+        return Response({'message': 'Booking cancelled'}, status=status.HTTP_200_OK)
+
 
 class CartItemCreateView(CreateAPIView):
     queryset = CartItem.objects.all()
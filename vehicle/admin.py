@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import VehicleType, Manufacturer, VehicleModel, UserVehicle
+from .models import VehicleType, Manufacturer, VehicleModel, UserVehicle, VehicleChange
 from accounts.models import UserProfile
 
 # VehicleType Admin Configuration
@@ -29,8 +29,17 @@ class UserVehicleAdmin(admin.ModelAdmin):
     list_filter = ('vehicle_type', 'manufacturer', 'model')
     list_per_page = 10
 
+# VehicleChange Admin Configuration (sync outbox, read only)
+class VehicleChangeAdmin(admin.ModelAdmin):
+    list_display = ('source', 'registration_number', 'changed_at', 'processed_at', 'error')
+    search_fields = ('registration_number',)
+    list_filter = ('source', ('processed_at', admin.EmptyFieldListFilter), ('error', admin.EmptyFieldListFilter))
+    readonly_fields = ('source', 'registration_number', 'payload', 'changed_at', 'created_at', 'processed_at', 'error')
+    list_per_page = 50
+
 # Register Models with Admin
 admin.site.register(VehicleType, VehicleTypeAdmin)
 admin.site.register(Manufacturer, ManufacturerAdmin)
 admin.site.register(VehicleModel, VehicleModelAdmin)
 admin.site.register(UserVehicle, UserVehicleAdmin)
+admin.site.register(VehicleChange, VehicleChangeAdmin)
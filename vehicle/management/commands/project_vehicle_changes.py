@@ -0,0 +1,33 @@
+
+import time
+from django.core.management.base import BaseCommand
+from vehicle.sync import VEHICLE_SYNC_BATCH_SIZE, project_changes, purge_processed_changes
+
+
+class Command(BaseCommand):
+    help = 'Apply queued UserVehicle / marketplace Vehicle changes to the other side'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=VEHICLE_SYNC_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='Keep projecting until interrupted')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when idle in --loop mode')
+        parser.add_argument(
+            '--purge-interval', type=float, default=10 * 60,
+            help='Seconds between deletions of old processed changes while idle',
+        )
+
+    def handle(self, *args, **options):
+        total = purged = 0
+        last_purge = None
+        while True:
+            projected = project_changes(options['batch_size'])
+            total += projected
+            if projected:
+                continue
+            if last_purge is None or time.monotonic() - last_purge >= options['purge_interval']:
+                purged += purge_processed_changes(batch_size=options['batch_size'])
+                last_purge = time.monotonic()
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Projected {total} vehicle changes, purged {purged}'))
@@ -0,0 +1,66 @@
+# Generated by Django 5.2 on 2026-10-19 13:39
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("vehicle", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uservehicle",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name="VehicleChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "source",
+                    models.CharField(
+                        choices=[
+                            ("user_vehicle", "User vehicle"),
+                            ("marketplace", "Marketplace vehicle"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("registration_number", models.CharField(max_length=50)),
+                (
+                    "payload",
+                    models.JSONField(
+                        default=dict,
+                        encoder=django.core.serializers.json.DjangoJSONEncoder,
+                    ),
+                ),
+                ("changed_at", models.DateTimeField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("processed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["processed_at", "id"],
+                        name="vehicle_veh_process_b203b5_idx",
+                    )
+                ],
+            },
+        ),
+    ]
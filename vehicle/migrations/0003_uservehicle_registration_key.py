@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-19 14:02
+
+import re
+
+from django.db import migrations, models
+
+
+def set_registration_keys(apps, schema_editor):
+    # Rows whose canonical form collides with an earlier row keep a NULL key
+    model = apps.get_model("vehicle", "UserVehicle")
+    seen = set()
+    changed = []
+    for row in model.objects.order_by("pk").only("pk", "registration_number"):
+        key = re.sub(r"[^0-9A-Z]", "", (row.registration_number or "").upper())
+        if key and key not in seen:
+            seen.add(key)
+            row.registration_key = key
+            changed.append(row)
+    model.objects.bulk_update(changed, ["registration_key"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("vehicle", "0002_vehicle_change_outbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uservehicle",
+            name="registration_key",
+            field=models.CharField(
+                blank=True, editable=False, max_length=50, null=True
+            ),
+        ),
+        migrations.RunPython(set_registration_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="uservehicle",
+            name="registration_key",
+            field=models.CharField(
+                blank=True, editable=False, max_length=50, null=True, unique=True
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 14:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("vehicle", "0003_uservehicle_registration_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="vehiclechange",
+            name="error",
+            field=models.TextField(blank=True, default=""),
+        ),
+    ]
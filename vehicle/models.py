@@ -1,4 +1,5 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from accounts.models import UserProfile
 
 class VehicleType(models.Model):
@@ -33,8 +34,34 @@ class UserVehicle(models.Model):
     manufacturer = models.ForeignKey(Manufacturer, on_delete=models.CASCADE)
     model = models.ForeignKey(VehicleModel, on_delete=models.CASCADE)
     registration_number = models.CharField(max_length=50, unique=True)
+    # Canonical form of registration_number, set on save
+    registration_key = models.CharField(max_length=50, unique=True, null=True, blank=True, editable=False)
     purchase_date = models.DateField(null=True, blank=True)
     vehicle_image = models.ImageField(upload_to='user_vehicles/', null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.user.email}'s {self.model}"
+
+class VehicleChange(models.Model):
+    """Outbox event: a change to one side of the UserVehicle / marketplace Vehicle pair"""
+    SOURCE_CHOICES = [
+        ('user_vehicle', 'User vehicle'),
+        ('marketplace', 'Marketplace vehicle'),
+    ]
+
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    # Registration number of the counterpart row before this change
+    registration_number = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    changed_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    # Why the change could not be projected; such events are processed but kept
+    error = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [models.Index(fields=['processed_at', 'id'])]
+
+    def __str__(self):
+        return f"{self.get_source_display()} change to {self.registration_number}"
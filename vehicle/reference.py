@@ -0,0 +1,56 @@
+
+from collections import defaultdict
+from authback.versioning import LocalSnapshot
+from .models import VehicleType, Manufacturer, VehicleModel
+
+REFERENCE_VERSION_KEY = 'vehicle_reference_version'
+# How often a worker checks the shared version for edits made through other workers
+REFERENCE_CHECK_INTERVAL = 5
+
+
+class ReferenceData:
+    """
+    Immutable snapshot of vehicle types, manufacturers and models.
+
+    Models carry their manufacturer and vehicle type objects, so nested
+    serializers read them without further queries.
+    """
+
+    def __init__(self, vehicle_types, manufacturers, vehicle_models):
+        self.vehicle_types = vehicle_types
+        self.manufacturers = manufacturers
+        self.vehicle_models = vehicle_models
+        self.vehicle_types_by_id = {vehicle_type.id: vehicle_type for vehicle_type in vehicle_types}
+        self.manufacturers_by_id = {manufacturer.id: manufacturer for manufacturer in manufacturers}
+        self.vehicle_models_by_id = {vehicle_model.id: vehicle_model for vehicle_model in vehicle_models}
+        self.models_by_manufacturer = defaultdict(list)
+        for vehicle_model in vehicle_models:
+            self.models_by_manufacturer[vehicle_model.manufacturer_id].append(vehicle_model)
+
+    def vehicle_models_for(self, manufacturer_id):
+        return self.models_by_manufacturer.get(manufacturer_id, [])
+
+
+def load_reference_data():
+    """Load the snapshot with one query per table"""
+    return ReferenceData(
+        list(VehicleType.objects.order_by('id')),
+        list(Manufacturer.objects.order_by('id')),
+        list(VehicleModel.objects.select_related('manufacturer', 'vehicle_type').order_by('id')),
+    )
+
+
+_snapshot = LocalSnapshot(REFERENCE_VERSION_KEY, load_reference_data, REFERENCE_CHECK_INTERVAL)
+
+
+def get_reference_data():
+    return _snapshot.get()
+
+
+async def aget_reference_data():
+    return await _snapshot.aget()
+
+
+def invalidate_reference_data():
+    """Make every worker reload the snapshot on its next read"""
+    _snapshot.invalidate()
@@ -0,0 +1,170 @@
+import logging
+import re
+import threading
+import time
+from django.core.cache import cache
+from django.db import transaction
+from authback.versioning import bump_cache_version
+from marketplace.models import Vehicle
+from .models import UserVehicle
+
+logger = logging.getLogger(__name__)
+
+REGISTRATION_INDEX_VERSION_KEY = 'registration_index_version'
+REGISTRATION_INDEX_CHECK_INTERVAL = 5
+# Keys saved since a worker loaded the full set are logged in the cache under a sequence number
+REGISTRATION_LOG_SEQUENCE_KEY = 'registration_log_sequence'
+REGISTRATION_LOG_TTL = 60 * 60
+# A worker further behind than this reloads the full set instead of replaying the log
+REGISTRATION_LOG_MAX_REPLAY = 10000
+NON_ALPHANUMERIC = re.compile(r'[^0-9A-Z]')
+
+
+def normalize_registration(value):
+    """Canonical registration key: upper-case letters and digits only, e.g. 'ka 01-ab 1234' -> 'KA01AB1234'"""
+    return NON_ALPHANUMERIC.sub('', (value or '').upper())
+
+
+def load_registration_keys():
+    """Every registration key in use on either model"""
+    keys = set(Vehicle.objects.exclude(registration_key=None).values_list('registration_key', flat=True))
+    keys.update(UserVehicle.objects.exclude(registration_key=None).values_list('registration_key', flat=True))
+    return keys
+
+
+def _log_key(sequence):
+    return f'registration_log:{sequence}'
+
+
+class RegistrationIndex:
+    """
+    Per-process set of registration keys, kept current incrementally.
+
+    The full set is loaded once per process, and again only after
+    invalidate_registration_index() (e.g. after bulk inserts that bypass
+    signals). Saved keys are appended to a log in the shared cache; every
+    REGISTRATION_INDEX_CHECK_INTERVAL seconds a worker reads the log's
+    sequence number and fetches just the entries it has not seen with one
+    get_many, so a save costs the other workers O(1) rather than a reload.
+    A worker that finds entries missing (expired, cache flushed) or is too
+    far behind reloads the full set.
+    """
+
+    def __init__(self, check_interval=REGISTRATION_INDEX_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.keys = None
+        self.version = None
+        self.sequence = 0
+        self.checked_at = 0.0
+
+    def _reload(self, version, sequence):
+        # The sequence is read before the tables, so keys saved meanwhile are replayed, not lost
+        self.keys = load_registration_keys()
+        self.version = version
+        self.sequence = sequence
+
+    def _catch_up(self, version, sequence):
+        if self.keys is None or version != self.version or sequence < self.sequence:
+            return self._reload(version, sequence)
+        if sequence == self.sequence:
+            return
+        if sequence - self.sequence > REGISTRATION_LOG_MAX_REPLAY:
+            return self._reload(version, sequence)
+        wanted = [_log_key(n) for n in range(self.sequence + 1, sequence + 1)]
+        entries = cache.get_many(wanted)
+        if len(entries) < len(wanted):
+            return self._reload(version, sequence)
+        self.keys.update(entries.values())
+        self.sequence = sequence
+
+    def get(self):
+        now = time.monotonic()
+        if self.keys is not None and now - self.checked_at < self.check_interval:
+            return self.keys
+        shared = cache.get_many([REGISTRATION_INDEX_VERSION_KEY, REGISTRATION_LOG_SEQUENCE_KEY])
+        with self.lock:
+            self._catch_up(shared.get(REGISTRATION_INDEX_VERSION_KEY, 1), shared.get(REGISTRATION_LOG_SEQUENCE_KEY, 0))
+            self.checked_at = now
+        return self.keys
+
+    def add(self, key):
+        """Add a saved key to this process at once and to the other workers after commit"""
+        keys = self.get()
+        if key and key not in keys:
+            keys.add(key)
+            transaction.on_commit(lambda: self.publish(key))
+
+    def publish(self, key):
+        try:
+            sequence = cache.incr(REGISTRATION_LOG_SEQUENCE_KEY)
+        except ValueError:
+            cache.add(REGISTRATION_LOG_SEQUENCE_KEY, 0, timeout=None)
+            sequence = cache.incr(REGISTRATION_LOG_SEQUENCE_KEY)
+        if sequence is not None:
+            cache.set(_log_key(sequence), key, timeout=REGISTRATION_LOG_TTL)
+
+    def invalidate(self):
+        """Make every worker reload the full set on its next check"""
+        bump_cache_version(REGISTRATION_INDEX_VERSION_KEY)
+        self.checked_at = 0.0
+
+
+_index = RegistrationIndex()
+
+
+def might_be_registered(value):
+    """
+    Whether `value` may belong to a vehicle; False is answered from memory.
+
+    Keys of deleted or renamed vehicles stay in the set until the next full
+    reload, so True may be wrong. False may be wrong too: a key saved by
+    another worker is only seen here after up to
+    REGISTRATION_INDEX_CHECK_INTERVAL seconds. Writers therefore rely on the
+    unique index on registration_key, which rejects what this check misses.
+    """
+    key = normalize_registration(value)
+    return bool(key) and key in _index.get()
+
+
+def registration_taken(model, value, exclude_pk=None):
+    """Whether another `model` row has the canonical form of `value`; only queries when the key set has it"""
+    if not might_be_registered(value):
+        return False
+    vehicles = model.objects.filter(registration_key=normalize_registration(value))
+    if exclude_pk is not None:
+        vehicles = vehicles.exclude(pk=exclude_pk)
+    return vehicles.exists()
+
+
+def remember_registration(key):
+    _index.add(key)
+
+
+def invalidate_registration_index():
+    _index.invalidate()
+
+
+def report_registration_duplicates(model):
+    """
+    Log the rows of `model` that the key backfill left without a key because
+    an earlier row has the same canonical form; returns [(pk, registration_number)].
+
+    Works on a migration's historical model. The registration numbers are
+    left as entered: only the owners can tell which plate is mistyped, and
+    saving such a row reports the collision like any other duplicate.
+    """
+    unkeyed = [
+        (pk, number) for pk, number in model.objects.filter(registration_key=None).order_by('pk')
+        .values_list('pk', 'registration_number') if normalize_registration(number)
+    ]
+    taken = set(model.objects.filter(
+        registration_key__in={normalize_registration(number) for _, number in unkeyed}
+    ).values_list('registration_key', flat=True))
+    duplicates = [(pk, number) for pk, number in unkeyed if normalize_registration(number) in taken]
+    if duplicates:
+        logger.warning(
+            '%d %s rows share a registration key with an earlier row and have none: %s',
+            len(duplicates), model._meta.label, ', '.join(f'{pk} ({number!r})' for pk, number in duplicates),
+        )
+    return duplicates
@@ -1,31 +1,73 @@
 from rest_framework import serializers
+from authback.images import ImageSrcsetField, ImageSrcsetListSerializer
 from .models import VehicleType, Manufacturer, VehicleModel, UserVehicle
+from .registration import registration_taken
 from accounts.models import UserProfile
 
 class VehicleTypeSerializer(serializers.ModelSerializer):
+    image_srcset = ImageSrcsetField(source='image')
+
     class Meta:
         model = VehicleType
-        fields = ('id', 'name', 'image')  # You can also add more fields if required
+        list_serializer_class = ImageSrcsetListSerializer
+        fields = ('id', 'name', 'image', 'image_srcset')  # You can also add more fields if required
 
 class ManufacturerSerializer(serializers.ModelSerializer):
+    image_srcset = ImageSrcsetField(source='image')
+
     class Meta:
         model = Manufacturer
-        fields = ('id', 'name', 'image')
+        list_serializer_class = ImageSrcsetListSerializer
+        fields = ('id', 'name', 'image', 'image_srcset')
 
 class VehicleModelSerializer(serializers.ModelSerializer):
     manufacturer = ManufacturerSerializer()
     vehicle_type = VehicleTypeSerializer()
+    image_srcset = ImageSrcsetField(source='image')
 
     class Meta:
         model = VehicleModel
-        fields = ('id', 'name', 'manufacturer', 'vehicle_type', 'image')
+        list_serializer_class = ImageSrcsetListSerializer
+        fields = ('id', 'name', 'manufacturer', 'vehicle_type', 'image', 'image_srcset')
 
 class UserVehicleSerializer(serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(queryset=UserProfile.objects.all())
     vehicle_type = VehicleTypeSerializer()
     manufacturer = ManufacturerSerializer()
     model = VehicleModelSerializer()
+    vehicle_image_srcset = ImageSrcsetField(source='vehicle_image')
+
+    class Meta:
+        model = UserVehicle
+        list_serializer_class = ImageSrcsetListSerializer
+        fields = ('id', 'user', 'vehicle_type', 'manufacturer', 'model', 'registration_number', 'purchase_date', 'vehicle_image', 'vehicle_image_srcset')
+        # Uniqueness is checked on the canonical registration key in validate_registration_number
+        extra_kwargs = {'registration_number': {'validators': []}}
+
+    def validate_registration_number(self, value):
+        value = value.strip().upper()
+        if registration_taken(UserVehicle, value, exclude_pk=getattr(self.instance, 'pk', None)):
+            raise serializers.ValidationError("A vehicle with this registration number already exists")
+        return value
+
+class VehicleDetailsSerializer(serializers.ModelSerializer):
+    """Combined UserVehicle and marketplace Vehicle details, from VehicleService.with_vehicle_details()"""
+    vehicle_type = serializers.CharField(source='vehicle_type.name')
+    manufacturer = serializers.CharField(source='manufacturer.name')
+    model = serializers.CharField(source='model.name')
+    vehicle_image_srcset = ImageSrcsetField(source='vehicle_image')
+    marketplace_vehicle = serializers.IntegerField(source='marketplace_id', allow_null=True)
+    status = serializers.CharField(source='marketplace_status', allow_null=True)
+    kms_driven = serializers.IntegerField(source='marketplace_kms_driven', allow_null=True)
+    last_service_date = serializers.DateField(source='marketplace_last_service_date', allow_null=True)
+    insurance_valid_till = serializers.DateField(source='marketplace_insurance_valid_till', allow_null=True)
 
     class Meta:
         model = UserVehicle
-        fields = ('id', 'user', 'vehicle_type', 'manufacturer', 'model', 'registration_number', 'purchase_date', 'vehicle_image')
+        list_serializer_class = ImageSrcsetListSerializer
+        fields = (
+            'id', 'registration_number', 'vehicle_type', 'manufacturer', 'model', 'purchase_date',
+            'vehicle_image_srcset', 'marketplace_vehicle', 'status', 'kms_driven', 'last_service_date',
+            'insurance_valid_till',
+        )
+        read_only_fields = fields
@@ -1,31 +1,20 @@
 from django.db import transaction
+from django.db.models import OuterRef, Subquery
 from .models import VehicleType, Manufacturer, VehicleModel, UserVehicle
+from .registration import normalize_registration
+from .sync import USER_VEHICLE_FIELDS, MARKETPLACE_ONLY_FIELDS, record_change, user_vehicle_payload
 from marketplace.models import Vehicle
 
+# Marketplace Vehicle fields included in the combined vehicle details
+MARKETPLACE_DETAIL_FIELDS = ('id', 'status', 'kms_driven', 'last_service_date', 'insurance_valid_till')
+
 class VehicleService:
     @staticmethod
     @transaction.atomic
     def create_user_vehicle(user, vehicle_data):
         """
-        Create both UserVehicle and marketplace Vehicle records
+        Create the UserVehicle and queue the marketplace Vehicle for the sync projector
         """
-        # Create marketplace Vehicle first
-        marketplace_vehicle = Vehicle.objects.create(
-            owner=user,
-            vehicle_type=vehicle_data['vehicle_type'],
-            brand=vehicle_data['manufacturer'].name,
-            model=vehicle_data['model'].name,
-            year=vehicle_data.get('year'),
-            registration_number=vehicle_data['registration_number'],
-            kms_driven=vehicle_data.get('kms_driven', 0),
-            fuel_type=vehicle_data.get('fuel_type', Vehicle.FuelType.PETROL),
-            engine_capacity=vehicle_data.get('engine_capacity'),
-            color=vehicle_data.get('color', 'Not Specified'),
-            last_service_date=vehicle_data.get('last_service_date'),
-            insurance_valid_till=vehicle_data.get('insurance_valid_till')
-        )
-
-        # Create UserVehicle record
         user_vehicle = UserVehicle.objects.create(
             user=user.profile,
             vehicle_type=vehicle_data['vehicle_type'],
@@ -36,56 +25,48 @@ class VehicleService:
             vehicle_image=vehicle_data.get('vehicle_image')
         )
 
-        return marketplace_vehicle, user_vehicle
+        payload = user_vehicle_payload(user_vehicle)
+        payload['owner'] = user.pk
+        payload.update({key: vehicle_data[key] for key in MARKETPLACE_ONLY_FIELDS if key in vehicle_data})
+        record_change('user_vehicle', user_vehicle.registration_number, payload, user_vehicle.updated_at)
+        return user_vehicle
 
     @staticmethod
     @transaction.atomic
     def update_user_vehicle(user_vehicle, vehicle_data):
         """
-        Update both UserVehicle and marketplace Vehicle records
+        Update the UserVehicle and queue the change for the marketplace Vehicle
         """
-        # Update marketplace Vehicle
-        try:
-            marketplace_vehicle = Vehicle.objects.get(
-                registration_number=user_vehicle.registration_number
-            )
-            for key, value in vehicle_data.items():
-                if hasattr(marketplace_vehicle, key):
-                    setattr(marketplace_vehicle, key, value)
-            marketplace_vehicle.save()
-        except Vehicle.DoesNotExist:
-            pass  # Handle this case based on your business logic
-
-        # Update UserVehicle
-        for key, value in vehicle_data.items():
-            if hasattr(user_vehicle, key):
-                setattr(user_vehicle, key, value)
+        previous_registration_number = user_vehicle.registration_number
+        for key in USER_VEHICLE_FIELDS:
+            if key in vehicle_data:
+                setattr(user_vehicle, key, vehicle_data[key])
         user_vehicle.save()
 
-        return marketplace_vehicle, user_vehicle
+        record_change('user_vehicle', previous_registration_number, user_vehicle_payload(user_vehicle), user_vehicle.updated_at)
+        return user_vehicle
+
+    @staticmethod
+    def with_vehicle_details(queryset=None):
+        """
+        UserVehicles with their type, manufacturer and model joined in and the
+        marketplace Vehicle fields annotated as `marketplace_<field>`, in one query.
+
+        The marketplace row is matched on the indexed registration_key; its
+        fields are None until the sync projector has created it.
+        """
+        queryset = UserVehicle.objects.all() if queryset is None else queryset
+        marketplace_vehicle = Vehicle.objects.filter(registration_key=OuterRef('registration_key'))
+        return queryset.select_related('vehicle_type', 'manufacturer', 'model').annotate(**{
+            f'marketplace_{field}': Subquery(marketplace_vehicle.values(field)[:1])
+            for field in MARKETPLACE_DETAIL_FIELDS
+        })
 
     @staticmethod
     def get_vehicle_details(registration_number):
         """
         Get combined vehicle details from both models
         """
-        try:
-            marketplace_vehicle = Vehicle.objects.get(registration_number=registration_number)
-            user_vehicle = UserVehicle.objects.get(registration_number=registration_number)
-            
-            return {
-                'marketplace_details': marketplace_vehicle,
-                'user_details': user_vehicle,
-                'combined': {
-                    'registration_number': registration_number,
-                    'vehicle_type': user_vehicle.vehicle_type.name,
-                    'manufacturer': user_vehicle.manufacturer.name,
-                    'model': user_vehicle.model.name,
-                    'status': marketplace_vehicle.status,
-                    'kms_driven': marketplace_vehicle.kms_driven,
-                    'last_service_date': marketplace_vehicle.last_service_date,
-                    'insurance_valid_till': marketplace_vehicle.insurance_valid_till
-                }
-            }
-        except (Vehicle.DoesNotExist, UserVehicle.DoesNotExist):
-            return None 
\ No newline at end of file
+        return VehicleService.with_vehicle_details().filter(
+            registration_key=normalize_registration(registration_number)
+        ).first() 
\ No newline at end of file
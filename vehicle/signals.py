@@ -0,0 +1,51 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from authback.images import watch_image_fields
+from .models import VehicleType, Manufacturer, VehicleModel, UserVehicle
+from .reference import invalidate_reference_data
+from .registration import normalize_registration, remember_registration
+from .sync import marketplace_payload, record_change
+from marketplace.models import Vehicle
+
+watch_image_fields(VehicleType, 'image')
+watch_image_fields(Manufacturer, 'image')
+watch_image_fields(VehicleModel, 'image')
+watch_image_fields(UserVehicle, 'vehicle_image')
+
+
+@receiver([post_save, post_delete], sender=VehicleType)
+@receiver([post_save, post_delete], sender=Manufacturer)
+@receiver([post_save, post_delete], sender=VehicleModel)
+def refresh_reference_data(sender, **kwargs):
+    transaction.on_commit(invalidate_reference_data)
+
+
+@receiver(pre_save, sender=Vehicle)
+@receiver(pre_save, sender=UserVehicle)
+def set_registration_key(sender, instance, **kwargs):
+    instance.registration_key = normalize_registration(instance.registration_number) or None
+
+
+@receiver(post_save, sender=Vehicle)
+@receiver(post_save, sender=UserVehicle)
+def index_registration_key(sender, instance, raw=False, **kwargs):
+    if not raw:
+        remember_registration(instance.registration_key)
+
+
+@receiver(pre_save, sender=Vehicle)
+def remember_marketplace_registration(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._synced_registration_number = Vehicle.objects.filter(pk=instance.pk).values_list(
+            'registration_number', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Vehicle)
+def queue_marketplace_change(sender, instance, raw=False, **kwargs):
+    """Marketplace edits are projected onto the owner's UserVehicle by `manage.py project_vehicle_changes`"""
+    registration_number = getattr(instance, '_synced_registration_number', None) or instance.registration_number
+    if raw or not registration_number:
+        return
+    record_change('marketplace', registration_number, marketplace_payload(instance), instance.updated_at)
@@ -0,0 +1,320 @@
+
+import logging
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from django.utils.text import slugify
+from marketplace.models import Vehicle
+from .models import VehicleType, Manufacturer, VehicleModel, UserVehicle, VehicleChange
+from .registration import normalize_registration, remember_registration
+
+logger = logging.getLogger(__name__)
+
+VEHICLE_SYNC_BATCH_SIZE = 500
+# Projected events are kept this long before purge_processed_changes() deletes them
+PROCESSED_CHANGE_RETENTION = timedelta(days=7)
+# UserVehicle fields a user may change through the API
+USER_VEHICLE_FIELDS = ('vehicle_type', 'manufacturer', 'model', 'registration_number', 'purchase_date', 'vehicle_image')
+# Marketplace fields that have no UserVehicle counterpart but may be supplied when a vehicle is added
+MARKETPLACE_ONLY_FIELDS = (
+    'year', 'kms_driven', 'fuel_type', 'engine_capacity', 'color', 'last_service_date', 'insurance_valid_till',
+)
+
+
+def vehicle_type_choice(name):
+    """Marketplace Vehicle.VehicleType value for a VehicleType name, e.g. 'Electric Scooter' -> 'electric_scooter'"""
+    value = slugify(name).replace('-', '_')
+    return value if value in Vehicle.VehicleType.values else None
+
+
+def user_vehicle_payload(user_vehicle):
+    """Shared fields of a UserVehicle in marketplace Vehicle terms"""
+    payload = {
+        'registration_number': user_vehicle.registration_number,
+        'brand': user_vehicle.manufacturer.name,
+        'model': user_vehicle.model.name,
+    }
+    vehicle_type = vehicle_type_choice(user_vehicle.vehicle_type.name)
+    if vehicle_type:
+        payload['vehicle_type'] = vehicle_type
+    return payload
+
+
+def marketplace_payload(vehicle):
+    return {
+        'registration_number': vehicle.registration_number,
+        'brand': vehicle.brand,
+        'model': vehicle.model,
+        'vehicle_type': vehicle.vehicle_type,
+    }
+
+
+def record_change(source, registration_number, payload, changed_at):
+    return VehicleChange.objects.create(
+        source=source, registration_number=registration_number, payload=payload, changed_at=changed_at,
+    )
+
+
+def _merge_events(events):
+    """
+    Coalesce events per (source, registration number); later payloads win.
+    A renamed vehicle's later events are merged into the entry under its old number.
+    Returns the merged changes and the ids of the events behind each.
+    """
+    merged = {}
+    event_ids = {}
+    aliases = {}
+    for event in events:
+        key = aliases.get((event.source, event.registration_number), (event.source, event.registration_number))
+        payload, changed_at = merged.get(key, ({}, event.changed_at))
+        payload.update(event.payload)
+        merged[key] = (payload, max(changed_at, event.changed_at))
+        event_ids.setdefault(key, []).append(event.pk)
+        if payload.get('registration_number', key[1]) != key[1]:
+            aliases[(event.source, payload['registration_number'])] = key
+    return merged, event_ids
+
+
+def _invalid_payload(model, payload):
+    """Why a payload cannot be written to `model`, e.g. a value longer than its column; None if it can"""
+    for name, value in payload.items():
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        if field.max_length and isinstance(value, str) and len(value) > field.max_length:
+            return f'{name} {value!r} is longer than {field.max_length} characters'
+    return None
+
+
+def _with_owner(queryset):
+    """UserVehicles annotated with `owner_id`, the User behind their profile; a profile and its user share the email"""
+    users = get_user_model().objects.filter(email=OuterRef('user__email'))
+    return queryset.annotate(owner_id=Subquery(users.values('id')[:1]))
+
+
+def _owners(registration_keys):
+    """{registration_key: User id} of the owners of UserVehicles"""
+    return dict(
+        _with_owner(UserVehicle.objects.filter(registration_key__in=registration_keys))
+        .values_list('registration_key', 'owner_id')
+    )
+
+
+def _current_key(registration_number, payload):
+    """Canonical key the changed row has now, after any rename in `payload`"""
+    return normalize_registration(payload.get('registration_number') or registration_number)
+
+
+def _not_owned(registration_number, vehicle_owner_id, user_vehicle_owner_id):
+    """Why a Vehicle and a UserVehicle sharing a registration number must not be synced; None if one user owns both"""
+    if vehicle_owner_id is None or vehicle_owner_id != user_vehicle_owner_id:
+        return (
+            f'{registration_number} belongs to user {vehicle_owner_id} in the marketplace '
+            f'and to user {user_vehicle_owner_id} in the garage'
+        )
+    return None
+
+
+def _taken_registrations(model, changes):
+    """Canonical keys of new registration numbers that already belong to another row and must not be applied"""
+    renamed = {
+        normalize_registration(payload['registration_number']) for key, (payload, _) in changes.items()
+        if normalize_registration(payload.get('registration_number', key)) != normalize_registration(key)
+    }
+    if not renamed:
+        return set()
+    return set(model.objects.filter(registration_key__in=renamed).values_list('registration_key', flat=True))
+
+
+def _renamed_to_taken(payload, taken):
+    return 'registration_number' in payload and normalize_registration(payload['registration_number']) in taken
+
+
+def _project_to_marketplace(changes):
+    """
+    Apply merged UserVehicle changes {registration_number: (payload, changed_at)} to marketplace Vehicles.
+    Returns {registration_number: error} of the changes to a Vehicle owned by someone else.
+    """
+    vehicles = {
+        vehicle.registration_key: vehicle
+        for vehicle in Vehicle.objects.filter(registration_key__in={normalize_registration(key) for key in changes})
+    }
+    taken = _taken_registrations(Vehicle, changes)
+    owners = _owners({_current_key(key, payload) for key, (payload, _) in changes.items()})
+    to_create, to_update, fields, conflicts = [], [], set(), {}
+    for registration_number, (payload, changed_at) in changes.items():
+        if _renamed_to_taken(payload, taken):
+            logger.warning('Not syncing %s: registration number %s is taken', registration_number, payload['registration_number'])
+            continue
+        values = {key: value for key, value in payload.items() if key != 'owner'}
+        if 'registration_number' in values:
+            values['registration_key'] = normalize_registration(values['registration_number']) or None
+        owner_id = owners.get(_current_key(registration_number, payload))
+        vehicle = vehicles.get(normalize_registration(registration_number))
+        if vehicle is None:
+            # An update to a vehicle the marketplace never got carries no owner
+            to_create.append(Vehicle(owner_id=payload.get('owner') or owner_id, **values))
+            continue
+        conflict = _not_owned(registration_number, vehicle.owner_id, owner_id)
+        if conflict:
+            conflicts[registration_number] = conflict
+        elif changed_at > vehicle.updated_at:
+            for key, value in values.items():
+                setattr(vehicle, key, value)
+            vehicle.updated_at = changed_at
+            fields.update(values)
+            to_update.append(vehicle)
+        # Otherwise the marketplace row was changed after this event and wins
+    Vehicle.objects.bulk_create(to_create)
+    if to_update:
+        Vehicle.objects.bulk_update(to_update, sorted(fields | {'updated_at'}))
+    for vehicle in to_create + to_update:
+        remember_registration(vehicle.registration_key)
+    return conflicts
+
+
+def _project_to_user_vehicles(changes):
+    """
+    Apply merged marketplace changes to existing UserVehicles, mapping names back to rows.
+    Returns {registration_number: error} of the changes to a UserVehicle of another user.
+    """
+    user_vehicles = {
+        user_vehicle.registration_key: user_vehicle
+        for user_vehicle in _with_owner(UserVehicle.objects.filter(
+            registration_key__in={normalize_registration(key) for key in changes}
+        ))
+    }
+    if not user_vehicles:
+        return {}
+    owners = dict(
+        Vehicle.objects.filter(registration_key__in={_current_key(key, payload) for key, (payload, _) in changes.items()})
+        .values_list('registration_key', 'owner_id')
+    )
+    brands = {payload.get('brand') for payload, _ in changes.values()}
+    manufacturers = dict(Manufacturer.objects.filter(name__in=brands).values_list('name', 'id'))
+    vehicle_models = {
+        (manufacturer_id, name): pk
+        for pk, manufacturer_id, name in VehicleModel.objects.filter(
+            manufacturer_id__in=manufacturers.values()
+        ).values_list('id', 'manufacturer_id', 'name')
+    }
+    vehicle_types = {
+        vehicle_type_choice(name): pk for pk, name in VehicleType.objects.values_list('id', 'name')
+    }
+    taken = _taken_registrations(UserVehicle, changes)
+
+    to_update, conflicts = [], {}
+    for registration_number, (payload, changed_at) in changes.items():
+        user_vehicle = user_vehicles.get(normalize_registration(registration_number))
+        if user_vehicle is None:
+            continue
+        conflict = _not_owned(
+            registration_number, owners.get(_current_key(registration_number, payload)), user_vehicle.owner_id,
+        )
+        if conflict:
+            conflicts[registration_number] = conflict
+            continue
+        if changed_at <= user_vehicle.updated_at:
+            continue
+        if _renamed_to_taken(payload, taken):
+            logger.warning('Not syncing %s: registration number %s is taken', registration_number, payload['registration_number'])
+            continue
+        if payload.get('registration_number'):
+            user_vehicle.registration_number = payload['registration_number']
+            user_vehicle.registration_key = normalize_registration(user_vehicle.registration_number)
+        manufacturer_id = manufacturers.get(payload.get('brand'))
+        if manufacturer_id:
+            user_vehicle.manufacturer_id = manufacturer_id
+            user_vehicle.model_id = vehicle_models.get((manufacturer_id, payload.get('model')), user_vehicle.model_id)
+        user_vehicle.vehicle_type_id = vehicle_types.get(payload.get('vehicle_type'), user_vehicle.vehicle_type_id)
+        user_vehicle.updated_at = changed_at
+        to_update.append(user_vehicle)
+    UserVehicle.objects.bulk_update(
+        to_update, ['registration_number', 'registration_key', 'manufacturer', 'model', 'vehicle_type', 'updated_at'],
+    )
+    for user_vehicle in to_update:
+        remember_registration(user_vehicle.registration_key)
+    return conflicts
+
+
+def _project(merged):
+    """Project merged changes to the other side; returns {(source, registration_number): error} of those skipped"""
+    conflicts = _project_to_marketplace({
+        key: change for (source, key), change in merged.items() if source == 'user_vehicle'
+    })
+    skipped = {('user_vehicle', key): error for key, error in conflicts.items()}
+    conflicts = _project_to_user_vehicles({
+        key: change for (source, key), change in merged.items() if source == 'marketplace'
+    })
+    skipped.update({('marketplace', key): error for key, error in conflicts.items()})
+    return skipped
+
+
+def project_changes(batch_size=VEHICLE_SYNC_BATCH_SIZE):
+    """
+    Apply one batch of pending VehicleChange events to the other side; returns the number of events.
+
+    Events for the same vehicle are merged, targets are loaded with one
+    query per side and written with bulk_create/bulk_update in a savepoint.
+    If that fails, each vehicle is retried in a savepoint of its own, and
+    the events of the vehicles that still fail are marked with the error
+    instead of blocking the queue, as are values too long for the target
+    columns. A change only overwrites a row whose updated_at is older, so
+    concurrent edits resolve to the latest write. Rows sharing a
+    registration number are only synced when one user owns both; other
+    changes are marked with an error. Projected writes do not send signals
+    and therefore do not echo back as new events.
+    """
+    with transaction.atomic():
+        events = list(
+            VehicleChange.objects.filter(processed_at__isnull=True)
+            .order_by('id').select_for_update(skip_locked=True)[:batch_size]
+        )
+        if not events:
+            return 0
+        merged, event_ids = _merge_events(events)
+        errors = {}
+        for (source, key), (payload, _) in merged.items():
+            error = _invalid_payload(Vehicle if source == 'user_vehicle' else UserVehicle, payload)
+            if error:
+                errors[(source, key)] = error
+        merged = {key: change for key, change in merged.items() if key not in errors}
+        try:
+            with transaction.atomic():
+                errors.update(_project(merged))
+        except Exception:
+            for key, change in merged.items():
+                try:
+                    with transaction.atomic():
+                        errors.update(_project({key: change}))
+                except Exception as e:
+                    errors[key] = f'{type(e).__name__}: {e}'
+
+        now = timezone.now()
+        for (source, key), error in errors.items():
+            logger.error('Could not sync %s change to %s: %s', source, key, error)
+            VehicleChange.objects.filter(pk__in=event_ids[(source, key)]).update(processed_at=now, error=error)
+        VehicleChange.objects.filter(
+            pk__in=[pk for key in merged if key not in errors for pk in event_ids[key]]
+        ).update(processed_at=now)
+    return len(events)
+
+
+def purge_processed_changes(retention=PROCESSED_CHANGE_RETENTION, batch_size=VEHICLE_SYNC_BATCH_SIZE):
+    """
+    Delete events projected more than `retention` ago in id chunks; failed
+    events are kept for inspection. Returns the number deleted.
+    """
+    cutoff = timezone.now() - retention
+    total = 0
+    while True:
+        ids = list(
+            VehicleChange.objects.filter(processed_at__lt=cutoff, error='').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        total += VehicleChange.objects.filter(pk__in=ids).delete()[0]
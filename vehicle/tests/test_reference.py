@@ -0,0 +1,78 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import AsyncClient
+from rest_framework.test import APIClient
+from vehicle.models import VehicleType, Manufacturer, VehicleModel
+from vehicle.reference import get_reference_data, invalidate_reference_data
+
+
+@pytest.fixture
+def reference(db, django_capture_on_commit_callbacks):
+    cache.clear()
+    with django_capture_on_commit_callbacks(execute=True):
+        bike = VehicleType.objects.create(name='Bike')
+        honda = Manufacturer.objects.create(name='Honda')
+        bajaj = Manufacturer.objects.create(name='Bajaj')
+        for name in ('Shine', 'Unicorn', 'Activa'):
+            VehicleModel.objects.create(name=name, manufacturer=honda, vehicle_type=bike)
+        VehicleModel.objects.create(name='Pulsar', manufacturer=bajaj, vehicle_type=bike)
+    invalidate_reference_data()
+    return honda, bajaj
+
+
+def test_reference_lists_are_served_without_queries(reference, django_assert_num_queries):
+    honda, bajaj = reference
+    client = APIClient()
+    with django_assert_num_queries(3):
+        get_reference_data()
+
+    with django_assert_num_queries(0):
+        models = client.get('/api/vehicle/vehicle-models/').json()
+        honda_models = client.get('/api/vehicle/vehicle-models/', {'manufacturer': honda.id}).json()
+        manufacturers = client.get('/api/vehicle/manufacturers/').json()
+        types = client.get('/api/vehicle/vehicle-types/').json()
+        dropdown = client.get(f'/api/repairing_service/manufacturers/{bajaj.id}/models/').json()
+
+    assert [model['name'] for model in models] == ['Shine', 'Unicorn', 'Activa', 'Pulsar']
+    assert models[0]['manufacturer']['name'] == 'Honda'
+    assert models[0]['vehicle_type']['name'] == 'Bike'
+    assert [model['name'] for model in honda_models] == ['Shine', 'Unicorn', 'Activa']
+    assert [manufacturer['name'] for manufacturer in manufacturers] == ['Honda', 'Bajaj']
+    assert [vehicle_type['name'] for vehicle_type in types] == ['Bike']
+    assert [model['name'] for model in dropdown] == ['Pulsar']
+
+
+def test_admin_edit_invalidates_snapshot(reference, django_capture_on_commit_callbacks):
+    honda, bajaj = reference
+    client = APIClient()
+    assert len(client.get('/api/vehicle/manufacturers/').json()) == 2
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Manufacturer.objects.create(name='TVS')
+        bajaj.delete()
+
+    names = [manufacturer['name'] for manufacturer in client.get('/api/vehicle/manufacturers/').json()]
+    assert names == ['Honda', 'TVS']
+    assert [model['name'] for model in client.get('/api/vehicle/vehicle-models/').json()] == ['Shine', 'Unicorn', 'Activa']
+
+
+def test_reference_reads_are_async_and_writes_still_work(reference, django_capture_on_commit_callbacks,
+                                                         django_assert_num_queries):
+    honda, bajaj = reference
+    get_reference_data()
+
+    with django_assert_num_queries(0):
+        response = async_to_sync(AsyncClient().get)(f'/api/vehicle/manufacturers/{honda.id}/')
+    assert response.status_code == 200
+    assert response.json()['name'] == 'Honda'
+    client = APIClient()
+    assert client.get('/api/vehicle/vehicle-models/999/').status_code == 404
+    assert client.get('/api/vehicle/vehicle-models/', {'manufacturer': 'honda'}).status_code == 400
+
+    with django_capture_on_commit_callbacks(execute=True):
+        created = client.post('/api/vehicle/vehicle-types/', {'name': 'Scooter'})
+        renamed = client.patch(f'/api/vehicle/manufacturers/{bajaj.id}/', {'name': 'Bajaj Auto'}, format='json')
+    assert (created.status_code, renamed.status_code) == (201, 200)
+    assert [vehicle_type['name'] for vehicle_type in client.get('/api/vehicle/vehicle-types/').json()] == ['Bike', 'Scooter']
+    assert client.get(f'/api/vehicle/manufacturers/{bajaj.id}/').json()['name'] == 'Bajaj Auto'
@@ -0,0 +1,101 @@
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+from accounts.models import User, UserProfile
+from marketplace.models import Vehicle
+from marketplace.serializers import VehicleSerializer
+from vehicle.models import VehicleType, Manufacturer, VehicleModel, UserVehicle
+from vehicle.registration import (
+    RegistrationIndex, invalidate_registration_index, might_be_registered, normalize_registration,
+    registration_taken, report_registration_duplicates,
+)
+
+
+@pytest.fixture
+def registered(db):
+    invalidate_registration_index()
+    profile = UserProfile.objects.create(email='rider@example.com', name='Rider', username='rider', address='',
+                                         vehicle_name='', vehicle_type='', manufacturer='')
+    scooter = VehicleType.objects.create(name='Scooter')
+    honda = Manufacturer.objects.create(name='Honda')
+    activa = VehicleModel.objects.create(name='Activa', manufacturer=honda, vehicle_type=scooter)
+    return UserVehicle.objects.create(
+        user=profile, vehicle_type=scooter, manufacturer=honda, model=activa, registration_number='KA 01 AB 1234',
+    )
+
+
+@pytest.mark.parametrize('value, key', [
+    ('KA 01 AB 1234', 'KA01AB1234'),
+    ('ka01ab1234', 'KA01AB1234'),
+    (' mh-12-de-1433 ', 'MH12DE1433'),
+    ('', ''),
+    (None, ''),
+])
+def test_normalize_registration(value, key):
+    assert normalize_registration(value) == key
+
+
+def test_key_is_set_on_save(registered):
+    assert registered.registration_key == 'KA01AB1234'
+    vehicle = Vehicle.objects.create(registration_number='ka-01-ab-1234')
+    assert vehicle.registration_key == 'KA01AB1234'
+    assert Vehicle.objects.create().registration_key is None
+
+
+def test_unknown_registration_answered_without_queries(registered, django_assert_num_queries):
+    assert might_be_registered('ka01ab1234')
+
+    with django_assert_num_queries(0):
+        assert not registration_taken(UserVehicle, 'KA 02 XY 9999')
+    with django_assert_num_queries(1):
+        assert registration_taken(UserVehicle, 'ka01ab1234')
+    assert not registration_taken(UserVehicle, 'KA01AB1234', exclude_pk=registered.pk)
+
+
+def test_other_workers_pick_up_new_keys_without_reloading(registered, django_assert_num_queries):
+    this_worker, other_worker = RegistrationIndex(check_interval=0), RegistrationIndex(check_interval=0)
+    assert this_worker.get() == other_worker.get() == {'KA01AB1234'}
+
+    other_worker.add('KA02XY9999')
+    other_worker.publish('KA02XY9999')
+
+    with django_assert_num_queries(0):
+        assert this_worker.get() == {'KA01AB1234', 'KA02XY9999'}
+    # A lost log is rebuilt from the tables
+    cache.clear()
+    assert this_worker.get() == {'KA01AB1234'}
+
+
+def test_legacy_duplicates_are_reported_unchanged(registered):
+    duplicate = UserVehicle.objects.create(
+        user=registered.user, vehicle_type=registered.vehicle_type, manufacturer=registered.manufacturer,
+        model=registered.model, registration_number='KA02XY9999',
+    )
+    # As the backfill left a near-duplicate entered before the key existed
+    UserVehicle.objects.filter(pk=duplicate.pk).update(registration_number='ka-01-ab-1234', registration_key=None)
+
+    assert report_registration_duplicates(UserVehicle) == [(duplicate.pk, 'ka-01-ab-1234')]
+    duplicate.refresh_from_db()
+    assert (duplicate.registration_number, duplicate.registration_key) == ('ka-01-ab-1234', None)
+
+
+def test_marketplace_duplicate_in_another_format_is_rejected(registered):
+    Vehicle.objects.create(registration_number='KA01AB1234')
+
+    serializer = VehicleSerializer(data={'registration_number': 'ka 01 ab 1234'})
+
+    assert not serializer.is_valid()
+    assert serializer.errors['registration_number'] == ['A vehicle with this registration number already exists']
+
+
+def test_check_registration_endpoint(registered):
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='u', email='u@example.com', password='Secret123!'))
+    url = reverse('uservehicle-check-registration')
+
+    assert client.get(url, {'registration_number': 'ka01-ab-1234'}).data == {
+        'registration_key': 'KA01AB1234', 'available': False,
+    }
+    assert client.get(url, {'registration_number': 'KA02XY9999'}).data['available'] is True
+    assert client.get(url).status_code == 400
@@ -0,0 +1,181 @@
+
+import pytest
+from datetime import date, timedelta
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.models import User, UserProfile
+from marketplace.models import Vehicle
+from vehicle.models import VehicleType, Manufacturer, VehicleModel, VehicleChange
+from vehicle.services import VehicleService
+from vehicle import sync
+from vehicle.sync import project_changes, purge_processed_changes
+
+
+@pytest.fixture
+def garage(db):
+    user = User.objects.create_user(username='rider', email='rider@example.com', password='Secret123!')
+    user.profile = UserProfile.objects.create(email=user.email, name='Rider', username='rider', address='',
+                                              vehicle_name='', vehicle_type='', manufacturer='')
+    scooter = VehicleType.objects.create(name='Scooter')
+    bike = VehicleType.objects.create(name='Bike')
+    honda = Manufacturer.objects.create(name='Honda')
+    tvs = Manufacturer.objects.create(name='TVS')
+    activa = VehicleModel.objects.create(name='Activa', manufacturer=honda, vehicle_type=scooter)
+    apache = VehicleModel.objects.create(name='Apache', manufacturer=tvs, vehicle_type=bike)
+    user_vehicle = VehicleService.create_user_vehicle(user, {
+        'vehicle_type': scooter, 'manufacturer': honda, 'model': activa,
+        'registration_number': 'KA01AB1234', 'kms_driven': 1200,
+    })
+    return user, user_vehicle, tvs, apache, bike
+
+
+def test_user_vehicle_write_touches_one_table_until_projected(garage, django_assert_max_num_queries):
+    user, user_vehicle, *_ = garage
+    assert not Vehicle.objects.exists()
+
+    assert project_changes() == 1
+    vehicle = Vehicle.objects.get(registration_number='KA01AB1234')
+    assert (vehicle.brand, vehicle.model, vehicle.vehicle_type) == ('Honda', 'Activa', 'scooter')
+    assert vehicle.owner == user
+    assert vehicle.kms_driven == 1200
+
+    VehicleService.update_user_vehicle(user_vehicle, {'registration_number': 'KA01AB9999', 'owner': None})
+    VehicleService.update_user_vehicle(user_vehicle, {'purchase_date': None})
+    # Savepoints around the batch and the projection, events, vehicles, rename check, owners, bulk update, mark processed
+    with django_assert_max_num_queries(10):
+        assert project_changes() == 2
+    vehicle.refresh_from_db()
+    assert vehicle.registration_number == 'KA01AB9999'
+    assert vehicle.owner == user
+    assert not VehicleChange.objects.filter(processed_at__isnull=True).exists()
+
+
+def test_bad_change_is_set_aside_without_blocking_the_queue(garage, monkeypatch):
+    user, user_vehicle, tvs, apache, bike = garage
+    too_long = VehicleService.create_user_vehicle(user, {
+        'vehicle_type': bike, 'manufacturer': tvs, 'model': apache, 'registration_number': 'KA05' + '9' * 30,
+    })
+    VehicleService.create_user_vehicle(user, {
+        'vehicle_type': bike, 'manufacturer': tvs, 'model': apache, 'registration_number': 'KA05MN0002',
+    })
+    remember = sync.remember_registration
+
+    def broken(registration_key):
+        if registration_key == 'KA05MN0002':
+            raise RuntimeError('store down')
+        remember(registration_key)
+
+    monkeypatch.setattr(sync, 'remember_registration', broken)
+
+    assert project_changes() == 3
+
+    assert list(Vehicle.objects.values_list('registration_number', flat=True)) == ['KA01AB1234']
+    errors = dict(VehicleChange.objects.exclude(error='').values_list('registration_number', 'error'))
+    assert errors.keys() == {too_long.registration_number, 'KA05MN0002'}
+    assert 'longer than 20' in errors[too_long.registration_number]
+    assert not VehicleChange.objects.filter(processed_at__isnull=True).exists()
+
+
+def test_update_before_first_projection_keeps_the_owner(garage):
+    user, user_vehicle, *_ = garage
+    VehicleChange.objects.all().delete()
+
+    VehicleService.update_user_vehicle(user_vehicle, {'purchase_date': date(2024, 5, 1)})
+    project_changes()
+
+    assert Vehicle.objects.get(registration_number='KA01AB1234').owner == user
+
+
+def test_shared_plate_of_two_users_is_not_synced(garage):
+    user, user_vehicle, tvs, apache, bike = garage
+    project_changes()
+    other = User.objects.create_user(username='seller', email='seller@example.com', password='Secret123!')
+    listed = Vehicle.objects.create(owner=other, brand='Bajaj', model='Pulsar', registration_number='KA05MN0003')
+    project_changes()
+    claimed = VehicleService.create_user_vehicle(user, {
+        'vehicle_type': bike, 'manufacturer': tvs, 'model': apache, 'registration_number': 'KA05MN0003',
+    })
+    assert project_changes() == 1
+    listed.refresh_from_db()
+    assert (listed.brand, listed.model, listed.owner) == ('Bajaj', 'Pulsar', other)
+
+    listed.brand = 'Royal Enfield'
+    listed.save()
+    assert project_changes() == 1
+    claimed.refresh_from_db()
+    assert (claimed.manufacturer, claimed.model) == (tvs, apache)
+
+    errors = VehicleChange.objects.filter(registration_number='KA05MN0003').exclude(error='')
+    assert sorted(errors.values_list('source', flat=True)) == ['marketplace', 'user_vehicle']
+    assert not VehicleChange.objects.filter(processed_at__isnull=True).exists()
+
+
+def test_purge_keeps_recent_and_failed_changes(garage):
+    project_changes()
+    old = timezone.now() - timedelta(days=30)
+    VehicleChange.objects.update(processed_at=old)
+    VehicleChange.objects.create(source='marketplace', registration_number='X', changed_at=old, processed_at=old, error='boom')
+    VehicleChange.objects.create(source='marketplace', registration_number='Y', changed_at=old, processed_at=timezone.now())
+
+    assert purge_processed_changes(batch_size=1) == 1
+    assert set(VehicleChange.objects.values_list('registration_number', flat=True)) == {'X', 'Y'}
+
+
+def test_marketplace_edit_is_projected_back(garage):
+    user, user_vehicle, tvs, apache, bike = garage
+    project_changes()
+
+    vehicle = Vehicle.objects.get(registration_number='KA01AB1234')
+    vehicle.brand, vehicle.model, vehicle.vehicle_type = 'TVS', 'Apache', 'bike'
+    vehicle.save()
+    assert project_changes() == 1
+
+    user_vehicle.refresh_from_db()
+    assert (user_vehicle.manufacturer, user_vehicle.model, user_vehicle.vehicle_type) == (tvs, apache, bike)
+    # Projected writes do not queue changes of their own
+    assert project_changes() == 0
+
+
+def test_older_change_loses_to_newer_row(garage):
+    user, user_vehicle, *_ = garage
+    project_changes()
+    vehicle = Vehicle.objects.get(registration_number='KA01AB1234')
+
+    VehicleService.update_user_vehicle(user_vehicle, {'registration_number': 'KA01AB1234'})
+    VehicleChange.objects.filter(processed_at__isnull=True).update(
+        changed_at=vehicle.updated_at - timedelta(seconds=1), payload={'brand': 'Stale'},
+    )
+    project_changes()
+
+    vehicle.refresh_from_db()
+    assert vehicle.brand == 'Honda'
+
+
+def test_vehicle_details_in_one_query(garage, django_assert_num_queries):
+    user, user_vehicle, tvs, apache, bike = garage
+    other = VehicleService.create_user_vehicle(user, {
+        'vehicle_type': bike, 'manufacturer': tvs, 'model': apache, 'registration_number': 'KA05MN0001',
+    })
+    project_changes()
+    Vehicle.objects.filter(registration_number='KA01AB1234').update(insurance_valid_till=date(2027, 1, 31))
+    Vehicle.objects.filter(registration_number='KA05MN0001').delete()
+    client = APIClient()
+    client.force_authenticate(user)
+
+    with django_assert_num_queries(1):
+        response = client.get(reverse('uservehicle-full-details', args=[user_vehicle.pk]))
+    assert response.status_code == 200
+    assert response.data['manufacturer'] == 'Honda'
+    assert response.data['kms_driven'] == 1200
+    assert response.data['insurance_valid_till'] == '2027-01-31'
+
+    with django_assert_num_queries(1):
+        response = client.get(reverse('uservehicle-garage'))
+    assert [vehicle['registration_number'] for vehicle in response.data] == ['KA01AB1234', 'KA05MN0001']
+    # Not projected to the marketplace (here: removed from it)
+    assert response.data[1]['marketplace_vehicle'] is None
+    # The garage row itself is untouched by the marketplace delete
+    assert (response.data[1]['id'], response.data[1]['model']) == (other.pk, 'Apache')
+
+    assert VehicleService.get_vehicle_details('ka 01 ab 1234').marketplace_status == Vehicle.Status.UNDER_INSPECTION
@@ -1,7 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
-    VehicleTypeViewSet, ManufacturerViewSet, VehicleModelViewSet, UserVehicleViewSet
+    VehicleTypeViewSet, ManufacturerViewSet, VehicleModelViewSet, UserVehicleViewSet,
+    VehicleTypeView, ManufacturerView, VehicleModelView,
 )
 
 router = DefaultRouter()
@@ -10,6 +11,13 @@ router.register(r'manufacturers', ManufacturerViewSet)
 router.register(r'vehicle-models', VehicleModelViewSet)
 router.register(r'user-vehicles', UserVehicleViewSet)
 
+# Reference data is read through async views ahead of the router, which keeps the URL names and API root entries
 urlpatterns = [
+    path('vehicle-types/', VehicleTypeView.as_view()),
+    path('vehicle-types/<int:pk>/', VehicleTypeView.as_view(detail=True)),
+    path('manufacturers/', ManufacturerView.as_view()),
+    path('manufacturers/<int:pk>/', ManufacturerView.as_view(detail=True)),
+    path('vehicle-models/', VehicleModelView.as_view()),
+    path('vehicle-models/<int:pk>/', VehicleModelView.as_view(detail=True)),
     path('', include(router.urls)),
 ]
@@ -1,13 +1,21 @@
+from asgiref.sync import sync_to_async
 from rest_framework import viewsets, generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from django.db import IntegrityError
 from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from authback.async_views import AsyncAPIView
 from .models import VehicleType, Manufacturer, VehicleModel, UserVehicle
 from .serializers import (
-    VehicleTypeSerializer, ManufacturerSerializer, VehicleModelSerializer, UserVehicleSerializer
+    VehicleTypeSerializer, ManufacturerSerializer, VehicleModelSerializer, UserVehicleSerializer,
+    VehicleDetailsSerializer
 )
 from .services import VehicleService
+from .reference import aget_reference_data
+from .registration import normalize_registration, registration_taken
 
 class VehicleTypeViewSet(viewsets.ModelViewSet):
     queryset = VehicleType.objects.all()
@@ -20,7 +28,7 @@ class ManufacturerViewSet(viewsets.ModelViewSet):
     permission_classes = [AllowAny]
 
 class VehicleModelViewSet(viewsets.ModelViewSet):
-    queryset = VehicleModel.objects.all()
+    queryset = VehicleModel.objects.select_related('manufacturer', 'vehicle_type')
     serializer_class = VehicleModelSerializer
     permission_classes = [AllowAny]
 
@@ -31,6 +39,78 @@ class VehicleModelViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(manufacturer_id=manufacturer_id)
         return queryset
 
+class ReferenceDataView(AsyncAPIView):
+    """
+    Reference data list (or, with detail=True, one item) for async GETs,
+    served from the in-process reference snapshot without queries. The
+    serialization takes one thread hop for the image manifests. Writes and
+    OPTIONS go to `viewset`, the synchronous DRF view of the same URL.
+    """
+    viewset = None
+    # ReferenceData attribute holding the rows; `<items>_by_id` indexes them
+    items = None
+    detail = False
+    write_view = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        if initkwargs.get('detail'):
+            actions = {'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}
+        else:
+            actions = {'post': 'create'}
+        view = super().as_view(write_view=cls.viewset.as_view(actions), **initkwargs)
+        # Like every DRF view; the write view applies its own authentication's CSRF rules
+        return csrf_exempt(view)
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return await sync_to_async(self.write_view)(request, *args, **kwargs)
+        return await super().dispatch(request, *args, **kwargs)
+
+    def rows(self, request, reference):
+        """Rows of the list; a ValueError is answered with a 400"""
+        return getattr(reference, self.items)
+
+    def serialize(self, request, rows, many):
+        return self.viewset.serializer_class(rows, many=many, context={'request': request}).data
+
+    async def get(self, request, pk=None):
+        reference = await aget_reference_data()
+        if self.detail:
+            row = getattr(reference, f'{self.items}_by_id').get(pk)
+            if row is None:
+                model_name = self.viewset.queryset.model._meta.object_name
+                return self.json_response(
+                    {"detail": f"No {model_name} matches the given query."}, status=status.HTTP_404_NOT_FOUND
+                )
+            return self.json_response(await sync_to_async(self.serialize)(request, row, False))
+        try:
+            rows = self.rows(request, reference)
+        except ValueError as e:
+            return self.json_response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return self.json_response(await sync_to_async(self.serialize)(request, rows, True))
+
+class VehicleTypeView(ReferenceDataView):
+    viewset = VehicleTypeViewSet
+    items = 'vehicle_types'
+
+class ManufacturerView(ReferenceDataView):
+    viewset = ManufacturerViewSet
+    items = 'manufacturers'
+
+class VehicleModelView(ReferenceDataView):
+    viewset = VehicleModelViewSet
+    items = 'vehicle_models'
+
+    def rows(self, request, reference):
+        manufacturer_id = request.GET.get('manufacturer')
+        if not manufacturer_id:
+            return reference.vehicle_models
+        try:
+            return reference.vehicle_models_for(int(manufacturer_id))
+        except ValueError:
+            raise ValueError("manufacturer must be an integer")
+
 class UserVehicleViewSet(viewsets.ModelViewSet):
     queryset = UserVehicle.objects.all()
     serializer_class = UserVehicleSerializer
@@ -41,28 +121,50 @@ class UserVehicleViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         vehicle_data = serializer.validated_data
-        marketplace_vehicle, user_vehicle = VehicleService.create_user_vehicle(
-            self.request.user,
-            vehicle_data
-        )
-        return user_vehicle
+        try:
+            serializer.instance = VehicleService.create_user_vehicle(
+                self.request.user,
+                vehicle_data
+            )
+        except IntegrityError:
+            # Registered by another worker after validation
+            raise ValidationError({"registration_number": ["A vehicle with this registration number already exists"]})
+        return serializer.instance
 
     def perform_update(self, serializer):
         vehicle_data = serializer.validated_data
-        marketplace_vehicle, user_vehicle = VehicleService.update_user_vehicle(
-            serializer.instance,
-            vehicle_data
-        )
-        return user_vehicle
+        try:
+            serializer.instance = VehicleService.update_user_vehicle(
+                serializer.instance,
+                vehicle_data
+            )
+        except IntegrityError:
+            raise ValidationError({"registration_number": ["A vehicle with this registration number already exists"]})
+        return serializer.instance
+
+    @action(detail=False, methods=['get'], url_path='check-registration')
+    def check_registration(self, request):
+        """Whether a registration number is still free; unknown numbers are answered without a query"""
+        registration_number = request.query_params.get('registration_number', '')
+        registration_key = normalize_registration(registration_number)
+        if not registration_key:
+            return Response(
+                {"error": "registration_number is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({
+            'registration_key': registration_key,
+            'available': not registration_taken(UserVehicle, registration_number),
+        })
 
     @action(detail=True, methods=['get'])
     def full_details(self, request, pk=None):
         """Get combined details from both vehicle models"""
-        user_vehicle = self.get_object()
-        details = VehicleService.get_vehicle_details(user_vehicle.registration_number)
-        if not details:
-            return Response(
-                {"detail": "Vehicle details not found"},
-                status=status.HTTP_404_NOT_FOUND
-            )
-        return Response(details)
+        details = generics.get_object_or_404(VehicleService.with_vehicle_details(self.get_queryset()), pk=pk)
+        return Response(VehicleDetailsSerializer(details).data)
+
+    @action(detail=False, methods=['get'])
+    def garage(self, request):
+        """Combined details of all the user's vehicles in one query"""
+        vehicles = VehicleService.with_vehicle_details(self.get_queryset()).order_by('registration_number')
+        return Response(VehicleDetailsSerializer(vehicles, many=True).data)